@@ -28,6 +28,9 @@ def create_app(config_name=None):
     # User loader for Flask-Login
     from app.models import User
     
+    # Model event listeners for derived data
+    from app import events
+    
     @login_manager.user_loader
     def load_user(user_id):
         """Load user by ID. Convert string to UUID for database query."""
@@ -52,6 +55,7 @@ def create_app(config_name=None):
     from app.portfolio import bp as portfolio_bp
     from app.career import bp as career_bp
     from app.communication import bp as communication_bp
+    from app.files import bp as files_bp
     from app.api.routes import api_bp
     
     app.register_blueprint(auth_bp)
@@ -65,8 +69,13 @@ def create_app(config_name=None):
     app.register_blueprint(portfolio_bp)
     app.register_blueprint(career_bp)
     app.register_blueprint(communication_bp)
+    app.register_blueprint(files_bp)
     app.register_blueprint(api_bp)  # Mobile API
     
+    # CLI commands for batch jobs
+    from app.commands import register_commands
+    register_commands(app)
+    
     # Root route
     @app.route('/')
     def index():
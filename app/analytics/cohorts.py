@@ -0,0 +1,189 @@
+"""
+Cohort analytics - retention, dropout hazard, milestone completion and grades per batch
+
+Each source table is pulled for the whole batch in one query into a pandas
+frame, and every metric is computed with vectorized NumPy operations over
+enrollment x week arrays instead of per-student Python loops. Weeks are
+counted from the batch start date.
+
+A student's last active week is the latest week they were present at a
+session or submitted work. They are retained in week w if that week is at
+least w. Dropout hazard for week w is the share of students still active at
+the start of w who were last seen in w and later dropped. Students who
+dropped without ever being active never enter that at-risk population, so
+they are counted separately as dropped_never_active.
+"""
+import math
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+from app.cache import TTLCache
+from app.extensions import db
+from app.models import (
+    Enrollment, EnrollmentStatus, Attendance, Submission, Grade, Assignment, Lesson, Module,
+    Milestone, StudentMilestone
+)
+
+GRADE_BINS = np.arange(0, 101, 10)
+
+_metrics = TTLCache(maxsize=256, ttl=600)
+
+
+def _frame(stmt):
+    """Run a select and return its rows as a DataFrame"""
+    result = db.session.execute(stmt)
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def load_cohort(batch):
+    """Columnar pull of everything the metrics need, one query per source"""
+    enrollments = _frame(
+        select(Enrollment.id.label('enrollment_id'), Enrollment.student_id, Enrollment.status)
+        .where(Enrollment.batch_id == batch.id)
+    )
+
+    attendance = _frame(
+        select(Attendance.enrollment_id, Attendance.session_date, Attendance.present)
+        .join(Enrollment, Enrollment.id == Attendance.enrollment_id)
+        .where(Enrollment.batch_id == batch.id)
+    )
+
+    curriculum = (
+        select(Assignment.id)
+        .join(Lesson, Lesson.id == Assignment.lesson_id)
+        .join(Module, Module.id == Lesson.module_id)
+        .where(Module.bootcamp_id == batch.bootcamp_id)
+    )
+    submissions = _frame(
+        select(
+            Enrollment.id.label('enrollment_id'), Submission.submitted_at,
+            Grade.score, Assignment.max_score
+        )
+        .join(Enrollment, Enrollment.student_id == Submission.student_id)
+        .join(Assignment, Assignment.id == Submission.assignment_id)
+        .outerjoin(Grade, Grade.submission_id == Submission.id)
+        .where(Enrollment.batch_id == batch.id, Submission.assignment_id.in_(curriculum))
+    )
+
+    milestones = _frame(
+        select(StudentMilestone.enrollment_id, StudentMilestone.completed_at)
+        .join(Enrollment, Enrollment.id == StudentMilestone.enrollment_id)
+        .where(
+            Enrollment.batch_id == batch.id,
+            StudentMilestone.completed.is_(True),
+            StudentMilestone.completed_at.isnot(None)
+        )
+    )
+
+    milestone_total = db.session.scalar(
+        select(func.count(Milestone.id)).where(Milestone.bootcamp_id == batch.bootcamp_id)
+    )
+
+    return enrollments, attendance, submissions, milestones, milestone_total
+
+
+def _week_of(values, start, weeks):
+    """Week index from the batch start for a datetime/date column, clipped to the batch"""
+    days = (pd.to_datetime(values) - pd.Timestamp(start)).dt.days.to_numpy()
+    return np.clip(days // 7, 0, weeks - 1)
+
+
+def _positions(enrollment_ids, column):
+    """Row position in the enrollments frame for each value of an enrollment_id column"""
+    index = pd.Index(enrollment_ids)
+    return index.get_indexer(column)
+
+
+def cohort_metrics(batch):
+    """All cohort curves for a batch as JSON-ready lists"""
+    enrollments, attendance, submissions, milestones, milestone_total = load_cohort(batch)
+
+    weeks = max(1, math.ceil(((batch.end_date - batch.start_date).days + 1) / 7))
+    week_axis = np.arange(weeks)
+    n = len(enrollments)
+
+    metrics = {
+        'batch': {'id': str(batch.id), 'name': batch.name, 'bootcamp': batch.bootcamp.title,
+                  'start_date': batch.start_date.isoformat(), 'end_date': batch.end_date.isoformat()},
+        'weeks': (week_axis + 1).tolist(),
+        'enrolled': n,
+    }
+    if n == 0:
+        empty = [0.0] * weeks
+        metrics.update(retention=empty, dropout_hazard=empty, attendance_rate=empty,
+                       milestone_completion=empty, grades=_grade_distribution(np.array([])),
+                       dropped_never_active=0, status_counts={})
+        return metrics
+
+    ids = enrollments['enrollment_id'].to_numpy()
+    dropped = (enrollments['status'] == EnrollmentStatus.DROPPED).to_numpy()
+
+    # Last active week per enrollment, -1 when never active
+    last_active = np.full(n, -1)
+    present = attendance[attendance['present'].astype(bool)] if len(attendance) else attendance
+    for frame, column in ((present, 'session_date'), (submissions, 'submitted_at')):
+        if len(frame):
+            pos = _positions(ids, frame['enrollment_id'])
+            np.maximum.at(last_active, pos, _week_of(frame[column], batch.start_date, weeks))
+
+    active = last_active[:, None] >= week_axis[None, :]
+    retention = active.mean(axis=0)
+
+    at_risk = active.sum(axis=0)
+    exits = np.bincount(last_active[dropped & (last_active >= 0)], minlength=weeks)[:weeks]
+    hazard = np.divide(exits, at_risk, out=np.zeros(weeks), where=at_risk > 0)
+
+    # Weekly attendance rate across all recorded sessions
+    if len(attendance):
+        att_week = _week_of(attendance['session_date'], batch.start_date, weeks)
+        sessions = np.bincount(att_week, minlength=weeks)
+        attended = np.bincount(att_week, weights=attendance['present'].astype(float).to_numpy(), minlength=weeks)
+        attendance_rate = np.divide(attended, sessions, out=np.zeros(weeks), where=sessions > 0)
+    else:
+        attendance_rate = np.zeros(weeks)
+
+    # Share of all (student, milestone) pairs completed by the end of each week
+    if milestone_total and len(milestones):
+        done = np.bincount(_week_of(milestones['completed_at'], batch.start_date, weeks), minlength=weeks)
+        milestone_completion = done.cumsum() / (n * milestone_total)
+    else:
+        milestone_completion = np.zeros(weeks)
+
+    graded = submissions.dropna(subset=['score']) if len(submissions) else submissions
+    if len(graded):
+        percentages = (graded['score'].astype(float) / graded['max_score'].astype(float).replace(0, np.nan) * 100)
+        percentages = np.clip(percentages.dropna().to_numpy(), 0, 100)
+    else:
+        percentages = np.array([])
+
+    metrics.update(
+        retention=np.round(retention * 100, 1).tolist(),
+        dropout_hazard=np.round(hazard * 100, 1).tolist(),
+        attendance_rate=np.round(attendance_rate * 100, 1).tolist(),
+        milestone_completion=np.round(milestone_completion * 100, 1).tolist(),
+        grades=_grade_distribution(percentages),
+        dropped_never_active=int((dropped & (last_active < 0)).sum()),
+        status_counts=enrollments['status'].map(lambda s: s.value).value_counts().to_dict()
+    )
+    return metrics
+
+
+def _grade_distribution(percentages):
+    """Histogram in 10-point bins plus summary percentiles"""
+    counts, _ = np.histogram(percentages, bins=GRADE_BINS)
+    summary = {}
+    if percentages.size:
+        p25, median, p75 = np.percentile(percentages, [25, 50, 75])
+        summary = {'mean': round(float(percentages.mean()), 1), 'median': round(float(median), 1),
+                   'p25': round(float(p25), 1), 'p75': round(float(p75), 1)}
+    return {
+        'bins': [f'{low}-{low + 10}' for low in GRADE_BINS[:-1].tolist()],
+        'counts': counts.tolist(),
+        'graded': int(percentages.size),
+        **summary
+    }
+
+
+def get_cohort_metrics(batch):
+    """Cached cohort_metrics; history changes slowly, so ten minutes is fine"""
+    return _metrics.get_or_set(batch.id, lambda: cohort_metrics(batch))
@@ -0,0 +1,123 @@
+"""
+Admin dashboard snapshot
+
+All headline counts come from one statement: each table is aggregated once
+with FILTER clauses and the one-row results are cross-joined. Recent
+enrollments and leads are two joined selects returning plain rows. The
+result is kept as a snapshot; once it is older than DASHBOARD_SNAPSHOT_TTL
+the stale copy is still served while a background job recomputes it.
+"""
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, func, true
+from app.cache import TTLCache
+from app.extensions import db
+from app.jobs import enqueue
+from app.models import (
+    Lead, LeadStatus, User, UserRole, Enrollment, EnrollmentStatus, Payment, PaymentStatus,
+    Batch, BatchStatus, Bootcamp
+)
+
+# Kept well past the refresh age so a stale copy is always there to serve
+_snapshots = TTLCache(maxsize=1, ttl=24 * 3600)
+_refreshing = threading.Event()
+
+
+def stats_query():
+    """Every headline number in a single SELECT"""
+    leads = select(
+        func.count().label('total_leads'),
+        func.count().filter(Lead.status == LeadStatus.NEW).label('new_leads'),
+        func.count().filter(Lead.status == LeadStatus.CONVERTED).label('converted_leads')
+    ).select_from(Lead).subquery()
+
+    users = select(
+        func.count().filter(User.role == UserRole.STUDENT).label('total_students'),
+        func.count().filter(User.role == UserRole.INSTRUCTOR).label('total_instructors')
+    ).select_from(User).subquery()
+
+    enrollments = select(
+        func.count().label('total_enrollments'),
+        func.count().filter(Enrollment.status == EnrollmentStatus.ACTIVE).label('active_enrollments')
+    ).select_from(Enrollment).subquery()
+
+    payments = select(
+        func.coalesce(
+            func.sum(Payment.amount).filter(Payment.status == PaymentStatus.COMPLETED), 0
+        ).label('total_revenue')
+    ).select_from(Payment).subquery()
+
+    batches = select(
+        func.count().filter(Batch.status == BatchStatus.ONGOING).label('active_batches'),
+        func.count().filter(Batch.status == BatchStatus.UPCOMING).label('upcoming_batches')
+    ).select_from(Batch).subquery()
+
+    return select(leads, users, enrollments, payments, batches).select_from(
+        leads
+    ).join(users, true()).join(enrollments, true()).join(payments, true()).join(batches, true())
+
+
+def compute_snapshot():
+    """Fresh dashboard data as plain values"""
+    stats = dict(db.session.execute(stats_query()).one()._mapping)
+    stats['total_revenue'] = float(stats['total_revenue'])
+    stats['conversion_rate'] = (
+        stats['converted_leads'] / stats['total_leads'] * 100 if stats['total_leads'] else 0
+    )
+
+    recent_enrollments = [
+        dict(row._mapping) for row in db.session.execute(
+            select(
+                User.full_name.label('student_name'),
+                Bootcamp.title.label('bootcamp_title'),
+                Enrollment.status
+            ).join(
+                User, User.id == Enrollment.student_id
+            ).join(
+                Batch, Batch.id == Enrollment.batch_id
+            ).join(
+                Bootcamp, Bootcamp.id == Batch.bootcamp_id
+            ).order_by(Enrollment.created_at.desc()).limit(10)
+        )
+    ]
+
+    recent_leads = [
+        dict(row._mapping) for row in db.session.execute(
+            select(Lead.full_name, Lead.email, Lead.status).order_by(Lead.created_at.desc()).limit(10)
+        )
+    ]
+
+    return {
+        'stats': stats,
+        'recent_enrollments': recent_enrollments,
+        'recent_leads': recent_leads,
+        'computed_at': datetime.utcnow()
+    }
+
+
+def refresh_snapshot():
+    """Recompute and store the snapshot (runs as a background job)"""
+    try:
+        snapshot = compute_snapshot()
+        _snapshots.set('admin', snapshot)
+        return snapshot
+    finally:
+        _refreshing.clear()
+
+
+def get_snapshot():
+    """
+    Current snapshot. The first request computes it inline; after that a
+    stale snapshot is returned immediately and refreshed in the background.
+    """
+    snapshot = _snapshots.get('admin')
+    if snapshot is None:
+        _refreshing.set()
+        return refresh_snapshot()
+
+    age = (datetime.utcnow() - snapshot['computed_at']).total_seconds()
+    if age > current_app.config['DASHBOARD_SNAPSHOT_TTL'] and not _refreshing.is_set():
+        _refreshing.set()
+        enqueue(refresh_snapshot)
+    return snapshot
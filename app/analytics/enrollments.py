@@ -0,0 +1,268 @@
+"""
+Enrollment report - enrollment counts bucketed by day, week or month
+
+Counts are aggregated in the database with date_trunc and grouped by the
+chosen dimension (bootcamp, batch or status), so a two-year weekly report
+by bootcamp is one GROUP BY returning at most buckets x groups rows. An
+optional comparison period runs the same query over an earlier window.
+Individual enrollments behind a bucket are listed with keyset pagination on
+(enrolled_at, id).
+"""
+import base64
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, tuple_, literal
+from app.extensions import db
+from app.models import Enrollment, EnrollmentStatus, Batch, Bootcamp, User
+
+GRANULARITIES = ('day', 'week', 'month')
+GROUPINGS = ('bootcamp', 'batch', 'status')
+COMPARISONS = ('previous', 'year')
+
+# Guards against a day-granularity report over many years
+MAX_BUCKETS = 800
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket containing `day`, matching date_trunc"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def bucket_range(start, end, granularity):
+    """Every bucket start from the bucket holding `start` to the one holding `end`"""
+    buckets = []
+    day = bucket_start(start, granularity)
+    while day <= end:
+        buckets.append(day)
+        day = next_bucket(day, granularity)
+    return buckets
+
+
+def parse_report_params(args, today=None):
+    """
+    Report parameters from query args. Defaults to weekly counts over the
+    last year, grouped by bootcamp. Raises ValueError for malformed values.
+    """
+    today = today or date.today()
+    params = {
+        'granularity': args.get('granularity', 'week'),
+        'group_by': args.get('group_by', 'bootcamp'),
+        'compare': args.get('compare') or None,
+        'end': date.fromisoformat(args['end']) if args.get('end') else today,
+    }
+    params['start'] = (
+        date.fromisoformat(args['start']) if args.get('start') else params['end'] - timedelta(days=364)
+    )
+    if params['granularity'] not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {params['granularity']!r}")
+    if params['group_by'] not in GROUPINGS:
+        raise ValueError(f"Unknown grouping {params['group_by']!r}")
+    if params['compare'] not in (None, *COMPARISONS):
+        raise ValueError(f"Unknown comparison {params['compare']!r}")
+    if params['start'] > params['end']:
+        raise ValueError('start is after end')
+    if len(bucket_range(params['start'], params['end'], params['granularity'])) > MAX_BUCKETS:
+        raise ValueError('Too many buckets; use a coarser granularity or a shorter range')
+
+    if args.get('bootcamp_id'):
+        params['bootcamp_id'] = uuid.UUID(args['bootcamp_id'])
+    if args.get('batch_id'):
+        params['batch_id'] = uuid.UUID(args['batch_id'])
+    if args.get('status'):
+        params['status'] = EnrollmentStatus(args['status'])
+    return params
+
+
+def comparison_window(start, end, compare):
+    """The earlier window to compare against: the period just before, or a year back"""
+    if compare == 'year':
+        # 364 days keeps weekdays, and so week buckets, aligned
+        offset = timedelta(days=364)
+    else:
+        offset = (end - start) + timedelta(days=1)
+    return start - offset, end - offset
+
+
+def _filtered(stmt, params, start, end):
+    stmt = stmt.where(
+        Enrollment.enrolled_at >= start,
+        Enrollment.enrolled_at < end + timedelta(days=1)
+    )
+    if 'bootcamp_id' in params:
+        stmt = stmt.where(Batch.bootcamp_id == params['bootcamp_id'])
+    if 'batch_id' in params:
+        stmt = stmt.where(Enrollment.batch_id == params['batch_id'])
+    if 'status' in params:
+        stmt = stmt.where(Enrollment.status == params['status'])
+    return stmt
+
+
+def _group_columns(group_by):
+    """(key, label) columns for the grouping dimension"""
+    if group_by == 'bootcamp':
+        return Bootcamp.id, Bootcamp.title
+    if group_by == 'batch':
+        return Batch.id, Bootcamp.title + literal(' - ') + Batch.name
+    return Enrollment.status, Enrollment.status
+
+
+def bucket_query(params, start, end):
+    """(bucket, key, label, count) rows for one window, in a single GROUP BY"""
+    bucket = func.date_trunc(params['granularity'], Enrollment.enrolled_at, type_=db.DateTime).label('bucket')
+    key, label = _group_columns(params['group_by'])
+
+    stmt = select(
+        bucket, key.label('key'), label.label('label'), func.count().label('count')
+    ).select_from(Enrollment).join(
+        Batch, Batch.id == Enrollment.batch_id
+    )
+    if params['group_by'] != 'status':
+        stmt = stmt.join(Bootcamp, Bootcamp.id == Batch.bootcamp_id)
+
+    stmt = _filtered(stmt, params, start, end)
+    return stmt.group_by(bucket, key, label).order_by(bucket)
+
+
+def _series(rows, buckets):
+    """Dense per-group count lists aligned to `buckets`"""
+    position = {day: i for i, day in enumerate(buckets)}
+    series = {}
+    for row in rows:
+        key = row.key.value if isinstance(row.key, EnrollmentStatus) else str(row.key)
+        label = row.label.value if isinstance(row.label, EnrollmentStatus) else row.label
+        entry = series.setdefault(key, {'key': key, 'label': label, 'counts': [0] * len(buckets)})
+        entry['counts'][position[_as_date(row.bucket)]] += row.count
+    for entry in series.values():
+        entry['total'] = sum(entry['counts'])
+    return sorted(series.values(), key=lambda entry: -entry['total'])
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def summary_query(params):
+    """Totals by status over the report window in one FILTER aggregate"""
+    stmt = select(
+        func.count().label('total'),
+        func.count().filter(Enrollment.status == EnrollmentStatus.ACTIVE).label('active'),
+        func.count().filter(Enrollment.status == EnrollmentStatus.PENDING).label('pending'),
+        func.count().filter(Enrollment.status == EnrollmentStatus.COMPLETED).label('completed'),
+        func.count().filter(Enrollment.status == EnrollmentStatus.DROPPED).label('dropped')
+    ).select_from(Enrollment).join(Batch, Batch.id == Enrollment.batch_id)
+    return _filtered(stmt, params, params['start'], params['end'])
+
+
+def enrollment_report(params):
+    """The report as JSON-ready data"""
+    granularity = params['granularity']
+    buckets = bucket_range(params['start'], params['end'], granularity)
+    rows = db.session.execute(bucket_query(params, params['start'], params['end'])).all()
+    series = _series(rows, buckets)
+
+    report = {
+        'granularity': granularity,
+        'group_by': params['group_by'],
+        'start': params['start'].isoformat(),
+        'end': params['end'].isoformat(),
+        'buckets': [day.isoformat() for day in buckets],
+        'series': series,
+        'totals': [sum(counts) for counts in zip(*(entry['counts'] for entry in series))] or [0] * len(buckets),
+        'summary': dict(db.session.execute(summary_query(params)).one()._mapping),
+        'comparison': None,
+    }
+
+    if params['compare']:
+        start, end = comparison_window(params['start'], params['end'], params['compare'])
+        previous_buckets = bucket_range(start, end, granularity)
+        previous = _series(db.session.execute(bucket_query(params, start, end)).all(), previous_buckets)
+        totals = [sum(counts) for counts in zip(*(entry['counts'] for entry in previous))]
+        totals = (totals + [0] * len(buckets))[:len(buckets)] if totals else [0] * len(buckets)
+        report['comparison'] = {
+            'mode': params['compare'],
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            # Aligned by position, so bucket i here compares with bucket i above
+            'totals': totals,
+            'series': {entry['key']: entry['total'] for entry in previous},
+        }
+    return report
+
+
+def encode_cursor(enrolled_at, enrollment_id):
+    raw = f'{enrolled_at.isoformat()}|{enrollment_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(enrolled_at, enrollment_id) from an opaque cursor, or None if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        enrolled_at, enrollment_id = raw.split('|')
+        return datetime.fromisoformat(enrolled_at), uuid.UUID(enrollment_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def drilldown(params, bucket, cursor=None, limit=50):
+    """
+    Enrollments in one bucket, newest first, keyset-paginated on
+    (enrolled_at, id) so every page is an index range scan.
+    Returns (rows, next_cursor).
+    """
+    start = bucket_start(bucket, params['granularity'])
+    end = next_bucket(start, params['granularity']) - timedelta(days=1)
+
+    stmt = select(
+        Enrollment.id,
+        Enrollment.status,
+        Enrollment.enrolled_at,
+        Enrollment.progress_percentage,
+        User.full_name.label('student_name'),
+        User.email.label('student_email'),
+        Bootcamp.title.label('bootcamp_title'),
+        Batch.name.label('batch_name')
+    ).join(
+        User, User.id == Enrollment.student_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    )
+    stmt = _filtered(stmt, params, start, end)
+
+    group_key = params.get('group_key')
+    if group_key:
+        if params['group_by'] == 'status':
+            stmt = stmt.where(Enrollment.status == EnrollmentStatus(group_key))
+        elif params['group_by'] == 'bootcamp':
+            stmt = stmt.where(Batch.bootcamp_id == uuid.UUID(group_key))
+        else:
+            stmt = stmt.where(Enrollment.batch_id == uuid.UUID(group_key))
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        stmt = stmt.where(tuple_(Enrollment.enrolled_at, Enrollment.id) < position)
+
+    rows = db.session.execute(
+        stmt.order_by(Enrollment.enrolled_at.desc(), Enrollment.id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].enrolled_at, rows[-1].id)
+
+    return rows, next_cursor
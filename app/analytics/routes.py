@@ -4,7 +4,7 @@ Analytics Module Routes
 from flask import Blueprint, render_template
 from flask_login import login_required
 from app.extensions import db
-from app.models import Lead, Enrollment, Payment, User, Batch, LeadStatus, UserRole, EnrollmentStatus, PaymentStatus, BatchStatus
+from app.models import Enrollment, Payment, User, Batch, PaymentStatus
 from app.auth.utils import admin_required
 from sqlalchemy import func
 from datetime import datetime, timedelta
@@ -16,64 +16,163 @@ analytics_bp = Blueprint('analytics', __name__)
 @admin_required
 def admin_dashboard():
     """Admin analytics dashboard"""
+    from app.analytics.dashboard import get_snapshot
     
-    # Lead stats
-    total_leads = Lead.query.count()
-    new_leads = Lead.query.filter_by(status=LeadStatus.NEW).count()
-    converted_leads = Lead.query.filter_by(status=LeadStatus.CONVERTED).count()
-    conversion_rate = (converted_leads / total_leads * 100) if total_leads > 0 else 0
-    
-    # User stats
-    total_students = User.query.filter_by(role=UserRole.STUDENT).count()
-    total_instructors = User.query.filter_by(role=UserRole.INSTRUCTOR).count()
-    
-    # Enrollment stats
-    total_enrollments = Enrollment.query.count()
-    active_enrollments = Enrollment.query.filter_by(status=EnrollmentStatus.ACTIVE).count()
-    
-    # Revenue stats
-    total_revenue = db.session.query(func.sum(Payment.amount)).filter_by(status=PaymentStatus.COMPLETED).scalar() or 0
-    
-    # Recent activity
-    recent_enrollments = Enrollment.query.order_by(Enrollment.created_at.desc()).limit(10).all()
-    recent_leads = Lead.query.order_by(Lead.created_at.desc()).limit(10).all()
-    
-    # Batch stats
-    active_batches = Batch.query.filter_by(status=BatchStatus.ONGOING).count()
-    upcoming_batches = Batch.query.filter_by(status=BatchStatus.UPCOMING).count()
-    
-    # Create stats dictionary for template
-    stats = {
-        'total_leads': total_leads,
-        'new_leads': new_leads,
-        'converted_leads': converted_leads,
-        'conversion_rate': conversion_rate,
-        'total_students': total_students,
-        'total_instructors': total_instructors,
-        'total_enrollments': total_enrollments,
-        'active_enrollments': active_enrollments,
-        'total_revenue': total_revenue,
-        'active_batches': active_batches,
-        'upcoming_batches': upcoming_batches
-    }
+    snapshot = get_snapshot()
     
     return render_template('admin/admin_dashboard.html',
-                         stats=stats,
-                         recent_enrollments=recent_enrollments,
-                         recent_leads=recent_leads)
+                         stats=snapshot['stats'],
+                         recent_enrollments=snapshot['recent_enrollments'],
+                         recent_leads=snapshot['recent_leads'],
+                         computed_at=snapshot['computed_at'])
 
 
 @analytics_bp.route('/reports/revenue')
 @admin_required
 def revenue_report():
-    """Revenue report"""
-    payments = Payment.query.filter_by(status=PaymentStatus.COMPLETED).all()
-    return render_template('admin/revenue_report.html', payments=payments)
+    """Revenue report - totals in SQL, latest payments on screen, full history via export"""
+    from app.models import Bootcamp
+    
+    total, count = db.session.query(
+        func.coalesce(func.sum(Payment.amount), 0),
+        func.count(Payment.id)
+    ).filter(Payment.status == PaymentStatus.COMPLETED).one()
+    
+    payments = db.session.query(
+        Payment.id,
+        Payment.amount,
+        Payment.payment_method,
+        Payment.status,
+        Payment.created_at,
+        User.full_name.label('student_name'),
+        Bootcamp.title.label('bootcamp_title')
+    ).join(
+        Enrollment, Enrollment.id == Payment.enrollment_id
+    ).join(
+        User, User.id == Enrollment.student_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    ).filter(
+        Payment.status == PaymentStatus.COMPLETED
+    ).order_by(Payment.created_at.desc()).limit(100).all()
+    
+    summary = {
+        'total': float(total),
+        'count': count,
+        'average': float(total) / count if count else 0
+    }
+    
+    return render_template('admin/revenue_report.html', payments=payments, summary=summary)
 
 
 @analytics_bp.route('/reports/enrollments')
 @admin_required
 def enrollment_report():
-    """Enrollment trends report"""
-    enrollments = Enrollment.query.order_by(Enrollment.created_at.desc()).all()
-    return render_template('admin/enrollment_report.html', enrollments=enrollments)
+    """Enrollment trends bucketed by day, week or month, with an optional comparison period"""
+    from flask import request, jsonify, abort
+    from app.models import Bootcamp
+    from app.analytics.enrollments import parse_report_params, enrollment_report as build_report
+    
+    try:
+        params = parse_report_params(request.args)
+    except ValueError:
+        abort(400)
+    
+    report = build_report(params)
+    
+    if request.args.get('format') == 'json':
+        return jsonify(report)
+    
+    bootcamps = db.session.query(Bootcamp.id, Bootcamp.title).order_by(Bootcamp.title).all()
+    link_args = {key: value for key, value in request.args.items() if key != 'format'}
+    return render_template('admin/enrollment_report.html',
+                         report=report,
+                         params=params,
+                         bootcamps=bootcamps,
+                         link_args=link_args)
+
+
+@analytics_bp.route('/reports/enrollments/drilldown')
+@admin_required
+def enrollment_report_drilldown():
+    """Enrollments behind one report bucket, keyset-paginated"""
+    from datetime import date
+    from flask import request, jsonify, abort, current_app
+    from app.analytics.enrollments import parse_report_params, drilldown
+    
+    try:
+        params = parse_report_params(request.args)
+        bucket = date.fromisoformat(request.args.get('bucket', ''))
+        params['group_key'] = request.args.get('key')
+        limit = min(request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int), 100)
+        rows, next_cursor = drilldown(params, bucket, cursor=request.args.get('cursor'), limit=limit)
+    except ValueError:
+        abort(400)
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'items': [{
+                'enrollment_id': str(row.id),
+                'status': row.status.value,
+                'enrolled_at': row.enrolled_at.isoformat(),
+                'progress_percentage': row.progress_percentage or 0,
+                'student_name': row.student_name,
+                'student_email': row.student_email,
+                'bootcamp_title': row.bootcamp_title,
+                'batch_name': row.batch_name
+            } for row in rows],
+            'next_cursor': next_cursor
+        })
+    
+    link_args = {key: value for key, value in request.args.items() if key not in ('cursor', 'format')}
+    report_args = {key: value for key, value in link_args.items() if key not in ('bucket', 'key', 'limit')}
+    return render_template('admin/enrollment_drilldown.html',
+                         rows=rows,
+                         next_cursor=next_cursor,
+                         bucket=bucket,
+                         params=params,
+                         link_args=link_args,
+                         report_args=report_args)
+
+
+@analytics_bp.route('/cohorts')
+@admin_required
+def cohort_analytics():
+    """Cohort retention, dropout, milestone and grade curves for a batch"""
+    from flask import request
+    from app.models import Bootcamp
+    from app.analytics.cohorts import get_cohort_metrics
+    
+    batches = db.session.query(
+        Batch.id, Batch.name, Batch.start_date, Bootcamp.title.label('bootcamp_title')
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    ).order_by(Batch.start_date.desc()).all()
+    
+    batch_id = request.args.get('batch_id')
+    if batch_id:
+        batch = Batch.query.get_or_404(batch_id)
+    elif batches:
+        batch = db.session.get(Batch, batches[0].id)
+    else:
+        batch = None
+    
+    metrics = get_cohort_metrics(batch) if batch else None
+    
+    return render_template('admin/cohort_analytics.html',
+                         batches=batches,
+                         selected_batch=batch,
+                         metrics=metrics)
+
+
+@analytics_bp.route('/api/cohorts/<uuid:batch_id>')
+@admin_required
+def cohort_analytics_api(batch_id):
+    """Cohort metrics for a batch as JSON"""
+    from flask import jsonify
+    from app.analytics.cohorts import get_cohort_metrics
+    
+    batch = Batch.query.get_or_404(batch_id)
+    return jsonify(get_cohort_metrics(batch))
@@ -0,0 +1,86 @@
+"""
+Small in-process caches
+
+Each gunicorn worker keeps its own copy, so entries must be safe to serve
+slightly stale for their TTL. Invalidation only reaches the current worker;
+anything needing cross-worker freshness should use a short TTL.
+
+Invalidation triggered by a database write should go through
+delete_on_commit(), so a concurrent request can't re-cache the old rows
+between the flush and the commit, and a rollback leaves the cache alone.
+"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+# session.info key holding [(cache, keys)] to delete once the session commits
+_PENDING_DELETES = 'cache_deletes_on_commit'
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_deletes(session):
+    for cache, keys in session.info.pop(_PENDING_DELETES, ()):
+        for key in keys:
+            cache.delete(key)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending_deletes(session):
+    session.info.pop(_PENDING_DELETES, None)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Cached value for key, computing and storing it with factory() on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_on_commit(self, session, *keys):
+        """Delete keys once `session` commits its current transaction"""
+        session.info.setdefault(_PENDING_DELETES, []).append((self, keys))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
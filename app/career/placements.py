@@ -0,0 +1,146 @@
+"""
+Placement tracking - per-student application statistics and batch outcomes
+
+The tracker lists job-seeking students with their application and
+interview counts and their latest offer, all from one query: applications
+are counted in a grouped subquery and the latest offer is picked with
+ROW_NUMBER, both joined onto the profiles.
+
+Batch outcomes are aggregated in the database as well: graduates (completed
+enrollments), how many of them are placed, days from batch end to placement
+(mean and median) and offer amount percentiles.
+"""
+from sqlalchemy import select, func, and_, or_, case
+from app.extensions import db
+from app.models import (
+    StudentProfile, User, JobApplication, JobApplicationStatus, Enrollment, EnrollmentStatus,
+    Batch, Bootcamp
+)
+
+JOB_SEEKING = ['active', 'placed']
+
+# Statuses an application only reaches by way of an interview
+INTERVIEWED = [JobApplicationStatus.INTERVIEW, JobApplicationStatus.OFFER, JobApplicationStatus.ACCEPTED]
+
+OFFER_PERCENTILES = [0.25, 0.5, 0.75]
+
+
+def _in_batch(batch_id):
+    return select(Enrollment.student_id).where(Enrollment.batch_id == batch_id)
+
+
+def tracker_query(batch_id=None):
+    """
+    Query of (profile, user, applications, interviews, offer_company,
+    offer_position, offer_amount) per job seeker, ready to paginate
+    """
+    counts = select(
+        JobApplication.student_profile_id,
+        func.count().label('applications'),
+        func.count().filter(or_(
+            JobApplication.interview_date.isnot(None),
+            JobApplication.status.in_(INTERVIEWED)
+        )).label('interviews')
+    ).group_by(JobApplication.student_profile_id).subquery('application_counts')
+
+    offers = select(
+        JobApplication.student_profile_id,
+        JobApplication.company_name,
+        JobApplication.position,
+        JobApplication.offer_amount,
+        func.row_number().over(
+            partition_by=JobApplication.student_profile_id,
+            order_by=(JobApplication.applied_date.desc(), JobApplication.created_at.desc())
+        ).label('recency')
+    ).where(JobApplication.offer_received.is_(True)).subquery('offers')
+
+    query = db.session.query(
+        StudentProfile,
+        User,
+        func.coalesce(counts.c.applications, 0).label('applications'),
+        func.coalesce(counts.c.interviews, 0).label('interviews'),
+        offers.c.company_name.label('offer_company'),
+        offers.c.position.label('offer_position'),
+        offers.c.offer_amount
+    ).join(
+        User, User.id == StudentProfile.user_id
+    ).outerjoin(
+        counts, counts.c.student_profile_id == StudentProfile.id
+    ).outerjoin(
+        offers, and_(offers.c.student_profile_id == StudentProfile.id, offers.c.recency == 1)
+    ).where(
+        StudentProfile.job_search_status.in_(JOB_SEEKING)
+    ).order_by(StudentProfile.job_search_status, User.full_name, User.id)
+    if batch_id is not None:
+        query = query.where(StudentProfile.user_id.in_(_in_batch(batch_id)))
+    return query
+
+
+def _number(value, digits=1):
+    return None if value is None else round(float(value), digits)
+
+
+def batch_outcomes(batch_id=None):
+    """Placement rate, time to placement and offer percentiles per batch with graduates, latest first"""
+    placed = StudentProfile.placement_date.isnot(None)
+    days_to_place = func.greatest(StudentProfile.placement_date - Batch.end_date, 0)
+    graduates = select(
+        Batch.id,
+        Batch.name,
+        Batch.end_date,
+        Bootcamp.title.label('bootcamp'),
+        func.count(Enrollment.id).label('graduates'),
+        func.count().filter(placed).label('placed'),
+        func.avg(case((placed, days_to_place))).label('avg_days_to_place'),
+        func.percentile_cont(0.5).within_group(case((placed, days_to_place))).label('median_days_to_place')
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    ).join(
+        Enrollment, and_(Enrollment.batch_id == Batch.id, Enrollment.status == EnrollmentStatus.COMPLETED)
+    ).outerjoin(
+        StudentProfile, StudentProfile.user_id == Enrollment.student_id
+    ).group_by(Batch.id, Batch.name, Batch.end_date, Bootcamp.title).order_by(Batch.end_date.desc(), Batch.name)
+
+    offers = select(
+        Enrollment.batch_id,
+        func.count(JobApplication.id).label('offers'),
+        *(
+            func.percentile_cont(fraction).within_group(JobApplication.offer_amount).label(f'p{int(fraction * 100)}')
+            for fraction in OFFER_PERCENTILES
+        )
+    ).join(
+        StudentProfile, StudentProfile.user_id == Enrollment.student_id
+    ).join(
+        JobApplication, JobApplication.student_profile_id == StudentProfile.id
+    ).where(
+        Enrollment.status == EnrollmentStatus.COMPLETED,
+        JobApplication.offer_received.is_(True),
+        JobApplication.offer_amount.isnot(None)
+    ).group_by(Enrollment.batch_id)
+
+    if batch_id is not None:
+        graduates = graduates.where(Batch.id == batch_id)
+        offers = offers.where(Enrollment.batch_id == batch_id)
+
+    offer_stats = {row.batch_id: row for row in db.session.execute(offers)}
+
+    outcomes = []
+    for row in db.session.execute(graduates):
+        offer = offer_stats.get(row.id)
+        outcomes.append({
+            'batch_id': str(row.id),
+            'batch': row.name,
+            'bootcamp': row.bootcamp,
+            'end_date': row.end_date.isoformat(),
+            'graduates': row.graduates,
+            'placed': row.placed,
+            'placement_rate': round(row.placed / row.graduates * 100, 1) if row.graduates else 0.0,
+            'avg_days_to_place': _number(row.avg_days_to_place),
+            'median_days_to_place': _number(row.median_days_to_place),
+            'offers': offer.offers if offer else 0,
+            'offer_percentiles': {
+                f'p{int(fraction * 100)}': _number(getattr(offer, f'p{int(fraction * 100)}'), 2) if offer else None
+                for fraction in OFFER_PERCENTILES
+            }
+        })
+    return outcomes
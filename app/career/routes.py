@@ -123,33 +123,58 @@ def update_application(app_id):
 @login_required
 @role_required([UserRole.ADMIN, UserRole.INSTRUCTOR])
 def placement_tracker():
-    """Admin view of all student placements"""
-    profiles = StudentProfile.query.filter(
-        StudentProfile.job_search_status.in_(['active', 'placed'])
-    ).all()
-    
-    students_data = []
-    for profile in profiles:
-        user = db.session.get(User, profile.user_id)
-        if user:
-            applications = JobApplication.query.filter_by(
-                student_profile_id=profile.id
-            ).order_by(desc(JobApplication.applied_date)).all()
-            
-            latest_offer = None
-            for app in applications:
-                if app.offer_received:
-                    latest_offer = app
-                    break
-            
-            students_data.append({
-                'user': user,
-                'profile': profile,
-                'total_applications': len(applications),
-                'latest_offer': latest_offer
-            })
+    """Admin view of all student placements, with placement outcomes per batch"""
+    import uuid
+    from flask import abort, jsonify
+    from app.career.placements import tracker_query, batch_outcomes
+    
+    page = request.args.get('page', 1, type=int)
+    try:
+        batch_id = uuid.UUID(request.args['batch_id']) if request.args.get('batch_id') else None
+    except ValueError:
+        abort(400)
+    
+    rows = tracker_query(batch_id).paginate(page=page, per_page=50, error_out=False)
+    
+    students_data = [{
+        'user': row.User,
+        'profile': row.StudentProfile,
+        'total_applications': row.applications,
+        'interviews': row.interviews,
+        'latest_offer': {
+            'company_name': row.offer_company,
+            'position': row.offer_position,
+            'offer_amount': row.offer_amount
+        } if row.offer_company else None
+    } for row in rows.items]
+    outcomes = batch_outcomes(batch_id)
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'outcomes': outcomes,
+            'students': [{
+                'id': str(data['user'].id),
+                'full_name': data['user'].full_name,
+                'job_search_status': data['profile'].job_search_status,
+                'placement_date': data['profile'].placement_date.isoformat() if data['profile'].placement_date else None,
+                'applications': data['total_applications'],
+                'interviews': data['interviews'],
+                'latest_offer': dict(
+                    data['latest_offer'],
+                    offer_amount=float(data['latest_offer']['offer_amount'])
+                    if data['latest_offer']['offer_amount'] is not None else None
+                ) if data['latest_offer'] else None
+            } for data in students_data],
+            'page': rows.page,
+            'pages': rows.pages,
+            'total': rows.total
+        })
     
-    return render_template('career/placement_tracker.html', students_data=students_data)
+    return render_template('career/placement_tracker.html',
+                         students_data=students_data,
+                         students=rows,
+                         outcomes=outcomes,
+                         batch_id=batch_id)
 
 
 @bp.route('/alumni')
@@ -0,0 +1,75 @@
+"""
+Bulk certificate issuance for a completed batch
+"""
+import secrets
+from datetime import datetime
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from app.extensions import db
+from app.models import Certificate, Enrollment, EnrollmentStatus
+from app.certificates.verification import sync_verification_records
+from app.student_lifecycle.overview import forget as forget_overviews
+
+
+def generate_verification_codes(count):
+    """`count` distinct verification codes in the same format as lms.view_certificate"""
+    codes = set()
+    while len(codes) < count:
+        codes.add(secrets.token_urlsafe(16).upper())
+    return list(codes)
+
+
+def eligible_enrollments(batch_id):
+    """Ids of enrollments in the batch that completed but have no certificate yet"""
+    return db.session.scalars(
+        db.select(Enrollment.id).outerjoin(
+            Certificate, Certificate.enrollment_id == Enrollment.id
+        ).filter(
+            Enrollment.batch_id == batch_id,
+            Certificate.id.is_(None),
+            or_(
+                Enrollment.status == EnrollmentStatus.COMPLETED,
+                Enrollment.progress_percentage >= 100
+            )
+        )
+    ).all()
+
+
+def issue_batch_certificates(batch_id):
+    """
+    Issue certificates for every eligible enrollment in a batch.
+
+    Eligible rows are selected in one query and all Certificate rows are
+    inserted in one statement; enrollments that got a certificate
+    concurrently are skipped by ON CONFLICT. Newly issued enrollments are
+    marked completed in a single UPDATE and get their verification records
+    in one INSERT ... SELECT. Returns the new certificate ids;
+    the caller commits and queues rendering.
+    """
+    enrollment_ids = eligible_enrollments(batch_id)
+    if not enrollment_ids:
+        return []
+
+    now = datetime.utcnow()
+    codes = generate_verification_codes(len(enrollment_ids))
+    stmt = insert(Certificate).values([
+        {'enrollment_id': enrollment_id, 'verification_code': code, 'issued_at': now}
+        for enrollment_id, code in zip(enrollment_ids, codes)
+    ]).on_conflict_do_nothing().returning(Certificate.id, Certificate.enrollment_id)
+    issued = db.session.execute(stmt).all()
+
+    if issued:
+        completed = db.session.scalars(
+            db.update(Enrollment).where(
+                Enrollment.id.in_([row.enrollment_id for row in issued])
+            ).values(
+                status=EnrollmentStatus.COMPLETED,
+                completed_at=db.func.coalesce(Enrollment.completed_at, now)
+            ).returning(Enrollment.student_id)
+        ).all()
+        # Core updates skip ORM events, so drop the students' cached snapshots here
+        forget_overviews(*completed)
+        # Core inserts skip ORM events, so publish verification rows here
+        sync_verification_records([row.id for row in issued])
+
+    return [row.id for row in issued]
@@ -0,0 +1,187 @@
+"""
+Certificate PDF rendering
+
+PDFs are rendered outside the request path and cached on disk under UPLOAD_FOLDER/certificates, keyed by a hash of the
+template version and every value printed on the certificate. Re-rendering
+identical data is a cache hit; changing the template bumps the version.
+
+Background jobs queued by web requests render in their own thread; only the
+CLI commands fan misses out over a process pool, since forking a web
+worker is not safe.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, url_for
+from app.extensions import db
+from app.models import Certificate, Enrollment, Batch, Bootcamp, User, StoredFile
+
+# Bump whenever draw_certificate changes so cached PDFs are regenerated
+TEMPLATE_VERSION = '1'
+
+
+def cache_key(payload):
+    data = json.dumps({'template': TEMPLATE_VERSION, **payload}, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def cache_path(key):
+    """Storage path relative to UPLOAD_FOLDER"""
+    return os.path.join('certificates', key[:2], f'{key}.pdf')
+
+
+def draw_certificate(payload, destination):
+    """
+    Render one certificate PDF to `destination`.
+
+    May run in pool processes, so it only takes plain data and touches
+    neither the app nor the database. Writes to a temp file first so a
+    crashed render never leaves a truncated PDF in the cache.
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib import colors
+    from reportlab.pdfgen import canvas
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    tmp_path = f'{destination}.{os.getpid()}.tmp'
+
+    width, height = landscape(A4)
+    pdf = canvas.Canvas(tmp_path, pagesize=(width, height))
+    pdf.setTitle(f"Certificate - {payload['student_name']}")
+
+    pdf.setStrokeColor(colors.HexColor('#4f46e5'))
+    pdf.setLineWidth(4)
+    pdf.rect(30, 30, width - 60, height - 60)
+
+    pdf.setFillColor(colors.HexColor('#111827'))
+    pdf.setFont('Helvetica-Bold', 36)
+    pdf.drawCentredString(width / 2, height - 130, 'Certificate of Completion')
+
+    pdf.setFont('Helvetica', 16)
+    pdf.drawCentredString(width / 2, height - 185, 'This is to certify that')
+
+    pdf.setFont('Helvetica-Bold', 30)
+    pdf.drawCentredString(width / 2, height - 235, payload['student_name'])
+
+    pdf.setFont('Helvetica', 16)
+    pdf.drawCentredString(width / 2, height - 280, 'has successfully completed')
+    pdf.setFont('Helvetica-Bold', 22)
+    pdf.drawCentredString(width / 2, height - 315, payload['bootcamp_title'])
+    pdf.setFont('Helvetica', 13)
+    pdf.drawCentredString(width / 2, height - 340,
+                          f"{payload['batch_name']} - {payload['duration_weeks']} weeks")
+
+    pdf.setFont('Helvetica', 12)
+    pdf.drawString(70, 95, f"Issued: {payload['issued_on']}")
+    pdf.drawString(70, 75, f"Issued by: {payload['issuer']}")
+    pdf.drawRightString(width - 70, 95, f"Verification code: {payload['verification_code']}")
+    pdf.drawRightString(width - 70, 75, payload['verification_url'])
+
+    pdf.showPage()
+    pdf.save()
+    os.replace(tmp_path, destination)
+    return destination
+
+
+def pending_certificates(limit, certificate_ids=None):
+    """
+    Certificates without a rendered PDF, with everything printed on them,
+    from one joined query.
+    """
+    stmt = db.select(
+        Certificate.id,
+        Certificate.verification_code,
+        Certificate.issued_at,
+        User.full_name,
+        Bootcamp.title,
+        Bootcamp.duration_weeks,
+        Batch.name
+    ).join(
+        Enrollment, Enrollment.id == Certificate.enrollment_id
+    ).join(
+        User, User.id == Enrollment.student_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    ).filter(
+        Certificate.file_id.is_(None)
+    ).order_by(Certificate.issued_at)
+
+    if certificate_ids is not None:
+        stmt = stmt.filter(Certificate.id.in_(certificate_ids))
+
+    return db.session.execute(stmt.limit(limit)).all()
+
+
+def render_pending(limit=500, workers=None, certificate_ids=None, pool=False):
+    """
+    Render PDFs for certificates that don't have one yet.
+
+    Cache misses are rendered one by one in the calling thread, or in
+    parallel in a process pool of `workers` when `pool` is set (CLI only);
+    hits (same key already on disk) are linked without rendering. Each certificate gets a
+    StoredFile and its certificate_url. Returns (rendered, cached) counts.
+    """
+    config = current_app.config
+    root = config['UPLOAD_FOLDER']
+
+    jobs = []
+    for row in pending_certificates(limit, certificate_ids):
+        payload = {
+            'student_name': row.full_name,
+            'bootcamp_title': row.title,
+            'duration_weeks': row.duration_weeks,
+            'batch_name': row.name,
+            'issued_on': row.issued_at.strftime('%B %d, %Y'),
+            'verification_code': row.verification_code,
+            'verification_url': f"{config['CERTIFICATE_VERIFICATION_URL']}{row.verification_code}",
+            'issuer': config['CERTIFICATE_ISSUER']
+        }
+        relative = cache_path(cache_key(payload))
+        jobs.append((row.id, payload, relative))
+
+    missing = [job for job in jobs if not os.path.exists(os.path.join(root, job[2]))]
+    if missing and pool:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Consume the results so render errors surface here
+            list(executor.map(draw_certificate,
+                              [payload for _, payload, _ in missing],
+                              [os.path.join(root, relative) for _, _, relative in missing]))
+    else:
+        for _, payload, relative in missing:
+            draw_certificate(payload, os.path.join(root, relative))
+
+    # url_for needs a request context; CLI runs have none
+    with current_app.test_request_context():
+        for certificate_id, payload, relative in jobs:
+            stored = _stored_file_for(root, relative)
+            certificate = db.session.get(Certificate, certificate_id)
+            certificate.file_id = stored.id
+            certificate.certificate_url = url_for('files.download_certificate', certificate_id=certificate_id)
+    db.session.commit()
+
+    return len(missing), len(jobs) - len(missing)
+
+
+def _stored_file_for(root, relative):
+    """StoredFile row for a rendered PDF, hashed by content"""
+    path = os.path.join(root, relative)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(data)
+    sha256 = digest.hexdigest()
+
+    stored = StoredFile.query.filter_by(sha256=sha256).first()
+    if not stored:
+        stored = StoredFile(
+            sha256=sha256,
+            size_bytes=os.path.getsize(path),
+            content_type='application/pdf',
+            storage_path=relative
+        )
+        db.session.add(stored)
+        db.session.flush()
+    return stored
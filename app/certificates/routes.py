@@ -1,8 +1,10 @@
 """
 Certificates Module Routes
 """
-from flask import Blueprint, render_template, abort, send_file
-from app.models import Certificate, Enrollment
+from flask import Blueprint, render_template, abort, send_file, request, redirect, url_for, flash, jsonify
+from app.models import Certificate, Enrollment, Batch
+from app.auth.utils import admin_required
+from datetime import datetime
 import uuid
 
 certificates_bp = Blueprint('certificates', __name__)
@@ -11,21 +13,30 @@ certificates_bp = Blueprint('certificates', __name__)
 @certificates_bp.route('/verify/<verification_code>')
 def verify_certificate(verification_code):
     """Public certificate verification"""
-    certificate = Certificate.query.filter_by(verification_code=verification_code).first()
+    from app.certificates.verification import lookup
     
-    if not certificate:
-        return render_template('shared/certificate_invalid.html'), 404
-    
-    enrollment = certificate.enrollment
-    student = enrollment.student
-    batch = enrollment.batch
-    bootcamp = batch.bootcamp
+    record = lookup(verification_code)
+    if not record:
+        return render_template('shared/certificate_invalid.html',
+                             verification_code=verification_code,
+                             checked_at=datetime.utcnow()), 404
     
     return render_template('shared/certificate_valid.html',
-                         certificate=certificate,
-                         student=student,
-                         bootcamp=bootcamp,
-                         batch=batch)
+                         record=record,
+                         checked_at=datetime.utcnow())
+
+
+@certificates_bp.route('/api/verify/<verification_code>')
+def verify_certificate_json(verification_code):
+    """Public certificate verification for automated (employer) checks"""
+    from app.certificates.verification import lookup, as_json
+    
+    record = lookup(verification_code)
+    response = jsonify(as_json(record, verification_code))
+    response.status_code = 200 if record else 404
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600 if record else 300
+    return response
 
 
 @certificates_bp.route('/generate/<uuid:enrollment_id>')
@@ -55,11 +66,50 @@ def generate_certificate(enrollment_id):
         )
         
         from app.extensions import db
+        from app.jobs import enqueue
+        from app.certificates.renderer import render_pending
         db.session.add(certificate)
         db.session.commit()
         
+        enqueue(render_pending, certificate_ids=[certificate.id])
+        
         return render_template('shared/certificate_generated.html',
                              certificate=certificate)
     
     except Exception as e:
         return abort(500, f'Certificate generation failed: {str(e)}')
+
+
+@certificates_bp.route('/batch/<uuid:batch_id>/issue', methods=['POST'])
+@admin_required
+def issue_batch(batch_id):
+    """Issue certificates for every eligible enrollment in a batch at once"""
+    from app.extensions import db
+    from app.jobs import enqueue
+    from app.certificates.issuance import issue_batch_certificates
+    from app.certificates.renderer import render_pending
+    
+    batch = Batch.query.get_or_404(batch_id)
+    
+    try:
+        certificate_ids = issue_batch_certificates(batch.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if request.is_json:
+            return jsonify({'success': False, 'error': str(e)}), 500
+        flash(f'Error issuing certificates: {str(e)}', 'danger')
+        return redirect(request.referrer or url_for('crm.list_batches'))
+    
+    # PDFs are rendered in a background thread, off the request path
+    if certificate_ids:
+        enqueue(render_pending, limit=len(certificate_ids), certificate_ids=certificate_ids)
+    
+    if request.is_json:
+        return jsonify({'success': True, 'issued': len(certificate_ids)})
+    
+    if certificate_ids:
+        flash(f'Issued {len(certificate_ids)} certificates for {batch.name}. PDFs are being generated.', 'success')
+    else:
+        flash('No eligible enrollments without a certificate in this batch.', 'info')
+    return redirect(request.referrer or url_for('crm.list_batches'))
@@ -0,0 +1,120 @@
+"""
+Public certificate verification
+
+Each certificate has a denormalized CertificateVerification row, so a lookup
+is one primary-key read instead of certificate -> enrollment -> student ->
+batch -> bootcamp lazy loads. The rows are rebuilt when a student, batch or
+bootcamp is renamed (see app.events). Results are cached per worker. Unknown codes
+are cached too (negative cache), and strings that cannot be a code are
+rejected before touching the database, so scraping and guessing stay cheap.
+"""
+import re
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert
+from app.cache import TTLCache
+from app.extensions import db
+from app.models import CertificateVerification, Certificate, Enrollment, User, Batch, Bootcamp
+
+# token_urlsafe(16).upper() codes and the older 8-char uuid prefixes
+CODE_PATTERN = re.compile(r'^[A-Z0-9_-]{6,64}$')
+
+_hits = TTLCache(maxsize=10000, ttl=600)
+_misses = TTLCache(maxsize=50000, ttl=300)
+
+
+def verification_upsert(certificate_ids=None):
+    """INSERT ... SELECT building verification rows for the given certificates (all if None)"""
+    source = db.select(
+        Certificate.verification_code,
+        Certificate.id,
+        User.full_name,
+        Bootcamp.title,
+        Bootcamp.duration_weeks,
+        Batch.name,
+        Certificate.issued_at,
+        Enrollment.completed_at,
+        db.func.now()
+    ).join(
+        Enrollment, Enrollment.id == Certificate.enrollment_id
+    ).join(
+        User, User.id == Enrollment.student_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    )
+    if certificate_ids is not None:
+        source = source.filter(Certificate.id.in_(certificate_ids))
+
+    stmt = insert(CertificateVerification).from_select(
+        ['verification_code', 'certificate_id', 'student_name', 'bootcamp_title',
+         'duration_weeks', 'batch_name', 'issued_at', 'completed_at', 'updated_at'],
+        source
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[CertificateVerification.verification_code],
+        set_={
+            'student_name': stmt.excluded.student_name,
+            'bootcamp_title': stmt.excluded.bootcamp_title,
+            'duration_weeks': stmt.excluded.duration_weeks,
+            'batch_name': stmt.excluded.batch_name,
+            'issued_at': stmt.excluded.issued_at,
+            'completed_at': stmt.excluded.completed_at,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+
+
+def sync_verification_records(certificate_ids=None):
+    """Create or refresh verification rows; the caller commits"""
+    db.session.execute(verification_upsert(certificate_ids))
+
+
+def lookup(code):
+    """Verification data for a code as a plain dict, or None if it is not a valid certificate"""
+    code = (code or '').strip()
+    if not CODE_PATTERN.match(code):
+        return None
+    if code in _misses:
+        return None
+
+    record = _hits.get(code)
+    if record is None:
+        row = db.session.get(CertificateVerification, code)
+        if row is None:
+            _misses.set(code, True)
+            return None
+        record = {
+            'verification_code': row.verification_code,
+            'student_name': row.student_name,
+            'bootcamp_title': row.bootcamp_title,
+            'duration_weeks': row.duration_weeks,
+            'batch_name': row.batch_name,
+            'issued_at': row.issued_at,
+            'completed_at': row.completed_at
+        }
+        _hits.set(code, record)
+    return record
+
+
+def as_json(record, code):
+    """Response body for automated checks"""
+    if record is None:
+        return {'valid': False, 'verification_code': code, 'checked_at': datetime.utcnow().isoformat()}
+    return {
+        'valid': True,
+        'verification_code': record['verification_code'],
+        'student_name': record['student_name'],
+        'program': record['bootcamp_title'],
+        'duration_weeks': record['duration_weeks'],
+        'batch': record['batch_name'],
+        'issued_at': record['issued_at'].isoformat(),
+        'completed_at': record['completed_at'].isoformat() if record['completed_at'] else None,
+        'checked_at': datetime.utcnow().isoformat()
+    }
+
+
+def forget(*codes):
+    """Drop codes from this worker's caches once the current transaction commits (e.g. after revocation)"""
+    _hits.delete_on_commit(db.session, *codes)
+    _misses.delete_on_commit(db.session, *codes)
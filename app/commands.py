@@ -0,0 +1,196 @@
+"""
+Flask CLI commands for batch jobs (run via `flask <command>` or a cron service)
+"""
+import click
+from app.extensions import db
+
+
+def register_commands(app):
+    """Register CLI commands on the app"""
+
+    @app.cli.command('import-zoom-attendance')
+    @click.argument('schedule_id')
+    @click.argument('report', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--min-minutes', type=int, default=None,
+                  help='Minutes attended to count as present (default: ZOOM_ATTENDANCE_MIN_MINUTES)')
+    def import_zoom_attendance_command(schedule_id, report, min_minutes):
+        """Import a Zoom participant report for a class session."""
+        import uuid
+        from app.models import ClassSchedule
+        from app.lms.zoom_import import ZoomReportError, import_zoom_attendance
+
+        schedule = db.session.get(ClassSchedule, uuid.UUID(schedule_id))
+        if not schedule:
+            raise click.ClickException(f'Class schedule {schedule_id} not found')
+
+        if min_minutes is None:
+            min_minutes = app.config['ZOOM_ATTENDANCE_MIN_MINUTES']
+
+        with open(report, encoding='utf-8-sig', newline='') as stream:
+            try:
+                summary = import_zoom_attendance(schedule, stream, min_minutes)
+            except ZoomReportError as e:
+                raise click.ClickException(str(e))
+        db.session.commit()
+
+        click.echo(f"✓ {summary['present']}/{summary['enrolled']} present on {summary['session_date']}")
+        if summary['unmatched_emails']:
+            click.echo(f"  Unmatched participants: {', '.join(summary['unmatched_emails'])}")
+
+    @app.cli.command('purge-stale-uploads')
+    @click.option('--hours', type=int, default=48, help='Age of abandoned uploads to remove')
+    def purge_stale_uploads_command(hours):
+        """Delete incomplete uploads and their part files."""
+        from datetime import datetime, timedelta
+        from app.models import UploadSession
+        from app.files import storage
+
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        stale = UploadSession.query.filter(
+            UploadSession.completed_at.is_(None),
+            UploadSession.updated_at < cutoff
+        ).all()
+        for upload in stale:
+            storage.discard(upload)
+            db.session.delete(upload)
+        db.session.commit()
+
+        click.echo(f'✓ Removed {len(stale)} stale uploads')
+
+    @app.cli.command('render-certificates')
+    @click.option('--limit', type=int, default=500, help='Certificates to process per run')
+    @click.option('--workers', type=int, default=None, help='Render processes (default: CPU count)')
+    def render_certificates_command(limit, workers):
+        """Render PDFs for certificates that don't have one yet."""
+        from app.certificates.renderer import render_pending
+
+        rendered, cached = render_pending(limit=limit, workers=workers, pool=True)
+        click.echo(f'✓ Rendered {rendered} certificates ({cached} served from cache)')
+
+    @app.cli.command('issue-certificates')
+    @click.argument('batch_id')
+    @click.option('--workers', type=int, default=None, help='Render processes (default: CPU count)')
+    def issue_certificates_command(batch_id, workers):
+        """Issue and render certificates for a whole batch."""
+        import uuid
+        from app.certificates.issuance import issue_batch_certificates
+        from app.certificates.renderer import render_pending
+
+        certificate_ids = issue_batch_certificates(uuid.UUID(batch_id))
+        db.session.commit()
+        click.echo(f'✓ Issued {len(certificate_ids)} certificates')
+
+        if certificate_ids:
+            rendered, cached = render_pending(limit=len(certificate_ids), workers=workers,
+                                              certificate_ids=certificate_ids, pool=True)
+            click.echo(f'✓ Rendered {rendered} PDFs ({cached} served from cache)')
+
+    @app.cli.command('reconcile-revenue')
+    @click.option('--days', type=int, default=7, help='Days back to rebuild')
+    @click.option('--all', 'rebuild_all', is_flag=True, help='Rebuild the whole rollup')
+    def reconcile_revenue_command(days, rebuild_all):
+        """Rebuild the daily revenue rollup from payments (run nightly)."""
+        from app.payments.revenue import rebuild_revenue_daily, reconcile_recent
+
+        rows = rebuild_revenue_daily() if rebuild_all else reconcile_recent(days)
+        db.session.commit()
+        click.echo(f'✓ Rebuilt {rows} revenue rollup rows')
+
+    @app.cli.command('process-payment-events')
+    @click.option('--batch-size', type=int, default=None, help='Events per batch (default: PAYMENT_EVENTS_BATCH_SIZE)')
+    def process_payment_events_command(batch_size):
+        """Apply stored gateway webhook events (recovers anything the web workers missed)."""
+        from app.payments.webhooks import process_payment_events
+
+        processed = process_payment_events(batch_size)
+        click.echo(f'✓ Processed {processed} payment events')
+
+    @app.cli.command('fake-gateway-event')
+    @click.argument('transaction_id')
+    @click.argument('status', type=click.Choice(['pending', 'completed', 'failed', 'refunded']))
+    @click.option('--amount', default=None, help='Amount, for payments first seen via webhook')
+    @click.option('--enrollment-id', default=None, help='Enrollment, for payments first seen via webhook')
+    @click.option('--attempts', type=int, default=1, help='Deliver the same event this many times')
+    def fake_gateway_event_command(transaction_id, status, amount, enrollment_id, attempts):
+        """Send a signed webhook from the local fake gateway (development only)."""
+        from app.payments.gateway import FakeGateway
+        from app.payments.webhooks import process_payment_events
+
+        gateway = FakeGateway(app.config['PAYMENT_WEBHOOK_SECRET'])
+        event = gateway.event(transaction_id, status, amount=amount, enrollment_id=enrollment_id)
+        responses = gateway.deliver(app.test_client(), event, attempts=attempts)
+        for response in responses:
+            click.echo(f'{response.status_code} {response.get_json()}')
+
+        processed = process_payment_events()
+        click.echo(f'✓ Processed {processed} payment events')
+
+    @app.cli.command('reconcile-settlement')
+    @click.argument('statement', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--window', type=int, default=None,
+                  help='Days between payment and settlement (default: SETTLEMENT_MATCH_WINDOW_DAYS)')
+    @click.option('--output', type=click.Path(dir_okay=False), default=None,
+                  help='Write the exceptions report to this CSV file')
+    def reconcile_settlement_command(statement, window, output):
+        """Match a gateway/bank settlement CSV against payments."""
+        from app.payments.reconciliation import parse_settlement_file, reconcile, report_csv
+
+        if window is None:
+            window = app.config['SETTLEMENT_MATCH_WINDOW_DAYS']
+
+        with open(statement, encoding='utf-8-sig', newline='') as stream:
+            lines, unreadable = parse_settlement_file(stream)
+        report = reconcile(lines, window_days=window)
+        db.session.rollback()
+
+        for category, count in report['summary'].items():
+            click.echo(f'  {category}: {count}')
+        if unreadable:
+            click.echo(f"  Unreadable lines: {', '.join(map(str, unreadable))}")
+        if output:
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                f.write(report_csv(report))
+            click.echo(f'✓ Wrote {len(report["entries"])} exceptions to {output}')
+
+    @app.cli.command('score-at-risk')
+    def score_at_risk_command():
+        """Recompute risk scores for every active student (run nightly)."""
+        from app.models import StudentProfile, RAGRating
+        from app.student_lifecycle.risk import score_students
+
+        scored = score_students()
+        db.session.commit()
+        counts = dict(
+            db.session.query(StudentProfile.risk_rating, db.func.count())
+            .filter(StudentProfile.risk_rating.isnot(None))
+            .group_by(StudentProfile.risk_rating).all()
+        )
+        click.echo(f'✓ Scored {scored} students')
+        for rating in RAGRating:
+            click.echo(f'  {rating.value}: {counts.get(rating, 0)}')
+
+    @app.cli.command('refresh-profile-metrics')
+    def refresh_profile_metrics_command():
+        """Recompute attendance, performance and engagement on every student profile (run nightly)."""
+        from app.student_lifecycle.metrics import refresh_profiles
+
+        refresh_profiles(db.session.connection())
+        db.session.commit()
+        click.echo('✓ Refreshed student profile metrics')
+
+    @app.cli.command('export-snapshot')
+    @click.option('--table', 'tables', multiple=True, help='Table to export (repeatable; default: all)')
+    @click.option('--output', default=None, help='Snapshot directory (default: SNAPSHOT_DIR)')
+    @click.option('--full', is_flag=True, help='Ignore watermarks and export every row')
+    def export_snapshot_command(tables, output, full):
+        """Append changed rows of core tables to the Parquet snapshot (run nightly)."""
+        from app.analytics.snapshot import TABLES, export_snapshot
+
+        unknown = [name for name in tables if name not in TABLES]
+        if unknown:
+            raise click.BadParameter(f"Unknown tables: {', '.join(unknown)} (choose from {', '.join(TABLES)})")
+
+        counts = export_snapshot(output, tables=tables or None, full=full)
+        for table_name, written in counts.items():
+            click.echo(f'  {table_name}: {written}')
+        click.echo(f'✓ Exported {sum(counts.values())} rows to {output or app.config["SNAPSHOT_DIR"]}')
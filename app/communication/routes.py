@@ -313,18 +313,50 @@ def take_survey(survey_id):
 @login_required
 @role_required([UserRole.ADMIN, UserRole.INSTRUCTOR])
 def survey_results(survey_id):
-    """View survey results"""
+    """Per-question statistics for a survey"""
+    from app.communication.surveys import get_results
+    
     survey = db.session.get(Survey, survey_id)
     if not survey:
         flash('Survey not found', 'error')
         return redirect(url_for('communication.list_surveys'))
     
-    responses = SurveyResponse.query.filter_by(survey_id=survey_id).all()
+    results = get_results(survey_id)
     
-    # Analyze responses
-    total_responses = len(responses)
+    if request.args.get('format') == 'json':
+        return jsonify(results)
     
     return render_template('communication/survey_results.html',
                          survey=survey,
-                         responses=responses,
-                         total_responses=total_responses)
+                         results=results,
+                         total_responses=results['responses'])
+
+
+@bp.route('/surveys/compare')
+@login_required
+@role_required([UserRole.ADMIN, UserRole.INSTRUCTOR])
+def compare_surveys():
+    """Rating questions of one survey type compared across batches and instructors"""
+    import uuid
+    from flask import abort
+    from app.communication.surveys import compare
+    
+    try:
+        survey_type = SurveyType(request.args.get('type', SurveyType.INSTRUCTOR_EVAL.value))
+        batch_id = uuid.UUID(request.args['batch_id']) if request.args.get('batch_id') else None
+        instructor_id = uuid.UUID(request.args['instructor_id']) if request.args.get('instructor_id') else None
+    except ValueError:
+        abort(400)
+    
+    # Instructors only compare their own surveys
+    if current_user.role == UserRole.INSTRUCTOR:
+        instructor_id = current_user.id
+    
+    comparison = compare(survey_type, batch_id=batch_id, instructor_id=instructor_id)
+    
+    if request.args.get('format') == 'json':
+        return jsonify(comparison)
+    
+    return render_template('communication/survey_compare.html',
+                         comparison=comparison,
+                         survey_types=list(SurveyType))
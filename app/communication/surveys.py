@@ -0,0 +1,279 @@
+"""
+Survey results - per-question statistics computed from the raw responses
+
+Answers for any number of surveys are pulled in one query and flattened
+into a single long frame (survey, question, value). Every statistic is one
+group-by over that frame: counts, mean, median and spread for ratings,
+option counts for choice and yes/no questions, and a net score (share of
+top ratings minus share of low ones, NPS-style) for ratings. The same pass
+serves one survey's results page and the comparison of a survey type
+across batches and instructors.
+
+Results are cached per survey for two minutes and dropped once a change to
+its responses or questions commits (see app.events); other workers catch
+up when their entry expires.
+
+Question types come from Survey.questions: 'rating' (1-5, or 0-`max` when
+the question sets one), 'yes_no', 'multiple_choice' (answers may be a
+single option or a list) and 'text'. Answers are matched to questions by
+position; each answer is either the bare value or an object with an
+'answer' (or 'value') key.
+"""
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select
+from app.cache import TTLCache
+from app.extensions import db
+from app.models import Survey, SurveyResponse, Batch, Bootcamp, User
+
+TEXT_SAMPLE_SIZE = 20
+
+_results = TTLCache(maxsize=512, ttl=120)
+
+_YES = {'yes', 'y', 'true', '1'}
+_NO = {'no', 'n', 'false', '0'}
+
+
+def _answer(item):
+    if isinstance(item, dict):
+        return item.get('answer', item.get('value'))
+    return item
+
+
+def _positions(answers):
+    """(question position, answer) pairs from a stored responses blob"""
+    if isinstance(answers, dict):
+        for key, item in answers.items():
+            if str(key).isdigit():
+                yield int(key), _answer(item)
+    elif isinstance(answers, list):
+        for position, item in enumerate(answers):
+            if isinstance(item, dict) and isinstance(item.get('question_index'), int):
+                position = item['question_index']
+            yield position, _answer(item)
+
+
+def load_answers(survey_ids):
+    """Long frame of (survey_id, question, value, submitted_at), newest first, from one query"""
+    rows = db.session.execute(
+        select(SurveyResponse.survey_id, SurveyResponse.responses, SurveyResponse.submitted_at)
+        .where(SurveyResponse.survey_id.in_(survey_ids))
+        .order_by(SurveyResponse.submitted_at.desc())
+    )
+    records = []
+    response_counts = {}
+    for survey_id, answers, submitted_at in rows:
+        response_counts[survey_id] = response_counts.get(survey_id, 0) + 1
+        for position, value in _positions(answers):
+            if value is not None and value != '' and value != []:
+                records.append((survey_id, position, value, submitted_at))
+    frame = pd.DataFrame(records, columns=['survey_id', 'question', 'value', 'submitted_at'])
+    return frame, response_counts
+
+
+def _yes_no(value):
+    text = str(value).strip().lower()
+    if text in _YES:
+        return 'yes'
+    if text in _NO:
+        return 'no'
+    return None
+
+
+def aggregate(answers):
+    """
+    Every per-question aggregate for all surveys in the frame, as group-by
+    results keyed by (survey_id, question[, value]).
+    """
+    numbers = pd.to_numeric(answers['value'].where(~answers['value'].map(lambda v: isinstance(v, (list, bool)))),
+                            errors='coerce')
+    rated = answers.assign(number=numbers).dropna(subset=['number'])
+    keys = ['survey_id', 'question']
+
+    choices = answers.explode('value')
+    choices = choices[choices['value'].notna()].assign(choice=lambda f: f['value'].astype(str).str.strip())
+
+    return {
+        'answered': answers.groupby(keys).size(),
+        'ratings': rated.groupby(keys)['number'].agg(['count', 'mean', 'median', 'std']),
+        'rating_counts': rated.groupby(keys + ['number']).size(),
+        'choices': choices.groupby(keys + ['choice']).size(),
+        'yes_no': answers.assign(choice=answers['value'].map(_yes_no)).dropna(
+            subset=['choice']
+        ).groupby(keys + ['choice']).size(),
+        'texts': answers.groupby(keys).head(TEXT_SAMPLE_SIZE).groupby(keys)['value'].agg(list),
+    }
+
+
+def _lookup(series, key, default=None):
+    try:
+        return series.loc[key]
+    except KeyError:
+        return default
+
+
+def _round(value, digits=2):
+    return None if value is None or pd.isna(value) else round(float(value), digits)
+
+
+def net_score(counts, scale_max):
+    """
+    NPS-style score from {rating: count}: share of top ratings minus share
+    of low ones, -100..100. On 0-10 scales this is NPS (9-10 vs 0-6); on
+    smaller scales the top rating promotes and anything two or more below
+    it detracts.
+    """
+    total = sum(counts.values())
+    if not total:
+        return None, None, None
+    if scale_max >= 10:
+        promoter_floor, detractor_ceiling = 9, 6
+    else:
+        promoter_floor, detractor_ceiling = scale_max, scale_max - 2
+    promoters = sum(n for rating, n in counts.items() if rating >= promoter_floor) / total * 100
+    detractors = sum(n for rating, n in counts.items() if rating <= detractor_ceiling) / total * 100
+    return round(promoters - detractors, 1), round(promoters, 1), round(detractors, 1)
+
+
+def question_stats(stats, survey_id, position, question):
+    """Statistics for one question, picked out of the aggregate group-bys"""
+    kind = question.get('type', 'text')
+    key = (survey_id, position)
+    result = {
+        'index': position,
+        'question': question.get('question') or question.get('text') or f'Question {position + 1}',
+        'type': kind,
+        'answered': int(_lookup(stats['answered'], key, 0)),
+    }
+
+    if kind == 'rating':
+        scale_max = int(question.get('max', 5))
+        summary = _lookup(stats['ratings'], key)
+        counts = _lookup(stats['rating_counts'], key)
+        counts = {int(rating): int(n) for rating, n in counts.items()} if counts is not None else {}
+        scale_min = 0 if scale_max >= 10 else 1
+        score, promoters, detractors = net_score(counts, scale_max)
+        result.update(
+            rated=int(summary['count']) if summary is not None else 0,
+            mean=_round(summary['mean']) if summary is not None else None,
+            median=_round(summary['median']) if summary is not None else None,
+            std=_round(summary['std']) if summary is not None else None,
+            distribution={rating: counts.get(rating, 0) for rating in range(scale_min, scale_max + 1)},
+            net_score=score, promoters=promoters, detractors=detractors
+        )
+    elif kind in ('yes_no', 'multiple_choice'):
+        counts = _lookup(stats['yes_no' if kind == 'yes_no' else 'choices'], key)
+        counts = {str(option): int(n) for option, n in counts.items()} if counts is not None else {}
+        options = ['yes', 'no'] if kind == 'yes_no' else list(question.get('options') or [])
+        options += sorted(option for option in counts if option not in options)
+        total = sum(counts.values())
+        result['options'] = [{
+            'option': option,
+            'count': counts.get(option, 0),
+            'share': round(counts.get(option, 0) / total * 100, 1) if total else 0.0
+        } for option in options]
+    else:
+        texts = _lookup(stats['texts'], key)
+        result['answers'] = [str(text) for text in texts] if texts is not None else []
+    return result
+
+
+def survey_meta(survey_ids):
+    """Survey, batch, bootcamp and instructor details in one query"""
+    rows = db.session.execute(
+        select(
+            Survey.id, Survey.title, Survey.survey_type, Survey.questions, Survey.created_at,
+            Batch.id.label('batch_id'), Batch.name.label('batch_name'),
+            Bootcamp.title.label('bootcamp_title'),
+            User.id.label('instructor_id'), User.full_name.label('instructor_name')
+        ).join(
+            Batch, Batch.id == Survey.batch_id
+        ).join(
+            Bootcamp, Bootcamp.id == Batch.bootcamp_id
+        ).outerjoin(
+            User, User.id == Survey.instructor_id
+        ).where(Survey.id.in_(survey_ids)).order_by(Survey.created_at)
+    )
+    return rows.all()
+
+
+def summarize(survey_ids):
+    """Results for each survey, computed together; {survey_id: results}"""
+    surveys = survey_meta(survey_ids)
+    answers, response_counts = load_answers([survey.id for survey in surveys])
+    stats = aggregate(answers)
+
+    now = datetime.utcnow()
+    results = {}
+    for survey in surveys:
+        results[survey.id] = {
+            'survey_id': str(survey.id),
+            'title': survey.title,
+            'survey_type': survey.survey_type.value,
+            'batch': {'id': str(survey.batch_id), 'name': survey.batch_name, 'bootcamp': survey.bootcamp_title},
+            'instructor': (
+                {'id': str(survey.instructor_id), 'name': survey.instructor_name}
+                if survey.instructor_id else None
+            ),
+            'responses': response_counts.get(survey.id, 0),
+            'questions': [
+                question_stats(stats, survey.id, position, question)
+                for position, question in enumerate(survey.questions or [])
+            ],
+            'computed_at': now.isoformat()
+        }
+    return results
+
+
+def get_results(survey_id):
+    """Cached results for one survey"""
+    return _results.get_or_set(survey_id, lambda: summarize([survey_id]).get(survey_id))
+
+
+def forget(survey_id):
+    """Drop a survey's cached results when the current transaction commits (called when its responses change)"""
+    _results.delete_on_commit(db.session, survey_id)
+
+
+def compare(survey_type, batch_id=None, instructor_id=None):
+    """
+    Rating questions of every survey of a type side by side, matched by
+    question text, with the batch and instructor each survey belongs to.
+    Cached surveys are reused; the rest are computed in one pass.
+    """
+    stmt = select(Survey.id).where(Survey.survey_type == survey_type)
+    if batch_id is not None:
+        stmt = stmt.where(Survey.batch_id == batch_id)
+    if instructor_id is not None:
+        stmt = stmt.where(Survey.instructor_id == instructor_id)
+    survey_ids = db.session.scalars(stmt).all()
+
+    results = {survey_id: _results.get(survey_id) for survey_id in survey_ids}
+    missing = [survey_id for survey_id, result in results.items() if result is None]
+    if missing:
+        for survey_id, result in summarize(missing).items():
+            _results.set(survey_id, result)
+            results[survey_id] = result
+
+    questions = []
+    rows = []
+    for result in sorted(filter(None, results.values()),
+                         key=lambda r: (r['batch']['bootcamp'], r['batch']['name'], r['title'])):
+        ratings = {}
+        for question in result['questions']:
+            if question['type'] != 'rating':
+                continue
+            if question['question'] not in questions:
+                questions.append(question['question'])
+            ratings[question['question']] = {
+                'mean': question['mean'], 'net_score': question['net_score'], 'rated': question['rated']
+            }
+        rows.append({
+            'survey_id': result['survey_id'],
+            'title': result['title'],
+            'batch': result['batch'],
+            'instructor': result['instructor'],
+            'responses': result['responses'],
+            'ratings': ratings
+        })
+    return {'survey_type': survey_type.value, 'questions': questions, 'surveys': rows}
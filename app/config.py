@@ -34,7 +34,37 @@ class Config:
     
     # Upload (for assignments, resources)
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB per resumable chunk, well under MAX_CONTENT_LENGTH
+    UPLOAD_MAX_FILE_SIZE = int(os.getenv('UPLOAD_MAX_FILE_SIZE', 1024 * 1024 * 1024))  # 1 GB per file
+    
+    # File serving offload: None (Flask streams), 'x-accel' (nginx) or 'x-sendfile' (Apache/lighttpd).
+    # For nginx, map FILE_ACCEL_REDIRECT_PREFIX to UPLOAD_FOLDER with an `internal` location.
+    FILE_SENDFILE_BACKEND = os.getenv('FILE_SENDFILE_BACKEND')
+    FILE_ACCEL_REDIRECT_PREFIX = os.getenv('FILE_ACCEL_REDIRECT_PREFIX', '/protected-files/')
+    FILE_CACHE_MAX_AGE = 24 * 60 * 60  # Content-addressed files never change
+    
+    # Attendance (minutes in a Zoom session to count as present)
+    ZOOM_ATTENDANCE_MIN_MINUTES = int(os.getenv('ZOOM_ATTENDANCE_MIN_MINUTES', 30))
+    
+    # Payment gateway webhooks (HMAC-SHA256 of the raw body, hex, in X-Gateway-Signature)
+    PAYMENT_WEBHOOK_SECRET = os.getenv('PAYMENT_WEBHOOK_SECRET', 'dev-webhook-secret-change-in-production')
+    PAYMENT_EVENTS_BATCH_SIZE = int(os.getenv('PAYMENT_EVENTS_BATCH_SIZE', 200))
+    # Worker runs an out-of-order event is retried in before it is given up on
+    PAYMENT_EVENT_MAX_ATTEMPTS = int(os.getenv('PAYMENT_EVENT_MAX_ATTEMPTS', 10))
+    
+    # Settlement reconciliation (days between payment and settlement still counted as a match)
+    SETTLEMENT_MATCH_WINDOW_DAYS = int(os.getenv('SETTLEMENT_MATCH_WINDOW_DAYS', 3))
+    
+    # Admin dashboard snapshot age (seconds) before a background refresh
+    DASHBOARD_SNAPSHOT_TTL = int(os.getenv('DASHBOARD_SNAPSHOT_TTL', 60))
+    
+    # Offline analysis snapshots (Parquet); point SNAPSHOT_DATABASE_URL at a read replica if there is one
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots'))
+    SNAPSHOT_DATABASE_URL = os.getenv('SNAPSHOT_DATABASE_URL')
+    
+    # Background jobs (threads per web worker)
+    JOBS_MAX_WORKERS = int(os.getenv('JOBS_MAX_WORKERS', 2))
     
     # Pagination
     ITEMS_PER_PAGE = 20
@@ -0,0 +1,172 @@
+"""
+Lead funnel analytics over the lead status history
+
+Leads are taken by creation date. Window functions over each lead's
+transitions (partitioned by lead, in change order) give how long every
+stage lasted (LEAD of the next change), the furthest stage reached (MAX
+over the partition) and when the lead converted, and the aggregates on top
+run in the database. A funnel therefore costs four grouped queries however
+many leads it spans. Results are cached per period and scope.
+
+A lead counts as having reached a stage when it got there or anywhere past
+it, so a lead that jumps from new to converted still passes through the
+middle stages.
+"""
+from datetime import date, timedelta
+from sqlalchemy import select, func, case
+from app.cache import TTLCache
+from app.extensions import db
+from app.models import Lead, LeadStatus, LeadStatusHistory, User
+
+STAGES = [LeadStatus.NEW, LeadStatus.CONTACTED, LeadStatus.QUALIFIED, LeadStatus.CONVERTED]
+STAGE_RANK = {status: rank for rank, status in enumerate(STAGES, 1)}
+
+_funnels = TTLCache(maxsize=256, ttl=600)
+
+
+def transitions(start, end, owner_id=None):
+    """
+    One row per status change of leads created in [start, end], with window
+    columns: left_at (when the next change happened), step (1 for the
+    first change), furthest (highest stage rank reached) and converted_at.
+    """
+    history = LeadStatusHistory
+    by_lead = {'partition_by': history.lead_id, 'order_by': (history.changed_at, history.id)}
+    rank = case(*((history.to_status == status, rank) for status, rank in STAGE_RANK.items()), else_=0)
+
+    stmt = select(
+        history.lead_id,
+        history.to_status,
+        history.changed_at,
+        Lead.source,
+        Lead.assigned_to_id,
+        Lead.status,
+        Lead.created_at,
+        func.lead(history.changed_at).over(**by_lead).label('left_at'),
+        func.row_number().over(**by_lead).label('step'),
+        func.max(rank).over(partition_by=history.lead_id).label('furthest'),
+        func.min(history.changed_at).filter(
+            history.to_status == LeadStatus.CONVERTED
+        ).over(partition_by=history.lead_id).label('converted_at')
+    ).join(
+        Lead, Lead.id == history.lead_id
+    ).where(
+        Lead.created_at >= start,
+        Lead.created_at < end + timedelta(days=1)
+    )
+    if owner_id is not None:
+        stmt = stmt.where(Lead.assigned_to_id == owner_id)
+    return stmt.subquery('transitions')
+
+
+def _hours(later, earlier):
+    return func.extract('epoch', later - earlier) / 3600
+
+
+def stage_query(t):
+    """Leads reaching each stage, and leads lost after getting no further, in one row"""
+    columns = []
+    for status, rank in STAGE_RANK.items():
+        columns.append(func.count().filter(t.c.furthest >= rank).label(f'reached_{status.name.lower()}'))
+        columns.append(func.count().filter(
+            t.c.furthest == rank, t.c.status == LeadStatus.LOST
+        ).label(f'lost_{status.name.lower()}'))
+    return select(func.count().label('leads'), *columns).where(t.c.step == 1)
+
+
+def time_in_stage_query(t):
+    """Average and median hours spent in each stage, for stages that were left"""
+    hours = _hours(t.c.left_at, t.c.changed_at)
+    return select(
+        t.c.to_status,
+        func.count().label('exits'),
+        func.avg(hours).label('avg_hours'),
+        func.percentile_cont(0.5).within_group(hours).label('median_hours')
+    ).where(t.c.left_at.isnot(None)).group_by(t.c.to_status)
+
+
+def breakdown_query(t, key, label, *joins):
+    """Leads, conversions, losses and median days to convert grouped by `key`"""
+    days_to_convert = func.extract('epoch', t.c.converted_at - t.c.created_at) / 86400
+    stmt = select(
+        key.label('key'),
+        label.label('label'),
+        func.count().label('leads'),
+        func.count().filter(t.c.furthest == STAGE_RANK[LeadStatus.CONVERTED]).label('converted'),
+        func.count().filter(t.c.status == LeadStatus.LOST).label('lost'),
+        func.percentile_cont(0.5).within_group(days_to_convert).label('median_days_to_convert')
+    ).select_from(t)
+    for target, onclause in joins:
+        stmt = stmt.outerjoin(target, onclause)
+    return stmt.where(t.c.step == 1).group_by(key, label).order_by(func.count().desc())
+
+
+def _rate(part, whole):
+    return round(part / whole * 100, 1) if whole else 0.0
+
+
+def _number(value, digits=1):
+    return None if value is None else round(float(value), digits)
+
+
+def _breakdown_rows(rows):
+    return [{
+        'key': str(row.key) if row.key is not None else None,
+        'label': row.label or 'Unknown',
+        'leads': row.leads,
+        'converted': row.converted,
+        'lost': row.lost,
+        'conversion_rate': _rate(row.converted, row.leads),
+        'median_days_to_convert': _number(row.median_days_to_convert)
+    } for row in rows]
+
+
+def compute_funnel(start, end, owner_id=None):
+    """The funnel for leads created in [start, end] as JSON-ready data"""
+    t = transitions(start, end, owner_id)
+
+    counts = db.session.execute(stage_query(t)).one()._mapping
+    timings = {row.to_status: row for row in db.session.execute(time_in_stage_query(t))}
+
+    stages = []
+    previous = None
+    for status in STAGES:
+        name = status.name.lower()
+        reached = counts[f'reached_{name}']
+        timing = timings.get(status)
+        stages.append({
+            'stage': status.value,
+            'reached': reached,
+            'lost_here': counts[f'lost_{name}'],
+            'conversion_from_previous': _rate(reached, previous) if previous is not None else None,
+            'conversion_from_start': _rate(reached, counts['leads']),
+            'exits': timing.exits if timing else 0,
+            'avg_hours_in_stage': _number(timing.avg_hours) if timing else None,
+            'median_hours_in_stage': _number(timing.median_hours) if timing else None
+        })
+        previous = reached
+
+    funnel = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'leads': counts['leads'],
+        'stages': stages,
+        'by_source': _breakdown_rows(db.session.execute(breakdown_query(t, t.c.source, t.c.source))),
+        'by_salesperson': None
+    }
+    if owner_id is None:
+        funnel['by_salesperson'] = _breakdown_rows(db.session.execute(breakdown_query(
+            t, t.c.assigned_to_id, User.full_name, (User, User.id == t.c.assigned_to_id)
+        )))
+    return funnel
+
+
+def get_funnel(start, end, owner_id=None):
+    """Cached compute_funnel, per period and scope, for up to ten minutes"""
+    return _funnels.get_or_set((start, end, owner_id), lambda: compute_funnel(start, end, owner_id))
+
+
+def default_period(today=None):
+    """Last 90 days up to today"""
+    today = today or date.today()
+    return today - timedelta(days=89), today
@@ -33,6 +33,35 @@ def sales_dashboard():
                          converted_leads=converted_leads)
 
 
+@crm_bp.route('/funnel')
+@sales_required
+def lead_funnel():
+    """Stage conversion, time in stage and conversion by source and salesperson"""
+    from datetime import date
+    from flask import jsonify, abort
+    from app.crm.funnel import get_funnel, default_period
+    
+    start, end = default_period()
+    try:
+        if request.args.get('start'):
+            start = date.fromisoformat(request.args['start'])
+        if request.args.get('end'):
+            end = date.fromisoformat(request.args['end'])
+    except ValueError:
+        abort(400)
+    if start > end:
+        abort(400)
+    
+    # Sales staff see the funnel of their own leads; admins see everyone's
+    owner_id = None if current_user.role == UserRole.ADMIN else current_user.id
+    funnel = get_funnel(start, end, owner_id)
+    
+    if request.args.get('format') == 'json':
+        return jsonify(funnel)
+    
+    return render_template('admin/lead_funnel.html', funnel=funnel)
+
+
 @crm_bp.route('/leads')
 @sales_required
 def list_leads():
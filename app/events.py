@@ -0,0 +1,237 @@
+"""
+Model event listeners that keep derived columns in sync with their source rows
+"""
+from datetime import datetime
+from sqlalchemy import event, update, insert, select
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+from app.models import (
+    Grade, Submission, Certificate, Payment, Lead, LeadStatusHistory, Survey, SurveyResponse,
+    User, StudentProfile, Enrollment, ProjectSubmission, PerformanceReview, JobApplication,
+    Batch, Bootcamp, CertificateVerification
+)
+from app.payments.revenue import payment_contribution, apply_payment_change
+
+# session.info keys collecting the students and graded submissions a flush
+# touched, so their profiles are refreshed once when the flush ends
+_PROFILE_STUDENTS = 'profile_refresh_students'
+_PROFILE_SUBMISSIONS = 'profile_refresh_submissions'
+
+
+@event.listens_for(Grade, 'after_insert')
+def grade_created(mapper, connection, grade):
+    """A graded submission leaves the grading queue and counts towards performance"""
+    connection.execute(
+        update(Submission).where(Submission.id == grade.submission_id).values(needs_grading=False)
+    )
+    _queue_profile_refresh(grade, submission_id=grade.submission_id)
+
+
+@event.listens_for(Grade, 'after_update')
+def grade_updated(mapper, connection, grade):
+    """A changed score moves the student's performance score"""
+    if get_history(grade, 'score').has_changes():
+        _queue_profile_refresh(grade, submission_id=grade.submission_id)
+
+
+@event.listens_for(Grade, 'after_delete')
+def grade_deleted(mapper, connection, grade):
+    """Removing a grade puts the submission back in the queue"""
+    connection.execute(
+        update(Submission).where(Submission.id == grade.submission_id).values(needs_grading=True)
+    )
+    _queue_profile_refresh(grade, submission_id=grade.submission_id)
+
+
+@event.listens_for(Submission, 'after_insert')
+@event.listens_for(Submission, 'after_delete')
+def submission_changed(mapper, connection, submission):
+    """Submissions count towards the student's engagement score"""
+    _queue_profile_refresh(submission, student_id=submission.student_id)
+
+
+def _queue_profile_refresh(target, student_id=None, submission_id=None):
+    info = object_session(target).info
+    if student_id is not None:
+        info.setdefault(_PROFILE_STUDENTS, set()).add(student_id)
+    if submission_id is not None:
+        info.setdefault(_PROFILE_SUBMISSIONS, set()).add(submission_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def refresh_flushed_profiles(session, flush_context):
+    """One profile refresh per flush for every student whose grades or submissions changed"""
+    students = session.info.pop(_PROFILE_STUDENTS, set())
+    submissions = session.info.pop(_PROFILE_SUBMISSIONS, set())
+    if not students and not submissions:
+        return
+
+    from app.student_lifecycle.metrics import refresh_profiles
+    connection = session.connection()
+    if submissions:
+        students.update(connection.scalars(
+            select(Submission.student_id).where(Submission.id.in_(submissions))
+        ))
+    refresh_profiles(connection, list(students))
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_queued_profiles(session):
+    session.info.pop(_PROFILE_STUDENTS, None)
+    session.info.pop(_PROFILE_SUBMISSIONS, None)
+
+
+@event.listens_for(Certificate, 'after_insert')
+def certificate_created(mapper, connection, certificate):
+    """Publish the public verification record alongside the certificate"""
+    from app.certificates.verification import verification_upsert
+    connection.execute(verification_upsert([certificate.id]))
+
+
+def _refresh_verifications(connection, *criteria):
+    """Rebuild the verification rows of certificates whose enrollments match `criteria`"""
+    from app.certificates.verification import verification_upsert, forget
+    certificates = select(Certificate.id).join(
+        Enrollment, Enrollment.id == Certificate.enrollment_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).where(*criteria)
+    codes = connection.scalars(
+        verification_upsert(certificates).returning(CertificateVerification.verification_code)
+    ).all()
+    forget(*codes)
+
+
+@event.listens_for(User, 'after_update')
+def certificate_holder_updated(mapper, connection, user):
+    """Verification pages print the student's name"""
+    if get_history(user, 'full_name').has_changes():
+        _refresh_verifications(connection, Enrollment.student_id == user.id)
+
+
+@event.listens_for(Batch, 'after_update')
+def certificate_batch_updated(mapper, connection, batch):
+    if get_history(batch, 'name').has_changes():
+        _refresh_verifications(connection, Enrollment.batch_id == batch.id)
+
+
+@event.listens_for(Bootcamp, 'after_update')
+def certificate_bootcamp_updated(mapper, connection, bootcamp):
+    if get_history(bootcamp, 'title').has_changes() or get_history(bootcamp, 'duration_weeks').has_changes():
+        _refresh_verifications(connection, Batch.bootcamp_id == bootcamp.id)
+
+
+@event.listens_for(Payment, 'after_insert')
+def payment_created(mapper, connection, payment):
+    """Completed payments count towards the daily revenue rollup"""
+    apply_payment_change(connection, None, payment_contribution(payment))
+
+
+@event.listens_for(Payment, 'after_update')
+def payment_updated(mapper, connection, payment):
+    """Completion, refunds and edits move the payment's contribution"""
+    apply_payment_change(connection,
+                         payment_contribution(payment, previous=True),
+                         payment_contribution(payment))
+
+
+@event.listens_for(Payment, 'after_delete')
+def payment_deleted(mapper, connection, payment):
+    apply_payment_change(connection, payment_contribution(payment), None)
+
+
+@event.listens_for(Lead, 'after_insert')
+def lead_created(mapper, connection, lead):
+    """The status a lead starts in opens its funnel history"""
+    connection.execute(insert(LeadStatusHistory).values(
+        lead_id=lead.id, from_status=None, to_status=lead.status,
+        assigned_to_id=lead.assigned_to_id, changed_at=lead.created_at or datetime.utcnow()
+    ))
+
+
+@event.listens_for(Lead, 'after_update')
+def lead_updated(mapper, connection, lead):
+    """Record every status transition so funnel timing survives the overwrite"""
+    history = get_history(lead, 'status')
+    if not history.added:
+        return
+    if history.deleted:
+        previous = history.deleted[0]
+    else:
+        # Status was expired before the change; the last recorded transition has it
+        previous = connection.scalar(
+            select(LeadStatusHistory.to_status).where(LeadStatusHistory.lead_id == lead.id)
+            .order_by(LeadStatusHistory.changed_at.desc()).limit(1)
+        )
+    if previous == history.added[0]:
+        return
+    connection.execute(insert(LeadStatusHistory).values(
+        lead_id=lead.id, from_status=previous, to_status=history.added[0],
+        assigned_to_id=lead.assigned_to_id, changed_at=datetime.utcnow()
+    ))
+
+
+@event.listens_for(SurveyResponse, 'after_insert')
+@event.listens_for(SurveyResponse, 'after_delete')
+def survey_response_changed(mapper, connection, response):
+    """New or removed responses invalidate the survey's cached results"""
+    from app.communication.surveys import forget
+    forget(response.survey_id)
+
+
+@event.listens_for(Survey, 'after_update')
+def survey_updated(mapper, connection, survey):
+    """Edited questions change how answers are read"""
+    from app.communication.surveys import forget
+    forget(survey.id)
+
+
+def _forget_overviews(connection, students):
+    """Drop cached Student 360 snapshots on commit; `students` is a list of ids or a select of them"""
+    from app.student_lifecycle.overview import forget
+    if not isinstance(students, list):
+        students = connection.scalars(students).all()
+    forget(*students)
+
+
+@event.listens_for(User, 'after_update')
+def user_updated(mapper, connection, user):
+    _forget_overviews(connection, [user.id])
+
+
+@event.listens_for(StudentProfile, 'after_insert')
+@event.listens_for(StudentProfile, 'after_update')
+def profile_changed(mapper, connection, profile):
+    _forget_overviews(connection, [profile.user_id])
+
+
+@event.listens_for(Enrollment, 'after_insert')
+@event.listens_for(Enrollment, 'after_update')
+@event.listens_for(Enrollment, 'after_delete')
+@event.listens_for(Submission, 'after_update')
+@event.listens_for(ProjectSubmission, 'after_insert')
+@event.listens_for(ProjectSubmission, 'after_update')
+@event.listens_for(ProjectSubmission, 'after_delete')
+def student_row_changed(mapper, connection, target):
+    """Rows carrying the student id directly"""
+    _forget_overviews(connection, [target.student_id])
+
+
+@event.listens_for(PerformanceReview, 'after_insert')
+@event.listens_for(PerformanceReview, 'after_update')
+@event.listens_for(PerformanceReview, 'after_delete')
+@event.listens_for(JobApplication, 'after_insert')
+@event.listens_for(JobApplication, 'after_update')
+@event.listens_for(JobApplication, 'after_delete')
+def profile_row_changed(mapper, connection, target):
+    """Rows hanging off the student's profile"""
+    _forget_overviews(connection, select(StudentProfile.user_id).where(
+        StudentProfile.id == target.student_profile_id
+    ))
+
+
+@event.listens_for(Payment, 'after_insert')
+@event.listens_for(Payment, 'after_update')
+@event.listens_for(Payment, 'after_delete')
+def payment_changed(mapper, connection, payment):
+    _forget_overviews(connection, select(Enrollment.student_id).where(Enrollment.id == payment.enrollment_id))
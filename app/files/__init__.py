@@ -0,0 +1,4 @@
+"""
+File Storage Blueprint
+"""
+from .routes import bp
@@ -0,0 +1,294 @@
+"""
+File Storage Routes
+Chunked, resumable uploads and Range-capable downloads
+"""
+import os
+import uuid
+from datetime import datetime
+from flask import Blueprint, request, jsonify, url_for, current_app, redirect, abort
+from flask_login import login_required, current_user
+from app.extensions import db
+from app.models import (
+    UploadSession, StoredFile, Submission, Document, Enrollment, UserRole,
+    Resource, Lesson, Module, Batch, Certificate, InstructorBatch
+)
+from app.files import storage
+
+bp = Blueprint('files', __name__, url_prefix='/files')
+
+TARGET_TYPES = ('submission', 'document', 'resource')
+
+
+def _get_own_upload(upload_id, lock=False):
+    upload = db.session.get(UploadSession, upload_id, with_for_update=lock)
+    if not upload or upload.user_id != current_user.id:
+        abort(404)
+    return upload
+
+
+def _upload_status(upload):
+    data = {
+        'upload_id': str(upload.id),
+        'filename': upload.filename,
+        'offset': upload.received_bytes,
+        'total_size': upload.total_size,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+        'completed': upload.completed_at is not None
+    }
+    if upload.file:
+        data['file_id'] = str(upload.file.id)
+        data['sha256'] = upload.file.sha256
+        data['url'] = url_for('files.download_file', file_id=upload.file.id)
+    return data
+
+
+def _chunk_offset():
+    """Chunk start from an Upload-Offset or Content-Range header"""
+    if 'Upload-Offset' in request.headers:
+        return int(request.headers['Upload-Offset'])
+    content_range = request.headers.get('Content-Range', '')
+    # bytes <start>-<end>/<total>
+    if content_range.startswith('bytes '):
+        return int(content_range[6:].split('-', 1)[0])
+    return 0
+
+
+def _target_id(data):
+    """target_id from an upload request as a UUID, None when missing or malformed"""
+    try:
+        return uuid.UUID(str(data.get('target_id')))
+    except ValueError:
+        return None
+
+
+def _can_manage_resource(resource):
+    """Admins, or instructors teaching a batch of the resource's bootcamp"""
+    if current_user.role == UserRole.ADMIN:
+        return True
+    if current_user.role != UserRole.INSTRUCTOR:
+        return False
+    return db.session.query(InstructorBatch.id).join(
+        Batch, Batch.id == InstructorBatch.batch_id
+    ).join(
+        Module, Module.bootcamp_id == Batch.bootcamp_id
+    ).join(
+        Lesson, Lesson.module_id == Module.id
+    ).filter(
+        Lesson.id == resource.lesson_id,
+        InstructorBatch.instructor_id == current_user.id
+    ).first() is not None
+
+
+def _attach(upload):
+    """Link the finished file to its submission or resource, or a new document"""
+    file_url = url_for('files.download_file', file_id=upload.file_id)
+    
+    if upload.target_type == 'submission':
+        submission = db.session.get(Submission, upload.target_id)
+        if submission:
+            submission.file_id = upload.file_id
+            submission.submission_url = file_url
+    elif upload.target_type == 'resource':
+        resource = db.session.get(Resource, upload.target_id)
+        if resource:
+            resource.file_id = upload.file_id
+            resource.url = url_for('files.download_resource', resource_id=resource.id)
+    else:
+        document = Document(
+            user_id=upload.user_id,
+            enrollment_id=upload.enrollment_id,
+            document_type=upload.document_type or 'other',
+            document_name=upload.filename,
+            document_url=file_url,
+            file_id=upload.file_id
+        )
+        db.session.add(document)
+        db.session.flush()
+        upload.target_id = document.id
+
+
+@bp.route('/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    """
+    Start a resumable upload
+    Body: {"filename", "size", "content_type", "target_type": "submission"|"document"|"resource",
+           "target_id" (submission, resource), "document_type", "enrollment_id" (document)}
+    """
+    data = request.get_json(silent=True) or {}
+    
+    filename = os.path.basename((data.get('filename') or '').strip())
+    target_type = data.get('target_type')
+    try:
+        total_size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        total_size = 0
+    
+    if not filename or total_size <= 0:
+        return jsonify({'error': 'filename and a positive size are required'}), 400
+    if total_size > current_app.config['UPLOAD_MAX_FILE_SIZE']:
+        return jsonify({'error': 'File exceeds the maximum upload size'}), 413
+    if target_type not in TARGET_TYPES:
+        return jsonify({'error': f'target_type must be one of {", ".join(TARGET_TYPES)}'}), 400
+    
+    upload = UploadSession(
+        user_id=current_user.id,
+        filename=filename,
+        content_type=data.get('content_type') or 'application/octet-stream',
+        total_size=total_size,
+        target_type=target_type
+    )
+    
+    if target_type == 'submission':
+        target_id = _target_id(data)
+        submission = db.session.get(Submission, target_id) if target_id else None
+        if not submission or submission.student_id != current_user.id:
+            return jsonify({'error': 'Submission not found'}), 404
+        upload.target_id = submission.id
+    elif target_type == 'resource':
+        target_id = _target_id(data)
+        resource = db.session.get(Resource, target_id) if target_id else None
+        if not resource or not _can_manage_resource(resource):
+            return jsonify({'error': 'Resource not found'}), 404
+        upload.target_id = resource.id
+    else:
+        upload.document_type = (data.get('document_type') or 'other').strip()
+        if data.get('enrollment_id'):
+            enrollment = db.session.get(Enrollment, data['enrollment_id'])
+            if not enrollment or enrollment.student_id != current_user.id:
+                return jsonify({'error': 'Enrollment not found'}), 404
+            upload.enrollment_id = enrollment.id
+    
+    db.session.add(upload)
+    db.session.commit()
+    
+    return jsonify(_upload_status(upload)), 201
+
+
+@bp.route('/uploads/<uuid:upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    """Current offset of an upload, used by clients to resume"""
+    upload = _get_own_upload(upload_id)
+    return jsonify(_upload_status(upload))
+
+
+@bp.route('/uploads/<uuid:upload_id>', methods=['PUT', 'PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    """Append a chunk (raw request body) at the offset given by Upload-Offset or Content-Range"""
+    # Locked until commit, so concurrent chunks for one upload are applied one at a time
+    upload = _get_own_upload(upload_id, lock=True)
+    
+    if upload.completed_at:
+        return jsonify(_upload_status(upload))
+    
+    try:
+        offset = _chunk_offset()
+        storage.write_chunk(upload, offset, request.stream, request.content_length)
+    except storage.UploadOffsetError as e:
+        return jsonify({'error': str(e), 'offset': e.expected}), 409
+    except ValueError:
+        return jsonify({'error': 'Invalid offset header'}), 400
+    
+    try:
+        if upload.received_bytes >= upload.total_size:
+            stored = storage.finalize(upload)
+            upload.file_id = stored.id
+            upload.completed_at = datetime.utcnow()
+            _attach(upload)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+    
+    return jsonify(_upload_status(upload))
+
+
+@bp.route('/uploads/<uuid:upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    """Abandon an in-progress upload"""
+    upload = _get_own_upload(upload_id)
+    
+    if not upload.completed_at:
+        storage.discard(upload)
+    db.session.delete(upload)
+    db.session.commit()
+    
+    return jsonify({'success': True})
+
+
+@bp.route('/<uuid:file_id>')
+@login_required
+def download_file(file_id):
+    """Download an uploaded file (owner or staff only)"""
+    stored = db.session.get(StoredFile, file_id)
+    if not stored:
+        abort(404)
+    
+    if current_user.role == UserRole.STUDENT:
+        owns = Submission.query.filter_by(file_id=file_id, student_id=current_user.id).first() \
+            or Document.query.filter_by(file_id=file_id, user_id=current_user.id).first()
+        if not owns:
+            abort(403)
+    
+    return storage.send_stored_file(stored)
+
+
+@bp.route('/resources/<uuid:resource_id>')
+@login_required
+def download_resource(resource_id):
+    """Lesson resource download; students must be enrolled in the bootcamp"""
+    resource = Resource.query.get_or_404(resource_id)
+    
+    if current_user.role == UserRole.STUDENT:
+        enrolled = db.session.query(Enrollment.id).join(
+            Batch, Batch.id == Enrollment.batch_id
+        ).join(
+            Module, Module.bootcamp_id == Batch.bootcamp_id
+        ).join(
+            Lesson, Lesson.module_id == Module.id
+        ).filter(
+            Lesson.id == resource.lesson_id,
+            Enrollment.student_id == current_user.id
+        ).first()
+        if not enrolled:
+            abort(403)
+    
+    # External resources (videos on a CDN, links) are not served by us
+    if not resource.file:
+        return redirect(resource.url)
+    
+    return storage.send_stored_file(resource.file, download_name=resource.title)
+
+
+@bp.route('/documents/<uuid:document_id>')
+@login_required
+def download_document(document_id):
+    """Student document download (owner or staff only)"""
+    document = Document.query.get_or_404(document_id)
+    
+    if current_user.role == UserRole.STUDENT and document.user_id != current_user.id:
+        abort(403)
+    
+    if not document.file:
+        return redirect(document.document_url)
+    
+    return storage.send_stored_file(document.file, download_name=document.document_name, as_attachment=True)
+
+
+@bp.route('/certificates/<uuid:certificate_id>')
+@login_required
+def download_certificate(certificate_id):
+    """Certificate PDF download"""
+    certificate = Certificate.query.get_or_404(certificate_id)
+    
+    if current_user.role == UserRole.STUDENT and certificate.enrollment.student_id != current_user.id:
+        abort(403)
+    
+    if not certificate.file:
+        abort(404)
+    
+    return storage.send_stored_file(certificate.file,
+                                    download_name=f'certificate-{certificate.verification_code}.pdf')
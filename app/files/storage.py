@@ -0,0 +1,173 @@
+"""
+Content-addressed file storage under UPLOAD_FOLDER
+
+Layout:
+    parts/<upload_id>.part          bytes received so far for an UploadSession
+    objects/ab/cd/<sha256>          finished files, one copy per distinct content
+"""
+import hashlib
+import os
+import unicodedata
+from urllib.parse import quote
+from flask import current_app, send_file, make_response
+from sqlalchemy.dialects.postgresql import insert
+from app.extensions import db
+from app.models import StoredFile
+
+# Bytes read from the request / disk per iteration; keeps worker memory flat
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadOffsetError(Exception):
+    """Chunk does not start where the previous one ended"""
+
+    def __init__(self, expected):
+        super().__init__(f'Expected chunk at offset {expected}')
+        self.expected = expected
+
+
+def upload_root():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def part_path(upload):
+    return os.path.join(upload_root(), 'parts', f'{upload.id}.part')
+
+
+def object_path(sha256):
+    """Relative storage path for a finished file"""
+    return os.path.join('objects', sha256[:2], sha256[2:4], sha256)
+
+
+def absolute_path(stored_file):
+    return os.path.join(upload_root(), stored_file.storage_path)
+
+
+def write_chunk(upload, offset, stream, length=None):
+    """
+    Append a chunk from `stream` to the upload's part file.
+
+    The chunk must start exactly at `upload.received_bytes`; clients resume
+    by asking for the current offset. Data is copied in COPY_BUFFER_SIZE
+    pieces and never held in memory as a whole. Returns bytes written.
+    """
+    if offset != upload.received_bytes:
+        raise UploadOffsetError(upload.received_bytes)
+
+    remaining = upload.total_size - offset
+    if length is not None:
+        remaining = min(remaining, length)
+
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as out:
+        # Drop anything past the committed offset from an interrupted request
+        out.truncate(offset)
+        out.seek(offset)
+        while written < remaining:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining - written))
+            if not data:
+                break
+            out.write(data)
+            written += len(data)
+
+    upload.received_bytes = offset + written
+    return written
+
+
+def finalize(upload):
+    """
+    Hash the completed part file and move it into the object store.
+
+    The StoredFile row is claimed first (INSERT ... ON CONFLICT DO NOTHING
+    on the unique sha256, then re-selected), so concurrent uploads of the
+    same content share one row. The part is moved to the row's path only
+    once the row exists, or discarded when that path already holds the
+    content. Returns the StoredFile.
+    """
+    path = part_path(upload)
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            digest.update(data)
+    sha256 = digest.hexdigest()
+
+    db.session.execute(
+        insert(StoredFile).values(
+            sha256=sha256,
+            size_bytes=upload.total_size,
+            content_type=upload.content_type,
+            storage_path=object_path(sha256)
+        ).on_conflict_do_nothing(index_elements=[StoredFile.sha256])
+    )
+    stored = StoredFile.query.filter_by(sha256=sha256).one()
+
+    destination = absolute_path(stored)
+    if os.path.exists(destination):
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+
+    return stored
+
+
+def discard(upload):
+    """Remove the part file of an abandoned upload"""
+    path = part_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def content_disposition(download_name, as_attachment=False):
+    """
+    Content-Disposition value naming the file: an ASCII fallback in
+    `filename` plus the exact UTF-8 name in RFC 5987 `filename*`
+    """
+    disposition = 'attachment' if as_attachment else 'inline'
+    fallback = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+    fallback = fallback.replace('\\', '').replace('"', '').replace('\r', '').replace('\n', '')
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(download_name, safe='')}"
+
+
+def send_stored_file(stored_file, download_name=None, as_attachment=False):
+    """
+    Response serving a StoredFile.
+
+    With FILE_SENDFILE_BACKEND set, the worker only returns headers and the
+    reverse proxy streams the bytes (handling Range and conditional requests
+    itself). Otherwise Flask streams the file with Range, ETag and
+    If-Modified-Since support.
+    """
+    config = current_app.config
+    backend = config.get('FILE_SENDFILE_BACKEND')
+    mimetype = stored_file.content_type or 'application/octet-stream'
+
+    if backend in ('x-accel', 'x-sendfile'):
+        response = make_response('')
+        if backend == 'x-accel':
+            prefix = config['FILE_ACCEL_REDIRECT_PREFIX'].rstrip('/')
+            response.headers['X-Accel-Redirect'] = f"{prefix}/{stored_file.storage_path.replace(os.sep, '/')}"
+        else:
+            response.headers['X-Sendfile'] = absolute_path(stored_file)
+        response.headers['Content-Type'] = mimetype
+        if download_name:
+            response.headers['Content-Disposition'] = content_disposition(download_name, as_attachment)
+        response.headers['ETag'] = f'"{stored_file.sha256}"'
+    else:
+        response = send_file(absolute_path(stored_file),
+                             mimetype=mimetype,
+                             as_attachment=as_attachment,
+                             download_name=download_name,
+                             conditional=True,
+                             etag=stored_file.sha256,
+                             max_age=config['FILE_CACHE_MAX_AGE'])
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = config['FILE_CACHE_MAX_AGE']
+    return response
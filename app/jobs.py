@@ -0,0 +1,38 @@
+"""
+In-process background job queue
+
+Work that must not run on the request path (PDF rendering, cache refreshes,
+batched event processing) is handed to a small thread pool. Each job runs in
+its own app context with its own database session. Anything that must survive
+a restart is also recoverable from the database by the matching CLI command.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.extensions import db
+
+_executor = None
+
+
+def _get_executor(app):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=app.config.get('JOBS_MAX_WORKERS', 2),
+                                       thread_name_prefix='cohortly-job')
+    return _executor
+
+
+def enqueue(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the background inside an app context"""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                app.logger.exception('Background job %s failed', func.__name__)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    return _get_executor(app).submit(run)
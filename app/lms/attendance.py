@@ -0,0 +1,102 @@
+"""
+Attendance capture - bulk writes for whole class sessions
+"""
+from datetime import datetime
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert
+from app.extensions import db
+from app.models import Attendance, AttendanceRollup, Enrollment, EnrollmentStatus
+from app.student_lifecycle.metrics import refresh_profiles
+
+
+def record_session_attendance(batch_id, session_date, present_enrollment_ids):
+    """
+    Record attendance for one class session of a batch.
+
+    Every active enrollment in the batch gets a row for `session_date`; ids in
+    `present_enrollment_ids` are marked present, everyone else absent. All
+    attendance rows are upserted in one statement and the per-enrollment
+    rollups are adjusted by the resulting deltas in a second one.
+
+    Returns (recorded, present) counts. The caller commits.
+    """
+    present_ids = {str(eid) for eid in present_enrollment_ids}
+
+    enrollment_ids = db.session.scalars(
+        db.select(Enrollment.id).filter(
+            Enrollment.batch_id == batch_id,
+            Enrollment.status == EnrollmentStatus.ACTIVE
+        )
+    ).all()
+
+    rows = [
+        {'enrollment_id': eid, 'session_date': session_date, 'present': str(eid) in present_ids}
+        for eid in enrollment_ids
+    ]
+
+    apply_attendance_rows(rows)
+
+    return len(rows), sum(1 for r in rows if r['present'])
+
+
+def apply_attendance_rows(rows):
+    """
+    Bulk-upsert attendance rows and maintain AttendanceRollup incrementally.
+
+    Each row is a dict with enrollment_id, session_date and present. Rows
+    whose stored value is unchanged are skipped by the upsert, so only
+    inserted or flipped rows come back from RETURNING and feed the rollup.
+    The affected students' profile metrics are refreshed from the rollups.
+    """
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    stmt = insert(Attendance).values([
+        {'enrollment_id': r['enrollment_id'], 'session_date': r['session_date'],
+         'present': r['present'], 'created_at': now, 'updated_at': now}
+        for r in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Attendance.enrollment_id, Attendance.session_date],
+        set_={'present': stmt.excluded.present, 'updated_at': stmt.excluded.updated_at},
+        where=Attendance.present.is_distinct_from(stmt.excluded.present)
+    ).returning(
+        Attendance.enrollment_id,
+        Attendance.present,
+        # xmax is 0 only for freshly inserted tuples
+        literal_column('xmax = 0').label('inserted')
+    )
+    changed = db.session.execute(stmt).all()
+
+    # enrollment_id -> [sessions delta, present delta]
+    deltas = {}
+    for enrollment_id, present, inserted in changed:
+        delta = deltas.setdefault(enrollment_id, [0, 0])
+        if inserted:
+            delta[0] += 1
+            delta[1] += 1 if present else 0
+        else:
+            delta[1] += 1 if present else -1
+
+    if not deltas:
+        return
+
+    rollup = insert(AttendanceRollup).values([
+        {'enrollment_id': eid, 'sessions': s, 'present': p, 'updated_at': now}
+        for eid, (s, p) in deltas.items()
+    ])
+    rollup = rollup.on_conflict_do_update(
+        index_elements=[AttendanceRollup.enrollment_id],
+        set_={
+            'sessions': AttendanceRollup.sessions + rollup.excluded.sessions,
+            'present': AttendanceRollup.present + rollup.excluded.present,
+            'updated_at': rollup.excluded.updated_at
+        }
+    )
+    db.session.execute(rollup)
+
+    refresh_profiles(
+        db.session.connection(),
+        db.select(Enrollment.student_id).filter(Enrollment.id.in_(list(deltas)))
+    )
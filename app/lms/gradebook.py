@@ -0,0 +1,168 @@
+"""
+Gradebook - students x assignments for a batch, built from one join
+"""
+import csv
+import io
+from array import array
+from app.extensions import db
+from app.models import (
+    Assignment, Lesson, Module, Submission, Grade, Enrollment, EnrollmentStatus, User
+)
+
+MISSING = float('nan')
+
+
+class GradebookRow:
+    """One student's row; scores and late flags are arrays indexed by assignment position"""
+    __slots__ = ('student_id', 'full_name', 'email', 'scores', 'late')
+
+    def __init__(self, student_id, full_name, email, width):
+        self.student_id = student_id
+        self.full_name = full_name
+        self.email = email
+        self.scores = array('d', [MISSING]) * width
+        self.late = bytearray(width)
+
+    def score(self, index):
+        value = self.scores[index]
+        return None if value != value else value  # NaN means not graded
+
+    @property
+    def total(self):
+        return sum(s for s in self.scores if s == s)
+
+    @property
+    def graded_count(self):
+        return sum(1 for s in self.scores if s == s)
+
+    @property
+    def late_count(self):
+        return sum(self.late)
+
+
+def batch_assignments(batch):
+    """Assignments of the batch's bootcamp in curriculum order"""
+    return db.session.execute(
+        db.select(Assignment.id, Assignment.title, Assignment.max_score).join(
+            Lesson, Lesson.id == Assignment.lesson_id
+        ).join(
+            Module, Module.id == Lesson.module_id
+        ).filter(
+            Module.bootcamp_id == batch.bootcamp_id
+        ).order_by(
+            Module.order_index, Lesson.order_index, Assignment.deadline
+        )
+    ).all()
+
+
+def gradebook_query(batch, assignment_ids, student_ids=None):
+    """
+    Single statement: batch students left-joined to their submissions and
+    grades for the given assignments, ordered by student so rows can be
+    pivoted as they stream.
+    """
+    graded = db.select(
+        Submission.student_id,
+        Submission.assignment_id,
+        Submission.is_late,
+        Grade.score
+    ).outerjoin(
+        Grade, Grade.submission_id == Submission.id
+    ).filter(
+        Submission.assignment_id.in_(assignment_ids)
+    ).subquery()
+
+    stmt = db.select(
+        User.id, User.full_name, User.email,
+        graded.c.assignment_id, graded.c.is_late, graded.c.score
+    ).select_from(Enrollment).join(
+        User, User.id == Enrollment.student_id
+    ).outerjoin(
+        graded, graded.c.student_id == User.id
+    ).filter(
+        Enrollment.batch_id == batch.id,
+        Enrollment.status != EnrollmentStatus.DROPPED
+    ).order_by(User.full_name, User.id)
+
+    if student_ids is not None:
+        stmt = stmt.filter(User.id.in_(student_ids))
+    return stmt
+
+
+def pivot_rows(result, assignment_ids):
+    """
+    Pivot (student, assignment, late, score) tuples into GradebookRows.
+
+    Expects rows ordered by student and yields each row once the next
+    student starts, so memory holds a single student at a time. A student
+    with several submissions for one assignment keeps the best score.
+    """
+    position = {aid: i for i, aid in enumerate(assignment_ids)}
+    width = len(assignment_ids)
+    current = None
+
+    for student_id, full_name, email, assignment_id, is_late, score in result:
+        if current is None or current.student_id != student_id:
+            if current is not None:
+                yield current
+            current = GradebookRow(student_id, full_name, email, width)
+
+        if assignment_id is None:
+            continue
+        i = position[assignment_id]
+        if is_late:
+            current.late[i] = 1
+        if score is not None and not (current.scores[i] >= score):
+            current.scores[i] = score
+
+    if current is not None:
+        yield current
+
+
+def build_gradebook_page(batch, student_ids):
+    """Assignments plus pivoted rows for one page of students"""
+    assignments = batch_assignments(batch)
+    assignment_ids = [a.id for a in assignments]
+    result = db.session.execute(gradebook_query(batch, assignment_ids, student_ids))
+    return assignments, list(pivot_rows(result, assignment_ids))
+
+
+def stream_gradebook_csv(batch, yield_per=1000):
+    """
+    Generate the full gradebook as CSV lines.
+
+    Rows come from a server-side cursor (`yield_per`) and are pivoted and
+    written one student at a time.
+    """
+    assignments = batch_assignments(batch)
+    assignment_ids = [a.id for a in assignments]
+    max_total = sum(a.max_score for a in assignments)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    writer.writerow(
+        ['Student', 'Email']
+        + [a.title for a in assignments]
+        + ['Late', 'Total', 'Max Total', 'Percentage']
+    )
+    yield flush()
+
+    stmt = gradebook_query(batch, assignment_ids).execution_options(yield_per=yield_per)
+    result = db.session.execute(stmt)
+    for row in pivot_rows(result, assignment_ids):
+        total = row.total
+        writer.writerow(
+            [row.full_name, row.email]
+            + ['' if row.score(i) is None else f'{row.score(i):g}' + (' (late)' if row.late[i] else '')
+               for i in range(len(assignments))]
+            + [row.late_count, f'{total:g}', max_total,
+               f'{total / max_total * 100:.1f}' if max_total else '']
+        )
+        yield flush()
@@ -0,0 +1,103 @@
+"""
+Grading queue - ungraded submissions across a staff member's batches
+"""
+import base64
+import uuid
+from datetime import datetime
+from sqlalchemy import tuple_
+from app.extensions import db
+from app.models import (
+    Submission, Assignment, Lesson, Module, Batch, Enrollment, EnrollmentStatus, User,
+    InstructorBatch, MentorBatch, UserRole
+)
+
+
+def encode_cursor(submitted_at, submission_id):
+    raw = f'{submitted_at.isoformat()}|{submission_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(submitted_at, submission_id) from an opaque cursor, or None if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        submitted_at, submission_id = raw.split('|')
+        return datetime.fromisoformat(submitted_at), uuid.UUID(submission_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def staff_batch_ids(user):
+    """Batch ids a user teaches or mentors; None means every batch (admins)"""
+    if user.role == UserRole.ADMIN:
+        return None
+    instructor = db.select(InstructorBatch.batch_id).filter(InstructorBatch.instructor_id == user.id)
+    mentor = db.select(MentorBatch.batch_id).filter(MentorBatch.mentor_id == user.id)
+    return db.session.scalars(instructor.union(mentor)).all()
+
+
+def grading_queue(user, cursor=None, limit=20, batch_id=None):
+    """
+    One page of ungraded submissions, oldest first.
+
+    Driven by the partial index on (submitted_at, id) WHERE needs_grading and
+    keyset-paginated on the same columns, so deep pages cost the same as the
+    first. Scoping to batches is an EXISTS on an active enrollment of the
+    student in one of them (for the assignment's bootcamp), so students with
+    several enrollments are listed once; the batch shown is their latest
+    such enrollment. Returns (items, next_cursor).
+    """
+    enrolled = db.select(Enrollment.id).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).filter(
+        Enrollment.student_id == Submission.student_id,
+        Enrollment.status == EnrollmentStatus.ACTIVE,
+        Batch.bootcamp_id == Module.bootcamp_id
+    )
+    batch_ids = staff_batch_ids(user)
+    if batch_ids is not None:
+        enrolled = enrolled.filter(Enrollment.batch_id.in_(batch_ids))
+    if batch_id is not None:
+        enrolled = enrolled.filter(Enrollment.batch_id == batch_id)
+    latest = enrolled.order_by(Enrollment.enrolled_at.desc()).limit(1)
+
+    stmt = db.select(
+        Submission.id,
+        Submission.submitted_at,
+        Submission.is_late,
+        Submission.submission_url,
+        Submission.file_id,
+        Assignment.id.label('assignment_id'),
+        Assignment.title.label('assignment_title'),
+        Assignment.deadline,
+        User.id.label('student_id'),
+        User.full_name.label('student_name'),
+        latest.with_only_columns(Batch.id).scalar_subquery().label('batch_id'),
+        latest.with_only_columns(Batch.name).scalar_subquery().label('batch_name')
+    ).join(
+        Assignment, Assignment.id == Submission.assignment_id
+    ).join(
+        Lesson, Lesson.id == Assignment.lesson_id
+    ).join(
+        Module, Module.id == Lesson.module_id
+    ).join(
+        User, User.id == Submission.student_id
+    ).filter(
+        Submission.needs_grading.is_(True),
+        enrolled.exists()
+    )
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        stmt = stmt.filter(tuple_(Submission.submitted_at, Submission.id) > position)
+
+    rows = db.session.execute(
+        stmt.order_by(Submission.submitted_at, Submission.id).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].submitted_at, rows[-1].id)
+
+    return rows, next_cursor
@@ -9,11 +9,28 @@ from app.auth.utils import student_required, instructor_required, mentor_require
 lms_bp = Blueprint('lms', __name__)
 
 
+def _require_instructor_batch(batch_id):
+    """Abort with 403 unless the current instructor teaches the batch (admins pass)"""
+    from app.models import InstructorBatch
+    
+    if current_user.role == UserRole.INSTRUCTOR:
+        assigned = InstructorBatch.query.filter_by(
+            instructor_id=current_user.id,
+            batch_id=batch_id
+        ).first()
+        if not assigned:
+            abort(403)
+
+
 @lms_bp.route('/student/dashboard')
 @student_required
 def student_dashboard():
     """Student dashboard - show enrolled courses"""
-    enrollments = Enrollment.query.filter_by(student_id=current_user.id).all()
+    from sqlalchemy.orm import selectinload
+    
+    enrollments = Enrollment.query.options(
+        selectinload(Enrollment.attendance_rollup)
+    ).filter_by(student_id=current_user.id).all()
     return render_template('student/dashboard.html', enrollments=enrollments)
 
 
@@ -199,6 +216,11 @@ def view_certificate(enrollment_id):
         enrollment.completed_at = db.func.now()
         db.session.add(certificate)
         db.session.commit()
+        
+        # Render the PDF in the background; the page works without it
+        from app.jobs import enqueue
+        from app.certificates.renderer import render_pending
+        enqueue(render_pending, certificate_ids=[certificate.id])
     
     return render_template('student/certificate.html',
                          certificate=certificate,
@@ -210,18 +232,19 @@ def view_certificate(enrollment_id):
 @lms_bp.route('/certificate/verify/<verification_code>')
 def verify_certificate(verification_code):
     """Public certificate verification"""
-    from app.models import Certificate
+    from app.certificates.verification import lookup
+    from datetime import datetime
     
-    certificate = Certificate.query.filter_by(verification_code=verification_code).first()
+    record = lookup(verification_code)
     
-    if not certificate:
-        abort(404, description="Certificate not found")
+    if not record:
+        return render_template('shared/certificate_invalid.html',
+                             verification_code=verification_code,
+                             checked_at=datetime.utcnow()), 404
     
     return render_template('public/verify_certificate.html',
-                         certificate=certificate,
-                         enrollment=certificate.enrollment,
-                         bootcamp=certificate.enrollment.batch.bootcamp,
-                         student=certificate.enrollment.student)
+                         record=record,
+                         checked_at=datetime.utcnow())
 
 
 @lms_bp.route('/instructor/milestones/<uuid:bootcamp_id>')
@@ -319,3 +342,165 @@ def toggle_milestone(enrollment_id, milestone_id):
         'completed': student_milestone.completed,
         'progress': progress_percentage
     })
+
+
+@lms_bp.route('/instructor/batch/<uuid:batch_id>/attendance', methods=['POST'])
+@instructor_required
+def record_attendance(batch_id):
+    """Record attendance for a whole class session in one request"""
+    from app.extensions import db
+    from app.lms.attendance import record_session_attendance
+    from flask import request, jsonify
+    from datetime import datetime
+    
+    batch = Batch.query.get_or_404(batch_id)
+    _require_instructor_batch(batch.id)
+    
+    data = request.get_json(silent=True) or {}
+    session_date = data.get('session_date') or request.form.get('session_date')
+    present_ids = data.get('present') if data else request.form.getlist('present[]')
+    
+    try:
+        session_date = datetime.strptime(session_date, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'session_date must be YYYY-MM-DD'}), 400
+    
+    try:
+        recorded, present = record_session_attendance(batch.id, session_date, present_ids or [])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'session_date': session_date.isoformat(),
+        'recorded': recorded,
+        'present': present,
+        'absent': recorded - present
+    })
+
+
+@lms_bp.route('/instructor/schedule/<uuid:schedule_id>/attendance/import', methods=['POST'])
+@instructor_required
+def import_zoom_attendance(schedule_id):
+    """Import attendance for a class session from a Zoom participant report"""
+    from app.models import ClassSchedule
+    from app.extensions import db
+    from app.lms.zoom_import import ZoomReportError, import_zoom_attendance as run_import
+    from flask import request, jsonify, current_app
+    import io
+    
+    schedule = ClassSchedule.query.get_or_404(schedule_id)
+    _require_instructor_batch(schedule.batch_id)
+    
+    report = request.files.get('report')
+    if not report:
+        return jsonify({'success': False, 'error': 'Upload the participant report as "report"'}), 400
+    
+    min_minutes = request.form.get('min_minutes', type=int)
+    if min_minutes is None:
+        min_minutes = current_app.config['ZOOM_ATTENDANCE_MIN_MINUTES']
+    
+    try:
+        stream = io.TextIOWrapper(report.stream, encoding='utf-8-sig', newline='')
+        summary = run_import(schedule, stream, min_minutes)
+        db.session.commit()
+    except ZoomReportError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({'success': True, **summary})
+
+
+@lms_bp.route('/instructor/batch/<uuid:batch_id>/gradebook')
+@instructor_required
+def gradebook(batch_id):
+    """Batch gradebook: students x assignments, paginated by student"""
+    from app.models import User, EnrollmentStatus
+    from app.lms.gradebook import build_gradebook_page
+    from flask import request, current_app
+    
+    batch = Batch.query.get_or_404(batch_id)
+    _require_instructor_batch(batch.id)
+    
+    page = request.args.get('page', 1, type=int)
+    students = User.query.join(
+        Enrollment, Enrollment.student_id == User.id
+    ).filter(
+        Enrollment.batch_id == batch.id,
+        Enrollment.status != EnrollmentStatus.DROPPED
+    ).order_by(User.full_name, User.id).paginate(
+        page=page, per_page=current_app.config['ITEMS_PER_PAGE'], error_out=False
+    )
+    
+    assignments, rows = build_gradebook_page(batch, [s.id for s in students.items])
+    
+    return render_template('instructor/gradebook.html',
+                         batch=batch,
+                         assignments=assignments,
+                         rows=rows,
+                         students=students,
+                         max_total=sum(a.max_score for a in assignments))
+
+
+@lms_bp.route('/instructor/batch/<uuid:batch_id>/gradebook.csv')
+@instructor_required
+def gradebook_csv(batch_id):
+    """Stream the full batch gradebook as CSV"""
+    from app.lms.gradebook import stream_gradebook_csv
+    from flask import Response, stream_with_context
+    
+    batch = Batch.query.get_or_404(batch_id)
+    _require_instructor_batch(batch.id)
+    
+    filename = f'gradebook-{batch.name}.csv'.replace(' ', '_').replace('"', '')
+    return Response(
+        stream_with_context(stream_gradebook_csv(batch)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@lms_bp.route('/grading/queue')
+@mentor_required
+def grading_queue():
+    """Ungraded submissions across the current user's batches, oldest first"""
+    from app.lms.grading import grading_queue as load_queue
+    from flask import request, jsonify, current_app, url_for
+    import uuid
+    
+    cursor = request.args.get('cursor')
+    try:
+        batch_id = uuid.UUID(request.args['batch_id']) if request.args.get('batch_id') else None
+    except ValueError:
+        abort(400)
+    limit = min(request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int), 100)
+    
+    items, next_cursor = load_queue(current_user, cursor=cursor, limit=limit, batch_id=batch_id)
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'items': [{
+                'submission_id': str(item.id),
+                'submitted_at': item.submitted_at.isoformat(),
+                'is_late': bool(item.is_late),
+                'submission_url': item.submission_url,
+                'file_url': url_for('files.download_file', file_id=item.file_id) if item.file_id else None,
+                'assignment_id': str(item.assignment_id),
+                'assignment_title': item.assignment_title,
+                'student_id': str(item.student_id),
+                'student_name': item.student_name,
+                'batch_id': str(item.batch_id),
+                'batch_name': item.batch_name
+            } for item in items],
+            'next_cursor': next_cursor
+        })
+    
+    return render_template('instructor/grading_queue.html',
+                         items=items,
+                         next_cursor=next_cursor,
+                         batch_id=batch_id)
@@ -0,0 +1,147 @@
+"""
+Zoom participant report importer - automatic attendance for class sessions
+"""
+import csv
+import io
+from datetime import datetime
+from app.extensions import db
+from app.models import Enrollment, EnrollmentStatus, User
+from app.lms.attendance import apply_attendance_rows
+
+# Zoom has shipped several header spellings over the years
+EMAIL_COLUMNS = ('user email', 'email', 'attendee email')
+JOIN_COLUMNS = ('join time', 'join time (utc)')
+LEAVE_COLUMNS = ('leave time', 'leave time (utc)')
+DURATION_COLUMNS = ('duration (minutes)', 'duration (mins)', 'total duration (minutes)', 'duration')
+TIME_FORMATS = ('%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S')
+
+
+class ZoomReportError(ValueError):
+    """The participant report can't be read or doesn't belong to the session's batch"""
+
+
+def _find_column(header, candidates):
+    """Index of the first header cell matching one of the candidate names"""
+    for name in candidates:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def _parse_time(value):
+    value = (value or '').strip()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_participant_report(stream):
+    """
+    Stream a Zoom participant CSV and total attended minutes per email.
+
+    Exports may start with a meeting summary block, so rows are skipped
+    until a header containing an email column is found. Participants who
+    drop and rejoin appear several times; their durations are summed.
+    Returns (minutes_by_email, rows_without_email). Raises ZoomReportError
+    if no header with an email column is found.
+    """
+    minutes_by_email = {}
+    rows_without_email = 0
+    columns = None
+
+    for row in csv.reader(stream):
+        if not row:
+            continue
+
+        if columns is None:
+            header = [cell.strip().lower() for cell in row]
+            email_col = _find_column(header, EMAIL_COLUMNS)
+            if email_col is not None:
+                columns = (
+                    email_col,
+                    _find_column(header, JOIN_COLUMNS),
+                    _find_column(header, LEAVE_COLUMNS),
+                    _find_column(header, DURATION_COLUMNS),
+                )
+            continue
+
+        email_col, join_col, leave_col, duration_col = columns
+        email = row[email_col].strip().lower() if email_col < len(row) else ''
+        if not email:
+            rows_without_email += 1
+            continue
+
+        minutes = None
+        if duration_col is not None and duration_col < len(row):
+            try:
+                minutes = float(row[duration_col])
+            except ValueError:
+                minutes = None
+        if minutes is None and join_col is not None and leave_col is not None:
+            joined = _parse_time(row[join_col]) if join_col < len(row) else None
+            left = _parse_time(row[leave_col]) if leave_col < len(row) else None
+            if joined and left:
+                minutes = max((left - joined).total_seconds() / 60, 0)
+
+        minutes_by_email[email] = minutes_by_email.get(email, 0) + (minutes or 0)
+
+    if columns is None:
+        raise ZoomReportError('No header with an email column found')
+    return minutes_by_email, rows_without_email
+
+
+def import_zoom_attendance(schedule, stream, min_minutes):
+    """
+    Mark attendance for a ClassSchedule session from a Zoom participant report.
+
+    Active enrollments in the schedule's batch are indexed by lowercased
+    student email in one query; each participant is matched against that
+    dict, and everyone enrolled is written in a single bulk upsert - present
+    when their total minutes reach `min_minutes`. A report matching nobody
+    enrolled (the wrong meeting or batch) raises ZoomReportError rather than
+    marking the whole batch absent. The caller commits.
+    """
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.StringIO(stream.decode('utf-8-sig'))
+
+    minutes_by_email, rows_without_email = parse_participant_report(stream)
+
+    enrollment_by_email = {
+        email.lower(): enrollment_id
+        for enrollment_id, email in db.session.execute(
+            db.select(Enrollment.id, User.email).join(
+                User, User.id == Enrollment.student_id
+            ).filter(
+                Enrollment.batch_id == schedule.batch_id,
+                Enrollment.status == EnrollmentStatus.ACTIVE
+            )
+        )
+    }
+
+    if not any(email in enrollment_by_email for email in minutes_by_email):
+        raise ZoomReportError('No participants in the report match a student enrolled in this batch')
+
+    rows = [
+        {
+            'enrollment_id': enrollment_id,
+            'session_date': schedule.class_date,
+            'present': minutes_by_email.get(email, 0) >= min_minutes
+        }
+        for email, enrollment_id in enrollment_by_email.items()
+    ]
+    apply_attendance_rows(rows)
+
+    unmatched = sorted(email for email in minutes_by_email if email not in enrollment_by_email)
+
+    return {
+        'session_date': schedule.class_date.isoformat(),
+        'participants': len(minutes_by_email),
+        'enrolled': len(rows),
+        'present': sum(1 for r in rows if r['present']),
+        'unmatched_emails': unmatched,
+        'rows_without_email': rows_without_email,
+        'min_minutes': min_minutes
+    }
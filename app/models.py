@@ -170,9 +170,16 @@ class Lead(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Funnel analytics select leads by creation period
+    __table_args__ = (
+        db.Index('ix_leads_created_at', 'created_at'),
+    )
+    
     # Relationships
     assigned_to = db.relationship('User', foreign_keys=[assigned_to_id], back_populates='assigned_leads')
     logs = db.relationship('LeadLog', back_populates='lead', cascade='all, delete-orphan')
+    status_history = db.relationship('LeadStatusHistory', back_populates='lead', cascade='all, delete-orphan',
+                                     passive_deletes=True, order_by='LeadStatusHistory.changed_at')
 
 
 class LeadLog(db.Model):
@@ -191,6 +198,26 @@ class LeadLog(db.Model):
     created_by = db.relationship('User')
 
 
+class LeadStatusHistory(db.Model):
+    """One row per lead status transition, written by a Lead event listener"""
+    __tablename__ = 'lead_status_history'
+    
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    lead_id = db.Column(UUID(as_uuid=True), db.ForeignKey('leads.id', ondelete='CASCADE'), nullable=False)
+    from_status = db.Column(db.Enum(LeadStatus))  # NULL for the status a lead was created with
+    to_status = db.Column(db.Enum(LeadStatus), nullable=False)
+    assigned_to_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='SET NULL'))  # Salesperson at the time
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Window functions run per lead in transition order
+    __table_args__ = (
+        db.Index('ix_lead_status_history_lead_changed', 'lead_id', 'changed_at'),
+    )
+    
+    # Relationships
+    lead = db.relationship('Lead', back_populates='status_history')
+
+
 # =========================
 # BOOTCAMP & BATCH
 # =========================
@@ -317,11 +344,17 @@ class Enrollment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Enrollment report: date-range bucketing and keyset drill-down
+    __table_args__ = (
+        db.Index('ix_enrollments_enrolled_at_id', 'enrolled_at', 'id'),
+    )
+    
     # Relationships
     student = db.relationship('User', back_populates='enrollments')
     batch = db.relationship('Batch', back_populates='enrollments')
     payments = db.relationship('Payment', back_populates='enrollment', cascade='all, delete-orphan')
     attendance_records = db.relationship('Attendance', back_populates='enrollment', cascade='all, delete-orphan')
+    attendance_rollup = db.relationship('AttendanceRollup', back_populates='enrollment', uselist=False, cascade='all, delete-orphan')
     certificate = db.relationship('Certificate', back_populates='enrollment', uselist=False, cascade='all, delete-orphan')
     milestone_progress = db.relationship('StudentMilestone', back_populates='enrollment', cascade='all, delete-orphan')
     milestone_progress = db.relationship('StudentMilestone', back_populates='enrollment', cascade='all, delete-orphan')
@@ -332,19 +365,69 @@ class Payment(db.Model):
     __tablename__ = 'payments'
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    enrollment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('enrollments.id', ondelete='CASCADE'), nullable=False)
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
-    payment_method = db.Column(db.String(100))  # 'credit_card', 'bank_transfer', etc.
-    status = db.Column(db.Enum(PaymentStatus), nullable=False, default=PaymentStatus.PENDING)
+    # Columns behind the revenue rollup load their old value before being
+    # overwritten (active_history), so the listeners can take it back out
+    enrollment_id = db.column_property(
+        db.Column(UUID(as_uuid=True), db.ForeignKey('enrollments.id', ondelete='CASCADE'), nullable=False),
+        active_history=True
+    )
+    amount = db.column_property(db.Column(db.Numeric(10, 2), nullable=False), active_history=True)
+    payment_method = db.column_property(db.Column(db.String(100)), active_history=True)  # 'credit_card', 'bank_transfer', etc.
+    status = db.column_property(
+        db.Column(db.Enum(PaymentStatus), nullable=False, default=PaymentStatus.PENDING),
+        active_history=True
+    )
     transaction_id = db.Column(db.String(255), unique=True)
-    paid_at = db.Column(db.DateTime)
+    paid_at = db.column_property(db.Column(db.DateTime), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Finance calendar and daily drill-downs filter completed payments by paid_at
+    __table_args__ = (
+        db.Index('ix_payments_status_paid_at', 'status', 'paid_at'),
+    )
+    
     # Relationships
     enrollment = db.relationship('Enrollment', back_populates='payments')
 
 
+class RevenueDaily(db.Model):
+    """Completed payment totals per day, bootcamp and method, maintained from Payment events"""
+    __tablename__ = 'revenue_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    bootcamp_id = db.Column(UUID(as_uuid=True), db.ForeignKey('bootcamps.id', ondelete='CASCADE'), primary_key=True)
+    payment_method = db.Column(db.String(100), primary_key=True, default='')  # '' when not recorded
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    bootcamp = db.relationship('Bootcamp')
+
+
+class PaymentEvent(db.Model):
+    """Gateway webhook event, stored once per idempotency key and applied by a background worker"""
+    __tablename__ = 'payment_events'
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    idempotency_key = db.Column(db.String(255), unique=True, nullable=False)
+    transaction_id = db.Column(db.String(255), nullable=False, index=True)
+    status = db.Column(db.Enum(PaymentStatus), nullable=False)  # Status the event moves the payment to
+    payload = db.Column(db.JSON, nullable=False)
+    occurred_at = db.Column(db.DateTime)  # Gateway's event time, when it sent one
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)  # Runs that had to leave the event for later
+    attempted_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+    error = db.Column(db.String(255))  # Why the event was deferred or skipped, if it was
+
+    # The worker only ever scans unprocessed events
+    __table_args__ = (
+        db.Index('ix_payment_events_pending', 'received_at', postgresql_where=db.text('processed_at IS NULL')),
+    )
+
+
 # =========================
 # LMS - CURRICULUM
 # =========================
@@ -397,10 +480,12 @@ class Resource(db.Model):
     title = db.Column(db.String(255), nullable=False)
     resource_type = db.Column(db.String(50), nullable=False)  # 'pdf', 'link', 'video'
     url = db.Column(db.Text, nullable=False)
+    file_id = db.Column(UUID(as_uuid=True), db.ForeignKey('stored_files.id', ondelete='SET NULL'))  # Uploaded file, if any
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
     lesson = db.relationship('Lesson', back_populates='resources')
+    file = db.relationship('StoredFile')
 
 
 class Attendance(db.Model):
@@ -413,11 +498,34 @@ class Attendance(db.Model):
     present = db.Column(db.Boolean, nullable=False, default=False)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('uq_attendance_enrollment_session', 'enrollment_id', 'session_date', unique=True),
+    )
     
     # Relationships
     enrollment = db.relationship('Enrollment', back_populates='attendance_records')
 
 
+class AttendanceRollup(db.Model):
+    """Per-enrollment attendance totals, maintained incrementally on every attendance write"""
+    __tablename__ = 'attendance_rollups'
+    
+    enrollment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('enrollments.id', ondelete='CASCADE'), primary_key=True)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    enrollment = db.relationship('Enrollment', back_populates='attendance_rollup')
+    
+    @property
+    def percentage(self):
+        """Attendance percentage (0-100)"""
+        return (self.present / self.sessions * 100) if self.sessions else 0.0
+
+
 # =========================
 # ASSIGNMENTS & GRADING
 # =========================
@@ -449,13 +557,22 @@ class Submission(db.Model):
     student_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     submission_url = db.Column(db.Text)  # Link to GitHub, Drive, etc.
     submission_text = db.Column(db.Text)
+    file_id = db.Column(UUID(as_uuid=True), db.ForeignKey('stored_files.id', ondelete='SET NULL'))  # Uploaded file, if any
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     is_late = db.Column(db.Boolean, default=False)
+    needs_grading = db.Column(db.Boolean, nullable=False, default=True)  # Cleared when a Grade is saved
+    
+    __table_args__ = (
+        # Grading queue: only ungraded submissions, oldest first
+        db.Index('ix_submissions_grading_queue', 'submitted_at', 'id',
+                 postgresql_where=db.text('needs_grading')),
+    )
     
     # Relationships
     assignment = db.relationship('Assignment', back_populates='submissions')
     student = db.relationship('User', back_populates='submissions')
     grade = db.relationship('Grade', back_populates='submission', uselist=False, cascade='all, delete-orphan')
+    file = db.relationship('StoredFile')
 
 
 class Grade(db.Model):
@@ -468,6 +585,7 @@ class Grade(db.Model):
     feedback = db.Column(db.Text)
     graded_by_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='SET NULL'))
     graded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     submission = db.relationship('Submission', back_populates='grade')
@@ -523,9 +641,26 @@ class Certificate(db.Model):
     verification_code = db.Column(db.String(100), unique=True, nullable=False, index=True)
     issued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     certificate_url = db.Column(db.Text)  # URL to PDF
+    file_id = db.Column(UUID(as_uuid=True), db.ForeignKey('stored_files.id', ondelete='SET NULL'))  # Rendered PDF
     
     # Relationships
     enrollment = db.relationship('Enrollment', back_populates='certificate')
+    file = db.relationship('StoredFile')
+
+
+class CertificateVerification(db.Model):
+    """Denormalized public verification record, one indexed lookup per code"""
+    __tablename__ = 'certificate_verifications'
+    
+    verification_code = db.Column(db.String(100), primary_key=True)
+    certificate_id = db.Column(UUID(as_uuid=True), db.ForeignKey('certificates.id', ondelete='CASCADE'), nullable=False, unique=True)
+    student_name = db.Column(db.String(255), nullable=False)
+    bootcamp_title = db.Column(db.String(255), nullable=False)
+    duration_weeks = db.Column(db.Integer)
+    batch_name = db.Column(db.String(255), nullable=False)
+    issued_at = db.Column(db.DateTime, nullable=False)
+    completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
 class Milestone(db.Model):
@@ -590,6 +725,12 @@ class StudentProfile(db.Model):
     attendance_percentage = db.Column(db.Float, default=0.0)
     engagement_score = db.Column(db.Float, default=0.0)  # Participation metric
     
+    # Computed nightly by the at-risk scoring job
+    risk_score = db.Column(db.Float, index=True)  # 0-100, higher is more at risk
+    risk_rating = db.Column(db.Enum(RAGRating))
+    risk_factors = db.Column(db.JSON)  # Inputs and per-factor contributions
+    risk_scored_at = db.Column(db.DateTime)
+    
     # Career Support
     job_search_status = db.Column(db.String(50))  # 'active', 'placed', 'not_started'
     target_role = db.Column(db.String(100))
@@ -628,11 +769,16 @@ class PerformanceReview(db.Model):
     strengths = db.Column(db.Text)
     areas_for_improvement = db.Column(db.Text)
     action_plan = db.Column(db.Text)
-    next_review_date = db.Column(db.Date)
+    next_review_date = db.Column(db.Date, index=True)  # Powers the reviews-due list
     
     review_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
+    __table_args__ = (
+        # Latest review per profile
+        db.Index('ix_performance_reviews_profile_date', 'student_profile_id', 'review_date'),
+    )
+    
     # Relationships
     student_profile = db.relationship('StudentProfile', back_populates='performance_reviews')
     reviewer = db.relationship('User')
@@ -768,6 +914,11 @@ class JobApplication(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Placement tracker: per-profile counts and latest offer
+    __table_args__ = (
+        db.Index('ix_job_applications_profile_applied', 'student_profile_id', 'applied_date'),
+    )
+    
     # Relationships
     student_profile = db.relationship('StudentProfile', back_populates='job_applications')
 
@@ -925,6 +1076,7 @@ class Document(db.Model):
     document_type = db.Column(db.String(100), nullable=False)  # 'id_proof', 'agreement', 'resume'
     document_name = db.Column(db.String(255), nullable=False)
     document_url = db.Column(db.Text, nullable=False)
+    file_id = db.Column(UUID(as_uuid=True), db.ForeignKey('stored_files.id', ondelete='SET NULL'))  # Uploaded file, if any
     
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     verified = db.Column(db.Boolean, default=False)
@@ -935,3 +1087,48 @@ class Document(db.Model):
     user = db.relationship('User', foreign_keys=[user_id])
     enrollment = db.relationship('Enrollment')
     verified_by = db.relationship('User', foreign_keys=[verified_by_id])
+    file = db.relationship('StoredFile')
+
+
+# =========================
+# FILE STORAGE
+# =========================
+
+class StoredFile(db.Model):
+    """Content-addressed file on disk, shared by every upload with the same SHA-256"""
+    __tablename__ = 'stored_files'
+    
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    size_bytes = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(255))
+    storage_path = db.Column(db.String(255), nullable=False)  # Relative to UPLOAD_FOLDER
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UploadSession(db.Model):
+    """In-progress chunked upload; bytes are appended to a part file until complete"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(255))
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    # What the finished file is attached to
+    target_type = db.Column(db.String(50), nullable=False)  # 'submission', 'document', 'resource'
+    target_id = db.Column(UUID(as_uuid=True))  # Submission or Resource id; Document is created on completion
+    document_type = db.Column(db.String(100))
+    enrollment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('enrollments.id', ondelete='CASCADE'))
+    
+    file_id = db.Column(UUID(as_uuid=True), db.ForeignKey('stored_files.id', ondelete='SET NULL'))
+    completed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    user = db.relationship('User')
+    file = db.relationship('StoredFile')
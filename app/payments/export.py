@@ -0,0 +1,214 @@
+"""
+Payments export for accounting - CSV and XLSX streamed from a server-side cursor
+
+Rows are fetched `yield_per` at a time and written to the response as they
+arrive, so memory stays flat and the first bytes go out immediately no
+matter how many payments match. XLSX is written as a streamed zip of a
+single inline-string worksheet, so no spreadsheet library is needed.
+"""
+import csv
+import io
+import uuid
+import zipfile
+from datetime import date, datetime, timedelta
+from xml.sax.saxutils import escape
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Payment, PaymentStatus, Enrollment, User, Batch, Bootcamp
+
+COLUMNS = [
+    'Payment ID', 'Transaction ID', 'Status', 'Amount', 'Method', 'Paid At', 'Created At',
+    'Student', 'Email', 'Bootcamp', 'Batch'
+]
+
+
+def parse_export_filters(args):
+    """
+    Export filters from query args: start/end (YYYY-MM-DD, end inclusive),
+    status, bootcamp_id and method. Raises ValueError for malformed values.
+    """
+    filters = {}
+    if args.get('start'):
+        filters['start'] = date.fromisoformat(args['start'])
+    if args.get('end'):
+        filters['end'] = date.fromisoformat(args['end'])
+    if args.get('status'):
+        filters['status'] = PaymentStatus(args['status'])
+    if args.get('bootcamp_id'):
+        filters['bootcamp_id'] = uuid.UUID(args['bootcamp_id'])
+    if args.get('method'):
+        filters['method'] = args['method']
+    return filters
+
+
+def export_query(filters):
+    """Payments joined to student, batch and bootcamp, oldest first"""
+    # Completed payments are dated by paid_at, anything else by creation
+    payment_date = db.func.coalesce(Payment.paid_at, Payment.created_at)
+
+    stmt = select(
+        Payment.id,
+        Payment.transaction_id,
+        Payment.status,
+        Payment.amount,
+        Payment.payment_method,
+        Payment.paid_at,
+        Payment.created_at,
+        User.full_name,
+        User.email,
+        Bootcamp.title,
+        Batch.name
+    ).join(
+        Enrollment, Enrollment.id == Payment.enrollment_id
+    ).join(
+        User, User.id == Enrollment.student_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    ).order_by(payment_date, Payment.id)
+
+    if 'start' in filters:
+        stmt = stmt.where(payment_date >= filters['start'])
+    if 'end' in filters:
+        stmt = stmt.where(payment_date < filters['end'] + timedelta(days=1))
+    if 'status' in filters:
+        stmt = stmt.where(Payment.status == filters['status'])
+    if 'bootcamp_id' in filters:
+        stmt = stmt.where(Batch.bootcamp_id == filters['bootcamp_id'])
+    if 'method' in filters:
+        stmt = stmt.where(Payment.payment_method == filters['method'])
+    return stmt
+
+
+def export_rows(filters, yield_per=1000):
+    """Plain value lists in COLUMNS order, from a server-side cursor"""
+    stmt = export_query(filters).execution_options(yield_per=yield_per)
+    for (payment_id, transaction_id, status, amount, method, paid_at, created_at,
+         full_name, email, bootcamp_title, batch_name) in db.session.execute(stmt):
+        yield [
+            str(payment_id),
+            transaction_id or '',
+            status.value,
+            amount,
+            method or '',
+            paid_at.strftime('%Y-%m-%d %H:%M:%S') if paid_at else '',
+            created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            full_name,
+            email,
+            bootcamp_title,
+            batch_name
+        ]
+
+
+def stream_payments_csv(filters, yield_per=1000):
+    """Generate the export as CSV, flushing every `yield_per` rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+
+    for count, row in enumerate(export_rows(filters, yield_per), 1):
+        writer.writerow(row)
+        if count % yield_per == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file object collecting bytes for a generator to drain"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Payments" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, str):
+            cells.append(f'<c t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+        else:
+            cells.append(f'<c><v>{value}</v></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def stream_payments_xlsx(filters, yield_per=1000):
+    """Generate the export as an XLSX workbook, flushing every `yield_per` rows"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        yield sink.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(COLUMNS).encode('utf-8'))
+            for count, row in enumerate(export_rows(filters, yield_per), 1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if count % yield_per == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+def export_filename(filters, extension):
+    """e.g. payments-2025-01-01-to-2025-12-31.csv"""
+    start = filters.get('start')
+    end = filters.get('end', datetime.utcnow().date())
+    span = f'{start.isoformat()}-to-{end.isoformat()}' if start else f'to-{end.isoformat()}'
+    return f'payments-{span}.{extension}'
@@ -0,0 +1,56 @@
+"""
+Local stand-in for the payment gateway
+
+Builds webhook deliveries exactly as the real gateway sends them (signed
+body, Idempotency-Key header) and posts them through any client with a
+Flask test-client style `post`, including the duplicate retries and
+out-of-order bursts real gateways produce. Used by tests and by
+`flask fake-gateway-event` in development.
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+from app.payments.webhooks import sign
+
+WEBHOOK_PATH = '/payments/webhooks/gateway'
+
+
+class FakeGateway:
+    """Signs and delivers webhook events to the app"""
+
+    def __init__(self, secret, path=WEBHOOK_PATH):
+        self.secret = secret
+        self.path = path
+
+    def event(self, transaction_id, status, amount=None, enrollment_id=None,
+              payment_method='credit_card', event_id=None, occurred_at=None):
+        """Event body for a payment moving to `status` ('completed', 'refunded', ...)"""
+        data = {
+            'transaction_id': transaction_id,
+            'payment_method': payment_method,
+            'occurred_at': (occurred_at or datetime.now(timezone.utc)).isoformat()
+        }
+        if amount is not None:
+            data['amount'] = str(amount)
+        if enrollment_id is not None:
+            data['enrollment_id'] = str(enrollment_id)
+        return {
+            'id': event_id or f'evt_{uuid.uuid4().hex}',
+            'type': f'payment.{status}',
+            'data': data
+        }
+
+    def delivery(self, event):
+        """(body, headers) for one delivery attempt"""
+        body = json.dumps(event, sort_keys=True).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': event['id'],
+            'X-Gateway-Signature': sign(body, self.secret)
+        }
+        return body, headers
+
+    def deliver(self, client, event, attempts=1):
+        """Post an event `attempts` times, as a retrying gateway would. Returns the responses."""
+        body, headers = self.delivery(event)
+        return [client.post(self.path, data=body, headers=headers) for _ in range(attempts)]
@@ -0,0 +1,226 @@
+"""
+Settlement reconciliation - match gateway/bank settlement files against payments
+
+The settlement file is hashed by transaction_id in memory and ledger rows are
+fetched for those ids in chunks (or, for very large files, joined through a
+temporary table), so matching is a hash join rather than a lookup per line.
+Completed payments inside the statement period that the file never mentions
+are reported as missing from the statement.
+"""
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import select, text, table, column
+from app.extensions import db
+from app.models import Payment, PaymentStatus
+
+# Header spellings seen across gateway and bank exports
+TRANSACTION_COLUMNS = ('transaction_id', 'transaction id', 'reference', 'txn_id', 'charge id')
+AMOUNT_COLUMNS = ('amount', 'settled amount', 'net amount', 'gross')
+DATE_COLUMNS = ('date', 'settled_at', 'settlement date', 'value date', 'created')
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%d/%m/%Y', '%m/%d/%Y')
+
+LOOKUP_CHUNK = 1000
+
+SettlementLine = namedtuple('SettlementLine', 'line transaction_id amount settled_on')
+LedgerRow = namedtuple('LedgerRow', 'transaction_id amount status paid_at')
+
+CATEGORIES = (
+    'matched', 'amount_mismatch', 'date_mismatch', 'status_mismatch',
+    'duplicate', 'missing_in_ledger', 'missing_in_statement'
+)
+
+
+class SettlementFileError(ValueError):
+    """The settlement file can't be read"""
+
+
+def _find_column(header, candidates):
+    for name in candidates:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def _parse_date(value):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_amount(value):
+    try:
+        return Decimal((value or '').replace(',', '').strip()).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def parse_settlement_file(stream):
+    """
+    Stream a settlement CSV into SettlementLines.
+
+    Returns (lines, unreadable_line_numbers). Raises SettlementFileError if
+    no header with transaction id, amount and date columns is found.
+    """
+    reader = csv.reader(stream)
+    columns = None
+    lines = []
+    unreadable = []
+
+    for number, row in enumerate(reader, 1):
+        if not row:
+            continue
+        if columns is None:
+            header = [cell.strip().lower() for cell in row]
+            found = (
+                _find_column(header, TRANSACTION_COLUMNS),
+                _find_column(header, AMOUNT_COLUMNS),
+                _find_column(header, DATE_COLUMNS),
+            )
+            if None not in found:
+                columns = found
+            continue
+
+        tx_col, amount_col, date_col = columns
+        if max(columns) >= len(row):
+            unreadable.append(number)
+            continue
+        transaction_id = row[tx_col].strip()
+        amount = _parse_amount(row[amount_col])
+        settled_on = _parse_date(row[date_col])
+        if not transaction_id or amount is None or settled_on is None:
+            unreadable.append(number)
+            continue
+        lines.append(SettlementLine(number, transaction_id, amount, settled_on))
+
+    if columns is None:
+        raise SettlementFileError('No header with transaction id, amount and date columns found')
+    return lines, unreadable
+
+
+def _ledger_rows(transaction_ids, temp_table_threshold):
+    """Payments for the given transaction ids, keyed by transaction_id"""
+    columns = (Payment.transaction_id, Payment.amount, Payment.status, Payment.paid_at)
+
+    if len(transaction_ids) <= temp_table_threshold:
+        ids = list(transaction_ids)
+        ledger = {}
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            for row in db.session.execute(
+                select(*columns).where(Payment.transaction_id.in_(ids[start:start + LOOKUP_CHUNK]))
+            ):
+                ledger[row.transaction_id] = LedgerRow(*row)
+        return ledger
+
+    # Very large files: load the ids once and let the database join them
+    db.session.execute(text(
+        'CREATE TEMP TABLE IF NOT EXISTS settlement_ids (transaction_id VARCHAR(255) PRIMARY KEY) '
+        'ON COMMIT DROP'
+    ))
+    db.session.execute(text('TRUNCATE settlement_ids'))
+    db.session.execute(
+        text('INSERT INTO settlement_ids (transaction_id) VALUES (:transaction_id)'),
+        [{'transaction_id': tid} for tid in transaction_ids]
+    )
+    settlement_ids = table('settlement_ids', column('transaction_id'))
+    stmt = select(*columns).join(
+        settlement_ids, settlement_ids.c.transaction_id == Payment.transaction_id
+    )
+    return {row.transaction_id: LedgerRow(*row) for row in db.session.execute(stmt)}
+
+
+def _unsettled_payments(start, end, seen):
+    """Completed payments paid in [start, end] whose transaction is not in the file"""
+    stmt = select(
+        Payment.transaction_id, Payment.amount, Payment.status, Payment.paid_at
+    ).where(
+        Payment.status == PaymentStatus.COMPLETED,
+        Payment.paid_at >= datetime.combine(start, datetime.min.time()),
+        Payment.paid_at < datetime.combine(end + timedelta(days=1), datetime.min.time())
+    ).execution_options(yield_per=1000)
+    for row in db.session.execute(stmt):
+        if row.transaction_id not in seen:
+            yield LedgerRow(*row)
+
+
+def _entry(category, line=None, ledger=None):
+    return {
+        'category': category,
+        'transaction_id': line.transaction_id if line else ledger.transaction_id,
+        'line': line.line if line else None,
+        'statement_amount': str(line.amount) if line else None,
+        'statement_date': line.settled_on.isoformat() if line else None,
+        'ledger_amount': str(ledger.amount) if ledger else None,
+        'ledger_status': ledger.status.value if ledger else None,
+        'paid_at': ledger.paid_at.isoformat() if ledger and ledger.paid_at else None,
+    }
+
+
+def reconcile(lines, window_days=3, temp_table_threshold=20000):
+    """
+    Match settlement lines against payments.
+
+    A line matches when a completed payment has the same transaction_id and
+    amount and was paid within `window_days` of the settlement date. Returns
+    {'summary': {category: count}, 'entries': [...]} with every line that
+    isn't a clean match plus payments the statement is missing.
+    """
+    by_transaction = {}
+    duplicates = []
+    for line in lines:
+        if line.transaction_id in by_transaction:
+            duplicates.append(line)
+        else:
+            by_transaction[line.transaction_id] = line
+
+    ledger = _ledger_rows(by_transaction.keys(), temp_table_threshold) if by_transaction else {}
+    window = timedelta(days=window_days)
+
+    summary = dict.fromkeys(CATEGORIES, 0)
+    entries = []
+
+    def record(category, line=None, row=None):
+        summary[category] += 1
+        if category != 'matched':
+            entries.append(_entry(category, line, row))
+
+    for transaction_id, line in by_transaction.items():
+        row = ledger.get(transaction_id)
+        if row is None:
+            record('missing_in_ledger', line)
+        elif row.status != PaymentStatus.COMPLETED:
+            record('status_mismatch', line, row)
+        elif Decimal(row.amount).quantize(Decimal('0.01')) != line.amount:
+            record('amount_mismatch', line, row)
+        elif row.paid_at is None or abs(row.paid_at.date() - line.settled_on) > window:
+            record('date_mismatch', line, row)
+        else:
+            record('matched', line, row)
+
+    for line in duplicates:
+        record('duplicate', line, ledger.get(line.transaction_id))
+
+    if lines:
+        start = min(line.settled_on for line in lines)
+        end = max(line.settled_on for line in lines)
+        for row in _unsettled_payments(start, end, by_transaction):
+            record('missing_in_statement', row=row)
+
+    return {'summary': summary, 'entries': entries}
+
+
+def report_csv(report):
+    """Exceptions report as CSV text for finance"""
+    buffer = io.StringIO()
+    fields = ['category', 'transaction_id', 'line', 'statement_amount', 'statement_date',
+              'ledger_amount', 'ledger_status', 'paid_at']
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(report['entries'])
+    return buffer.getvalue()
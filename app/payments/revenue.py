@@ -0,0 +1,202 @@
+"""
+Daily revenue rollup - completed payments per day, bootcamp and payment method
+
+RevenueDaily is kept current by Payment events (app/events.py), which add or
+subtract each payment's contribution as it is created, completed, refunded,
+edited or deleted. `rebuild_revenue_daily` recomputes a date range from the
+payments table and runs nightly to repair any drift (bulk UPDATEs, manual SQL).
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, delete
+from sqlalchemy.orm.attributes import get_history
+from sqlalchemy.dialects.postgresql import insert
+from app.cache import TTLCache
+from app.extensions import db
+from app.models import Payment, PaymentStatus, RevenueDaily, Enrollment, Batch, Bootcamp, User
+
+# Drill-downs for days that are over; dropped on commit when a payment on that
+# day changes, and short-lived so other workers pick up refunds and late completions
+_closed_days = TTLCache(maxsize=1024, ttl=300)
+
+
+def payment_contribution(payment, previous=False):
+    """
+    (enrollment_id, day, method, amount) a payment adds to the rollup, or None.
+
+    With `previous=True` the values from before the pending flush are used,
+    which is what an update or delete has to take back out. The columns are
+    mapped with active_history, so the old value is in the history even if
+    the attribute was expired (e.g. by a commit) when it was set.
+    """
+    def value(key):
+        if previous:
+            history = get_history(payment, key)
+            if history.deleted:
+                return history.deleted[0]
+        return getattr(payment, key)
+
+    status = value('status')
+    paid_at = value('paid_at')
+    amount = value('amount')
+    if status != PaymentStatus.COMPLETED or paid_at is None or amount is None:
+        return None
+    return value('enrollment_id'), paid_at.date(), value('payment_method') or '', amount
+
+
+def apply_payment_change(connection, before, after):
+    """Move a payment's contribution from `before` to `after` (either may be None)"""
+    if before == after:
+        return
+
+    forget(*{contribution[1] for contribution in (before, after) if contribution is not None})
+
+    changes = []
+    if before is not None:
+        changes.append((before, -1))
+    if after is not None:
+        changes.append((after, 1))
+
+    bootcamp_ids = dict(connection.execute(
+        select(Enrollment.id, Batch.bootcamp_id).join(
+            Batch, Batch.id == Enrollment.batch_id
+        ).where(
+            Enrollment.id.in_({enrollment_id for (enrollment_id, _, _, _), _ in changes})
+        )
+    ).all())
+
+    now = datetime.utcnow()
+    rows = [
+        {'day': day, 'bootcamp_id': bootcamp_ids[enrollment_id], 'payment_method': method,
+         'total': amount * sign, 'payment_count': sign, 'updated_at': now}
+        for (enrollment_id, day, method, amount), sign in changes
+        if enrollment_id in bootcamp_ids
+    ]
+    for row in rows:
+        stmt = insert(RevenueDaily).values(row)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[RevenueDaily.day, RevenueDaily.bootcamp_id, RevenueDaily.payment_method],
+            set_={
+                'total': RevenueDaily.total + stmt.excluded.total,
+                'payment_count': RevenueDaily.payment_count + stmt.excluded.payment_count,
+                'updated_at': stmt.excluded.updated_at
+            }
+        ))
+
+
+def forget(*days):
+    """Drop cached drill-downs when the current transaction commits (called when a payment on those days changes)"""
+    _closed_days.delete_on_commit(db.session, *days)
+
+
+def rebuild_revenue_daily(start=None, end=None):
+    """
+    Recompute rollup rows for days in [start, end) from the payments table.
+
+    Either bound may be None for an open range. The range is deleted and
+    refilled with one INSERT ... SELECT ... GROUP BY. The caller commits.
+    Returns the number of rollup rows written.
+    """
+    day = db.func.date(Payment.paid_at)
+    source = select(
+        day,
+        Batch.bootcamp_id,
+        db.func.coalesce(Payment.payment_method, ''),
+        db.func.sum(Payment.amount),
+        db.func.count(Payment.id),
+        db.func.now()
+    ).join(
+        Enrollment, Enrollment.id == Payment.enrollment_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).where(
+        Payment.status == PaymentStatus.COMPLETED,
+        Payment.paid_at.isnot(None)
+    ).group_by(
+        day, Batch.bootcamp_id, db.func.coalesce(Payment.payment_method, '')
+    )
+    clear = delete(RevenueDaily)
+
+    if start is not None:
+        source = source.where(Payment.paid_at >= start)
+        clear = clear.where(RevenueDaily.day >= start)
+    if end is not None:
+        source = source.where(Payment.paid_at < end)
+        clear = clear.where(RevenueDaily.day < end)
+
+    db.session.execute(clear)
+    result = db.session.execute(
+        insert(RevenueDaily).from_select(
+            ['day', 'bootcamp_id', 'payment_method', 'total', 'payment_count', 'updated_at'],
+            source
+        )
+    )
+    return result.rowcount
+
+
+def reconcile_recent(days=7):
+    """Nightly job: rebuild the last `days` days, where late edits and refunds land"""
+    start = date.today() - timedelta(days=days)
+    return rebuild_revenue_daily(start=start)
+
+
+def month_bounds(year, month):
+    """First day of the month and first day of the next month"""
+    first = date(year, month, 1)
+    return first, date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+
+
+def daily_sales_query(day):
+    """Completed payments on `day` with student, bootcamp and batch, newest first"""
+    start = datetime.combine(day, datetime.min.time())
+    return select(
+        Payment.paid_at,
+        Payment.amount,
+        Payment.payment_method,
+        User.full_name,
+        Bootcamp.title,
+        Batch.name
+    ).join(
+        Enrollment, Enrollment.id == Payment.enrollment_id
+    ).join(
+        User, User.id == Enrollment.student_id
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).join(
+        Bootcamp, Bootcamp.id == Batch.bootcamp_id
+    ).where(
+        Payment.status == PaymentStatus.COMPLETED,
+        Payment.paid_at >= start,
+        Payment.paid_at < start + timedelta(days=1)
+    ).order_by(Payment.paid_at.desc())
+
+
+def daily_sales_details(day):
+    """
+    Drill-down for one day as a JSON-ready dict, from a single joined select.
+
+    Days before today are cached for a few minutes; a committed payment
+    change drops its day from this worker's cache.
+    """
+    def build():
+        transactions = [
+            {
+                'time': paid_at.strftime('%I:%M %p'),
+                'student': full_name,
+                'bootcamp': bootcamp_title,
+                'batch': batch_name,
+                'amount': float(amount),
+                'method': payment_method
+            }
+            for paid_at, amount, payment_method, full_name, bootcamp_title, batch_name
+            in db.session.execute(daily_sales_query(day))
+        ]
+        return {
+            'date': day.strftime('%B %d, %Y'),
+            'total': sum(t['amount'] for t in transactions),
+            'count': len(transactions),
+            'transactions': transactions
+        }
+
+    if day >= date.today():
+        return build()
+    return _closed_days.get_or_set(day, build)
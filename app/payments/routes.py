@@ -1,12 +1,13 @@
 """
 Payments Module Routes
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
-from app.extensions import db
-from app.models import Enrollment, Payment, PaymentStatus
+from app.extensions import db, csrf
+from app.models import Enrollment, Payment, PaymentStatus, RevenueDaily
+from app.payments.revenue import month_bounds, daily_sales_details
 from app.auth.utils import student_required, admin_required
-from datetime import datetime, timedelta
+from datetime import datetime, date
 from sqlalchemy import func, extract
 from decimal import Decimal
 import calendar
@@ -66,6 +67,35 @@ def process_payment():
         return redirect(url_for('payments.checkout', batch_id=batch_id))
 
 
+@payments_bp.route('/webhooks/gateway', methods=['POST'])
+@csrf.exempt
+def gateway_webhook():
+    """Receive payment gateway events; stored once and applied in the background"""
+    from flask import current_app
+    from app.payments.webhooks import (
+        WebhookError, verify_signature, parse_event, ingest_event, schedule_processing
+    )
+    
+    body = request.get_data()
+    if not verify_signature(body, request.headers.get('X-Gateway-Signature', ''),
+                            current_app.config['PAYMENT_WEBHOOK_SECRET']):
+        return jsonify({'error': 'Invalid signature'}), 401
+    
+    try:
+        event = parse_event(body)
+    except WebhookError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    created = ingest_event(event, request.headers.get('Idempotency-Key'))
+    db.session.commit()
+    
+    if not created:
+        return jsonify({'status': 'duplicate'}), 200
+    
+    schedule_processing()
+    return jsonify({'status': 'accepted'}), 202
+
+
 @payments_bp.route('/history')
 @student_required
 def payment_history():
@@ -82,7 +112,7 @@ def payment_history():
 @admin_required
 def finance_dashboard():
     """Finance dashboard with calendar view and sales reports"""
-    from app.models import User, Batch, Bootcamp
+    from app.models import User, Bootcamp
     
     # Get current date
     today = datetime.now()
@@ -94,43 +124,36 @@ def finance_dashboard():
     selected_year = int(request.args.get('year', current_year))
     selected_month = int(request.args.get('month', current_month))
     
-    # Calculate daily sales for the selected month
-    first_day = datetime(selected_year, selected_month, 1)
-    if selected_month == 12:
-        last_day = datetime(selected_year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = datetime(selected_year, selected_month + 1, 1) - timedelta(days=1)
-    
-    # Query daily sales
+    # Daily sales for the selected month, from the revenue rollup
+    first_day, next_month = month_bounds(selected_year, selected_month)
     daily_sales = db.session.query(
-        func.date(Payment.paid_at).label('date'),
-        func.sum(Payment.amount).label('total'),
-        func.count(Payment.id).label('count')
+        RevenueDaily.day.label('date'),
+        func.sum(RevenueDaily.total).label('total'),
+        func.sum(RevenueDaily.payment_count).label('count')
     ).filter(
-        Payment.status == PaymentStatus.COMPLETED,
-        Payment.paid_at >= first_day,
-        Payment.paid_at <= last_day
+        RevenueDaily.day >= first_day,
+        RevenueDaily.day < next_month
     ).group_by(
-        func.date(Payment.paid_at)
+        RevenueDaily.day
     ).all()
     
     # Create calendar data structure
     cal = calendar.monthcalendar(selected_year, selected_month)
-    daily_sales_dict = {sale.date.day: {'total': float(sale.total), 'count': sale.count} for sale in daily_sales}
+    daily_sales_dict = {sale.date.day: {'total': float(sale.total), 'count': int(sale.count)} for sale in daily_sales}
     
     # Calculate monthly totals for the year
     monthly_sales = db.session.query(
-        extract('month', Payment.paid_at).label('month'),
-        func.sum(Payment.amount).label('total'),
-        func.count(Payment.id).label('count')
+        extract('month', RevenueDaily.day).label('month'),
+        func.sum(RevenueDaily.total).label('total'),
+        func.sum(RevenueDaily.payment_count).label('count')
     ).filter(
-        Payment.status == PaymentStatus.COMPLETED,
-        extract('year', Payment.paid_at) == selected_year
+        RevenueDaily.day >= date(selected_year, 1, 1),
+        RevenueDaily.day < date(selected_year + 1, 1, 1)
     ).group_by(
-        extract('month', Payment.paid_at)
+        extract('month', RevenueDaily.day)
     ).all()
     
-    monthly_data = {int(sale.month): {'total': float(sale.total), 'count': sale.count} for sale in monthly_sales}
+    monthly_data = {int(sale.month): {'total': float(sale.total), 'count': int(sale.count)} for sale in monthly_sales}
     
     # Calculate quarterly sales
     quarterly_sales = []
@@ -177,21 +200,15 @@ def finance_dashboard():
     # Top bootcamps by revenue
     top_bootcamps = db.session.query(
         Bootcamp.id,
-        Bootcamp.name,
-        func.sum(Payment.amount).label('total_revenue'),
-        func.count(Payment.id).label('enrollments')
+        Bootcamp.title.label('name'),
+        func.sum(RevenueDaily.total).label('total_revenue'),
+        func.sum(RevenueDaily.payment_count).label('enrollments')
     ).join(
-        Batch, Batch.bootcamp_id == Bootcamp.id
-    ).join(
-        Enrollment, Enrollment.batch_id == Batch.id
-    ).join(
-        Payment, Payment.enrollment_id == Enrollment.id
-    ).filter(
-        Payment.status == PaymentStatus.COMPLETED
+        RevenueDaily, RevenueDaily.bootcamp_id == Bootcamp.id
     ).group_by(
-        Bootcamp.id, Bootcamp.name
+        Bootcamp.id, Bootcamp.title
     ).order_by(
-        func.sum(Payment.amount).desc()
+        func.sum(RevenueDaily.total).desc()
     ).limit(5).all()
     
     return render_template('payments/finance_dashboard.html',
@@ -214,30 +231,73 @@ def finance_dashboard():
 @admin_required
 def get_daily_sales_details(year, month, day):
     """Get detailed sales for a specific day"""
-    target_date = datetime(year, month, day)
-    next_date = target_date + timedelta(days=1)
-    
-    payments = Payment.query.filter(
-        Payment.status == PaymentStatus.COMPLETED,
-        Payment.paid_at >= target_date,
-        Payment.paid_at < next_date
-    ).order_by(Payment.paid_at.desc()).all()
-    
-    details = []
-    for payment in payments:
-        enrollment = payment.enrollment
-        details.append({
-            'time': payment.paid_at.strftime('%I:%M %p'),
-            'student': enrollment.student.full_name,
-            'bootcamp': enrollment.batch.bootcamp.name,
-            'batch': enrollment.batch.name,
-            'amount': float(payment.amount),
-            'method': payment.payment_method
-        })
+    try:
+        target_date = date(year, month, day)
+    except ValueError:
+        abort(404)
+    
+    return jsonify(daily_sales_details(target_date))
+
+
+@payments_bp.route('/finance/export.<any(csv, xlsx):fmt>')
+@admin_required
+def export_payments(fmt):
+    """Stream payments for accounting, filtered by date range, status, bootcamp and method"""
+    from flask import Response, stream_with_context
+    from app.payments.export import (
+        parse_export_filters, stream_payments_csv, stream_payments_xlsx, export_filename
+    )
+    
+    try:
+        filters = parse_export_filters(request.args)
+    except ValueError:
+        abort(400, description="Invalid export filter")
+    
+    if fmt == 'csv':
+        body = stream_payments_csv(filters)
+        mimetype = 'text/csv'
+    else:
+        body = stream_payments_xlsx(filters)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(filters, fmt)}"'}
+    )
+
+
+@payments_bp.route('/finance/reconcile', methods=['POST'])
+@admin_required
+def reconcile_settlement():
+    """Match an uploaded gateway/bank settlement file against payments"""
+    from flask import Response, current_app
+    from app.payments.reconciliation import (
+        SettlementFileError, parse_settlement_file, reconcile, report_csv
+    )
+    import io
+    
+    statement = request.files.get('statement')
+    if not statement:
+        return jsonify({'success': False, 'error': 'Upload the settlement file as "statement"'}), 400
+    
+    window = request.form.get('window_days', current_app.config['SETTLEMENT_MATCH_WINDOW_DAYS'], type=int)
+    
+    try:
+        lines, unreadable = parse_settlement_file(
+            io.TextIOWrapper(statement.stream, encoding='utf-8-sig', newline='')
+        )
+    except SettlementFileError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    report = reconcile(lines, window_days=window)
+    db.session.rollback()  # Nothing to keep; also drops the temp table on large files
+    
+    if request.args.get('format') == 'csv':
+        return Response(
+            report_csv(report),
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename="reconciliation.csv"'}
+        )
     
-    return jsonify({
-        'date': target_date.strftime('%B %d, %Y'),
-        'total': sum(d['amount'] for d in details),
-        'count': len(details),
-        'transactions': details
-    })
+    return jsonify({'success': True, 'unreadable_lines': unreadable, **report})
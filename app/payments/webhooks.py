@@ -0,0 +1,278 @@
+"""
+Payment gateway webhooks - idempotent ingestion and batched state transitions
+
+The endpoint only verifies, dedupes and stores an event (one INSERT ... ON
+CONFLICT DO NOTHING on the idempotency key) before answering, so gateway
+retries are cheap no-ops and launch-day bursts never queue behind payment
+updates. A background worker then applies stored events in batches: rows
+are claimed with FOR UPDATE SKIP LOCKED in the order the gateway says they
+happened (receipt order when it gives no time), payments for the whole
+batch are loaded and locked in one query and enrollments are activated in
+one UPDATE.
+
+Gateways don't deliver in order, so an event that can't apply yet (a refund
+for a payment still pending, or a transaction not seen yet) stays pending
+and is retried by later runs, up to PAYMENT_EVENT_MAX_ATTEMPTS. Events older
+than the payment's current state are marked processed as superseded.
+"""
+import hashlib
+import hmac
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from app.extensions import db
+from app.jobs import enqueue
+from app.models import Payment, PaymentEvent, PaymentStatus, Enrollment, EnrollmentStatus
+from app.student_lifecycle.overview import forget as forget_overviews
+
+EVENT_TYPES = {
+    'payment.pending': PaymentStatus.PENDING,
+    'payment.completed': PaymentStatus.COMPLETED,
+    'payment.failed': PaymentStatus.FAILED,
+    'payment.refunded': PaymentStatus.REFUNDED,
+}
+
+# Allowed moves; an event for any other move is retried or superseded
+TRANSITIONS = {
+    PaymentStatus.PENDING: {PaymentStatus.COMPLETED, PaymentStatus.FAILED},
+    PaymentStatus.FAILED: {PaymentStatus.COMPLETED},
+    PaymentStatus.COMPLETED: {PaymentStatus.REFUNDED},
+}
+
+_scheduled = threading.Event()
+
+
+class WebhookError(ValueError):
+    """Malformed webhook delivery"""
+
+
+def sign(body, secret):
+    """Hex HMAC-SHA256 of the raw request body"""
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature, secret):
+    return bool(signature) and hmac.compare_digest(sign(body, secret), signature)
+
+
+def parse_event(body):
+    """
+    Validate a delivery body:
+    {"id", "type", "data": {"transaction_id", "amount", "payment_method",
+    "enrollment_id", "occurred_at"}}. Returns the decoded dict.
+    """
+    try:
+        event = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        raise WebhookError('Body is not valid JSON')
+
+    if not isinstance(event, dict) or not isinstance(event.get('data'), dict):
+        raise WebhookError('Missing event data')
+    if event.get('type') not in EVENT_TYPES:
+        raise WebhookError(f"Unsupported event type: {event.get('type')}")
+    if not event['data'].get('transaction_id'):
+        raise WebhookError('Missing transaction_id')
+    if not event.get('id'):
+        raise WebhookError('Missing event id')
+    try:
+        occurred_at(event['data'])
+        if event['data'].get('enrollment_id'):
+            uuid.UUID(str(event['data']['enrollment_id']))
+    except ValueError:
+        raise WebhookError('Malformed occurred_at or enrollment_id')
+    return event
+
+
+def occurred_at(data):
+    """Event time as naive UTC, or None when the gateway didn't send one"""
+    value = data.get('occurred_at')
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def ingest_event(event, idempotency_key=None):
+    """
+    Store an event once. The key is the Idempotency-Key header when the
+    gateway sends one, otherwise its event id. Returns True if the event is
+    new. The caller commits.
+    """
+    stmt = insert(PaymentEvent).values(
+        idempotency_key=str(idempotency_key or event['id'])[:255],
+        transaction_id=event['data']['transaction_id'],
+        status=EVENT_TYPES[event['type']],
+        payload=event,
+        occurred_at=occurred_at(event['data']),
+        received_at=datetime.utcnow()
+    ).on_conflict_do_nothing(
+        index_elements=[PaymentEvent.idempotency_key]
+    ).returning(PaymentEvent.id)
+    return db.session.execute(stmt).first() is not None
+
+
+def schedule_processing():
+    """Queue one worker run; events arriving meanwhile are picked up by it"""
+    if not _scheduled.is_set():
+        _scheduled.set()
+        enqueue(_run_worker)
+
+
+def _run_worker():
+    # Cleared first so an event stored during this run schedules another one
+    _scheduled.clear()
+    process_payment_events()
+
+
+def process_payment_events(batch_size=None):
+    """
+    Apply pending events batch by batch until none are left. Each event is
+    tried at most once per run, so deferred ones wait for the next run.
+    Returns the number processed.
+    """
+    from flask import current_app
+
+    batch_size = batch_size or current_app.config['PAYMENT_EVENTS_BATCH_SIZE']
+    started = datetime.utcnow()
+    processed = 0
+    while True:
+        events = db.session.scalars(
+            select(PaymentEvent).where(
+                PaymentEvent.processed_at.is_(None),
+                or_(PaymentEvent.attempted_at.is_(None), PaymentEvent.attempted_at < started)
+            ).order_by(
+                func.coalesce(PaymentEvent.occurred_at, PaymentEvent.received_at), PaymentEvent.received_at
+            ).limit(batch_size).with_for_update(skip_locked=True)
+        ).all()
+        if not events:
+            return processed
+
+        apply_events(events)
+        db.session.commit()
+        processed += sum(1 for event in events if event.processed_at is not None)
+
+
+def _create_missing_payments(events, payments):
+    """
+    Insert pending payments for transactions first seen through a webhook.
+
+    Only events carrying an enrollment_id can create one, and ON CONFLICT on
+    the unique transaction_id keeps concurrent workers from duplicating it.
+    """
+    candidates = [
+        event for event in events
+        if event.transaction_id not in payments
+        and event.payload['data'].get('enrollment_id')
+        and event.payload['data'].get('amount') is not None
+    ]
+    if not candidates:
+        return
+
+    enrollment_ids = set(db.session.scalars(
+        select(Enrollment.id).where(
+            Enrollment.id.in_({uuid.UUID(str(e.payload['data']['enrollment_id'])) for e in candidates})
+        )
+    ))
+    rows = {}
+    for event in candidates:
+        data = event.payload['data']
+        enrollment_id = uuid.UUID(str(data['enrollment_id']))
+        if enrollment_id in enrollment_ids:
+            rows.setdefault(event.transaction_id, {
+                'enrollment_id': enrollment_id,
+                'amount': data['amount'],
+                'payment_method': data.get('payment_method'),
+                'status': PaymentStatus.PENDING,
+                'transaction_id': event.transaction_id,
+            })
+    if not rows:
+        return
+
+    db.session.execute(
+        insert(Payment).values(list(rows.values())).on_conflict_do_nothing(
+            index_elements=[Payment.transaction_id]
+        )
+    )
+    for payment in Payment.query.filter(Payment.transaction_id.in_(rows)).order_by(Payment.id).with_for_update():
+        payments[payment.transaction_id] = payment
+
+
+def _leads_to(source, target):
+    """Whether `target` can be reached from `source` through TRANSITIONS"""
+    pending, seen = [source], set()
+    while pending:
+        status = pending.pop()
+        for following in TRANSITIONS.get(status, ()):
+            if following == target:
+                return True
+            if following not in seen:
+                seen.add(following)
+                pending.append(following)
+    return False
+
+
+def _defer(event, error, now, max_attempts):
+    """Leave an event pending for a later run, giving up once it has used its attempts"""
+    event.attempts = (event.attempts or 0) + 1
+    event.error = error
+    if event.attempts >= max_attempts:
+        event.processed_at = now
+
+
+def apply_events(events, max_attempts=None):
+    """
+    Move payments through the events of one batch, in the order given.
+
+    Payments are locked for the rest of the transaction. Status changes go
+    through the ORM so the revenue rollup listeners see them. The caller
+    commits.
+    """
+    from flask import current_app
+
+    max_attempts = max_attempts or current_app.config['PAYMENT_EVENT_MAX_ATTEMPTS']
+    now = datetime.utcnow()
+    payments = {
+        payment.transaction_id: payment
+        for payment in Payment.query.filter(
+            Payment.transaction_id.in_({event.transaction_id for event in events})
+        ).order_by(Payment.id).with_for_update()
+    }
+    _create_missing_payments(events, payments)
+
+    activated = set()
+    for event in events:
+        event.attempted_at = now
+        payment = payments.get(event.transaction_id)
+        if payment is None:
+            _defer(event, 'Unknown transaction', now, max_attempts)
+            continue
+        if payment.status != event.status:
+            if _leads_to(event.status, payment.status):
+                event.error = f'Superseded by {payment.status.value}'
+                event.processed_at = now
+                continue
+            if event.status not in TRANSITIONS.get(payment.status, ()):
+                _defer(event, f'Invalid transition {payment.status.value} -> {event.status.value}', now, max_attempts)
+                continue
+
+            payment.status = event.status
+            if event.status == PaymentStatus.COMPLETED:
+                payment.paid_at = occurred_at(event.payload['data']) or now
+                activated.add(payment.enrollment_id)
+        event.error = None
+        event.processed_at = now
+
+    if activated:
+        students = db.session.scalars(
+            update(Enrollment).where(
+                Enrollment.id.in_(activated),
+                Enrollment.status == EnrollmentStatus.PENDING
+            ).values(status=EnrollmentStatus.ACTIVE).returning(Enrollment.student_id)
+        ).all()
+        # Core updates skip ORM events, so drop the students' cached snapshots here
+        forget_overviews(*students)
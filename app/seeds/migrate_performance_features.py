@@ -0,0 +1,177 @@
+"""
+Migration script for performance features on existing databases.
+New tables are created by db.create_all(); this script adds the indexes,
+columns and backfills that create_all() cannot apply to existing tables.
+Every statement is idempotent, so it is safe to re-run.
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+from app import create_app
+from app.extensions import db
+
+STATEMENTS = [
+    # Attendance capture: one row per enrollment per session, rollups backfilled.
+    # Duplicate marks for a session keep only the newest row before the index is built
+    """
+    DELETE FROM attendance older
+    USING attendance newer
+    WHERE older.enrollment_id = newer.enrollment_id
+        AND older.session_date = newer.session_date
+        AND (older.created_at, older.id) < (newer.created_at, newer.id)
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_enrollment_session
+        ON attendance (enrollment_id, session_date)
+    """,
+    """
+    INSERT INTO attendance_rollups (enrollment_id, sessions, present, updated_at)
+    SELECT enrollment_id, COUNT(*), COUNT(*) FILTER (WHERE present), NOW()
+    FROM attendance
+    GROUP BY enrollment_id
+    ON CONFLICT (enrollment_id) DO UPDATE
+        SET sessions = EXCLUDED.sessions,
+            present = EXCLUDED.present,
+            updated_at = EXCLUDED.updated_at
+    """,
+    # Uploaded files linked to submissions and documents
+    """
+    ALTER TABLE submissions
+        ADD COLUMN IF NOT EXISTS file_id UUID REFERENCES stored_files(id) ON DELETE SET NULL
+    """,
+    """
+    ALTER TABLE documents
+        ADD COLUMN IF NOT EXISTS file_id UUID REFERENCES stored_files(id) ON DELETE SET NULL
+    """,
+    """
+    ALTER TABLE resources
+        ADD COLUMN IF NOT EXISTS file_id UUID REFERENCES stored_files(id) ON DELETE SET NULL
+    """,
+    """
+    ALTER TABLE certificates
+        ADD COLUMN IF NOT EXISTS file_id UUID REFERENCES stored_files(id) ON DELETE SET NULL
+    """,
+    # Grading queue flag, backfilled from existing grades
+    """
+    ALTER TABLE submissions
+        ADD COLUMN IF NOT EXISTS needs_grading BOOLEAN NOT NULL DEFAULT TRUE
+    """,
+    """
+    UPDATE submissions SET needs_grading = FALSE
+    WHERE needs_grading AND EXISTS (SELECT 1 FROM grades WHERE grades.submission_id = submissions.id)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_submissions_grading_queue
+        ON submissions (submitted_at, id) WHERE needs_grading
+    """,
+    # Public verification records for existing certificates
+    """
+    INSERT INTO certificate_verifications (verification_code, certificate_id, student_name,
+        bootcamp_title, duration_weeks, batch_name, issued_at, completed_at, updated_at)
+    SELECT c.verification_code, c.id, u.full_name, bc.title, bc.duration_weeks, b.name,
+        c.issued_at, e.completed_at, NOW()
+    FROM certificates c
+    JOIN enrollments e ON e.id = c.enrollment_id
+    JOIN users u ON u.id = e.student_id
+    JOIN batches b ON b.id = e.batch_id
+    JOIN bootcamps bc ON bc.id = b.bootcamp_id
+    ON CONFLICT (verification_code) DO NOTHING
+    """,
+    # Daily sales drill-down: payments of a status paid within a day
+    """
+    CREATE INDEX IF NOT EXISTS ix_payments_status_paid_at
+        ON payments (status, paid_at)
+    """,
+    # Daily revenue rollup, rebuilt from completed payments
+    """
+    INSERT INTO revenue_daily (day, bootcamp_id, payment_method, total, payment_count, updated_at)
+    SELECT DATE(p.paid_at), b.bootcamp_id, COALESCE(p.payment_method, ''), SUM(p.amount), COUNT(*), NOW()
+    FROM payments p
+    JOIN enrollments e ON e.id = p.enrollment_id
+    JOIN batches b ON b.id = e.batch_id
+    WHERE p.status = 'COMPLETED' AND p.paid_at IS NOT NULL
+    GROUP BY DATE(p.paid_at), b.bootcamp_id, COALESCE(p.payment_method, '')
+    ON CONFLICT (day, bootcamp_id, payment_method) DO UPDATE
+        SET total = EXCLUDED.total,
+            payment_count = EXCLUDED.payment_count,
+            updated_at = EXCLUDED.updated_at
+    """,
+    # At-risk scoring results on student profiles
+    "ALTER TABLE student_profiles ADD COLUMN IF NOT EXISTS risk_score DOUBLE PRECISION",
+    "ALTER TABLE student_profiles ADD COLUMN IF NOT EXISTS risk_rating ragrating",
+    "ALTER TABLE student_profiles ADD COLUMN IF NOT EXISTS risk_factors JSON",
+    "ALTER TABLE student_profiles ADD COLUMN IF NOT EXISTS risk_scored_at TIMESTAMP WITHOUT TIME ZONE",
+    """
+    CREATE INDEX IF NOT EXISTS ix_student_profiles_risk_score
+        ON student_profiles (risk_score)
+    """,
+    # Enrollment report bucketing and drill-down
+    """
+    CREATE INDEX IF NOT EXISTS ix_enrollments_enrolled_at_id
+        ON enrollments (enrolled_at, id)
+    """,
+    # Lead funnel: status history seeded from current state (entry as new, then
+    # the current status at the last update) for leads that have none yet
+    """
+    CREATE INDEX IF NOT EXISTS ix_leads_created_at
+        ON leads (created_at)
+    """,
+    """
+    INSERT INTO lead_status_history (id, lead_id, from_status, to_status, assigned_to_id, changed_at)
+    SELECT gen_random_uuid(), seeded.lead_id, seeded.from_status, seeded.to_status,
+           seeded.assigned_to_id, seeded.changed_at
+    FROM (
+        SELECT id AS lead_id, NULL::leadstatus AS from_status, 'NEW'::leadstatus AS to_status,
+               assigned_to_id, created_at AS changed_at
+        FROM leads
+        UNION ALL
+        SELECT id, 'NEW'::leadstatus, status, assigned_to_id, COALESCE(updated_at, created_at)
+        FROM leads
+        WHERE status <> 'NEW'
+    ) AS seeded
+    WHERE NOT EXISTS (
+        SELECT 1 FROM lead_status_history h WHERE h.lead_id = seeded.lead_id
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_performance_reviews_next_review_date
+        ON performance_reviews (next_review_date)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_performance_reviews_profile_date
+        ON performance_reviews (student_profile_id, review_date)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_job_applications_profile_applied
+        ON job_applications (student_profile_id, applied_date)
+    """,
+    # Snapshot watermarks for rows corrected in place, backfilled from the
+    # columns the snapshots used before
+    "ALTER TABLE attendance ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITHOUT TIME ZONE",
+    "UPDATE attendance SET updated_at = created_at WHERE updated_at IS NULL",
+    "ALTER TABLE grades ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITHOUT TIME ZONE",
+    "UPDATE grades SET updated_at = graded_at WHERE updated_at IS NULL",
+]
+
+
+def migrate_database():
+    """Create new tables, then apply schema changes to existing ones"""
+    app = create_app()
+
+    with app.app_context():
+        print("Creating new tables...")
+        db.create_all()
+
+        print("Applying schema updates...")
+        for statement in STATEMENTS:
+            db.session.execute(text(statement))
+        db.session.commit()
+
+        print(f"✓ Applied {len(STATEMENTS)} schema updates successfully!")
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,147 @@
+"""
+Profile metrics - attendance, performance and engagement kept on StudentProfile
+
+The three headline numbers on a student's profile are stored rather than
+computed when the page is viewed. Whenever a student's attendance, grades
+or submissions change, their metrics are recomputed in the database and
+upserted onto the profile in one INSERT ... SELECT, scoped to the students
+affected:
+
+- attendance_percentage: present / sessions over the maintained
+  AttendanceRollup rows of all their enrollments
+- overall_performance_score: mean grade, as a percentage of the
+  assignment's max score, over their last RECENT_GRADES graded submissions
+- engagement_score: share of the assignments already due in their active
+  bootcamps that they have submitted
+
+Attendance is refreshed by app.lms.attendance after each bulk write; grades
+and submissions through the listeners in app.events, which collect the
+students a flush touched and refresh them together at the end of it
+(bulk grading costs one refresh, not one per grade). Engagement also moves
+as deadlines pass, so the nightly `refresh-profile-metrics` command
+recomputes every student.
+"""
+from datetime import datetime
+from sqlalchemy import select, func, distinct, and_, literal
+from sqlalchemy.dialects.postgresql import insert
+from app.models import (
+    User, UserRole, StudentProfile, Enrollment, EnrollmentStatus, Batch, AttendanceRollup,
+    Assignment, Lesson, Module, Submission, Grade
+)
+from app.student_lifecycle.overview import forget as forget_overviews
+
+RECENT_GRADES = 10
+
+
+def _attendance(students):
+    return select(
+        Enrollment.student_id,
+        (func.sum(AttendanceRollup.present) * 100.0
+         / func.nullif(func.sum(AttendanceRollup.sessions), 0)).label('attendance')
+    ).join(
+        Enrollment, Enrollment.id == AttendanceRollup.enrollment_id
+    ).where(
+        Enrollment.student_id.in_(students)
+    ).group_by(Enrollment.student_id).subquery('attendance')
+
+
+def _performance(students):
+    ranked = select(
+        Submission.student_id,
+        (Grade.score * 100.0 / func.nullif(Assignment.max_score, 0)).label('percentage'),
+        func.row_number().over(
+            partition_by=Submission.student_id, order_by=Submission.submitted_at.desc()
+        ).label('recency')
+    ).join(
+        Grade, Grade.submission_id == Submission.id
+    ).join(
+        Assignment, Assignment.id == Submission.assignment_id
+    ).where(
+        Submission.student_id.in_(students)
+    ).subquery('ranked_grades')
+
+    return select(
+        ranked.c.student_id, func.avg(ranked.c.percentage).label('performance')
+    ).where(
+        ranked.c.recency <= RECENT_GRADES
+    ).group_by(ranked.c.student_id).subquery('performance')
+
+
+def _engagement(students, now):
+    due = select(
+        Enrollment.student_id, Assignment.id.label('assignment_id')
+    ).join(
+        Batch, Batch.id == Enrollment.batch_id
+    ).join(
+        Module, Module.bootcamp_id == Batch.bootcamp_id
+    ).join(
+        Lesson, Lesson.module_id == Module.id
+    ).join(
+        Assignment, Assignment.lesson_id == Lesson.id
+    ).where(
+        Enrollment.student_id.in_(students),
+        Enrollment.status == EnrollmentStatus.ACTIVE,
+        Assignment.deadline < now
+    ).distinct().subquery('due')
+
+    return select(
+        due.c.student_id,
+        (func.count(distinct(Submission.assignment_id)) * 100.0 / func.count(distinct(due.c.assignment_id)))
+        .label('engagement')
+    ).select_from(due).outerjoin(
+        Submission, and_(
+            Submission.student_id == due.c.student_id,
+            Submission.assignment_id == due.c.assignment_id
+        )
+    ).group_by(due.c.student_id).subquery('engagement')
+
+
+def refresh_profiles(connection, students=None):
+    """
+    Recompute and store the metrics of `students` (ids, or a select of ids;
+    every student when None), creating profiles that don't exist yet. Runs
+    on `connection`, so it can be called from inside a flush. Returns the
+    ids of the students refreshed.
+    """
+    if students is None:
+        students = select(User.id).where(User.role == UserRole.STUDENT)
+    now = datetime.utcnow()
+
+    attendance = _attendance(students)
+    performance = _performance(students)
+    engagement = _engagement(students, now)
+
+    rows = select(
+        func.gen_random_uuid(),
+        User.id,
+        func.coalesce(attendance.c.attendance, 0.0),
+        func.coalesce(performance.c.performance, 0.0),
+        func.coalesce(engagement.c.engagement, 0.0),
+        literal(now),
+        literal(now)
+    ).outerjoin(
+        attendance, attendance.c.student_id == User.id
+    ).outerjoin(
+        performance, performance.c.student_id == User.id
+    ).outerjoin(
+        engagement, engagement.c.student_id == User.id
+    ).where(User.id.in_(students))
+
+    stmt = insert(StudentProfile).from_select(
+        ['id', 'user_id', 'attendance_percentage', 'overall_performance_score', 'engagement_score',
+         'created_at', 'updated_at'],
+        rows
+    )
+    refreshed = connection.execute(stmt.on_conflict_do_update(
+        index_elements=[StudentProfile.user_id],
+        set_={
+            'attendance_percentage': stmt.excluded.attendance_percentage,
+            'overall_performance_score': stmt.excluded.overall_performance_score,
+            'engagement_score': stmt.excluded.engagement_score,
+            'updated_at': stmt.excluded.updated_at,
+        }
+    ).returning(StudentProfile.user_id)).scalars().all()
+
+    # Cached student snapshots show these metrics
+    forget_overviews(*refreshed)
+    return refreshed
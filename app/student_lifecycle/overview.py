@@ -0,0 +1,283 @@
+"""
+Student 360 - everything staff need about one student in a single snapshot
+
+Profile metrics, enrollments with progress and attendance, recent grades,
+project submissions, performance reviews, job applications and payments
+are loaded with a fixed set of queries (one per section, each joining what
+it displays) and assembled into one JSON-ready dict. The dict serves both
+the JSON endpoint and the HTML partial.
+
+Snapshots are cached per student for a minute. The listeners in app.events
+(and bulk writers that bypass them) drop a student's entry once a change to
+the rows behind it commits; that only reaches the worker making the change,
+so other workers, and risk scores rewritten by the nightly job, catch up
+when the entry expires. One entry serves
+every role; visible_to() drops the sections a viewer may not see.
+"""
+from datetime import datetime
+from sqlalchemy import select
+from app.cache import TTLCache
+from app.extensions import db
+from app.models import (
+    User, UserRole, StudentProfile, Enrollment, Batch, Bootcamp, AttendanceRollup, Submission, Assignment, Grade,
+    ProjectSubmission, Project, PerformanceReview, JobApplication, Payment, PaymentStatus
+)
+
+RECENT_GRADES = 10
+
+# Sections only admins see
+ADMIN_ONLY = ('payments', 'amount_paid')
+
+_overviews = TTLCache(maxsize=2048, ttl=60)
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _value(enum):
+    return enum.value if enum is not None else None
+
+
+def _percentage(part, whole):
+    return round(part / whole * 100, 1) if whole else None
+
+
+def _profile(student_id):
+    row = db.session.execute(
+        select(User, StudentProfile).outerjoin(
+            StudentProfile, StudentProfile.user_id == User.id
+        ).where(User.id == student_id)
+    ).one_or_none()
+    if row is None:
+        return None, None, None
+    user, profile = row
+
+    student = {'id': str(user.id), 'full_name': user.full_name, 'email': user.email}
+    if profile is None:
+        return student, None, None
+    return student, profile.id, {
+        'id': str(profile.id),
+        'attendance_percentage': profile.attendance_percentage,
+        'overall_performance_score': profile.overall_performance_score,
+        'engagement_score': profile.engagement_score,
+        'current_rag_rating': _value(profile.current_rag_rating),
+        'risk_score': profile.risk_score,
+        'risk_rating': _value(profile.risk_rating),
+        'risk_scored_at': _iso(profile.risk_scored_at),
+        'job_search_status': profile.job_search_status,
+        'target_role': profile.target_role,
+        'placement_date': _iso(profile.placement_date),
+        'linkedin_url': profile.linkedin_url,
+        'github_url': profile.github_url,
+        'portfolio_url': profile.portfolio_url,
+    }
+
+
+def _enrollments(student_id):
+    rows = db.session.execute(
+        select(
+            Enrollment.id, Enrollment.status, Enrollment.progress_percentage,
+            Enrollment.enrolled_at, Enrollment.completed_at,
+            Batch.id.label('batch_id'), Batch.name.label('batch_name'),
+            Batch.start_date, Batch.end_date, Bootcamp.title.label('bootcamp'),
+            AttendanceRollup.sessions, AttendanceRollup.present
+        ).join(
+            Batch, Batch.id == Enrollment.batch_id
+        ).join(
+            Bootcamp, Bootcamp.id == Batch.bootcamp_id
+        ).outerjoin(
+            AttendanceRollup, AttendanceRollup.enrollment_id == Enrollment.id
+        ).where(
+            Enrollment.student_id == student_id
+        ).order_by(Enrollment.enrolled_at.desc())
+    )
+    return [{
+        'id': str(row.id),
+        'status': row.status.value,
+        'progress_percentage': row.progress_percentage or 0,
+        'enrolled_at': _iso(row.enrolled_at),
+        'completed_at': _iso(row.completed_at),
+        'batch': {
+            'id': str(row.batch_id), 'name': row.batch_name,
+            'start_date': _iso(row.start_date), 'end_date': _iso(row.end_date)
+        },
+        'bootcamp': row.bootcamp,
+        'attendance': {
+            'sessions': row.sessions or 0,
+            'present': row.present or 0,
+            'percentage': _percentage(row.present or 0, row.sessions or 0)
+        }
+    } for row in rows]
+
+
+def _recent_grades(student_id):
+    rows = db.session.execute(
+        select(
+            Submission.id, Submission.submitted_at, Submission.is_late,
+            Assignment.title, Assignment.max_score, Grade.score, Grade.graded_at
+        ).join(
+            Assignment, Assignment.id == Submission.assignment_id
+        ).outerjoin(
+            Grade, Grade.submission_id == Submission.id
+        ).where(
+            Submission.student_id == student_id
+        ).order_by(Submission.submitted_at.desc()).limit(RECENT_GRADES)
+    )
+    return [{
+        'submission_id': str(row.id),
+        'assignment': row.title,
+        'submitted_at': _iso(row.submitted_at),
+        'is_late': bool(row.is_late),
+        'score': row.score,
+        'max_score': row.max_score,
+        'percentage': _percentage(row.score, row.max_score) if row.score is not None else None,
+        'graded_at': _iso(row.graded_at)
+    } for row in rows]
+
+
+def _projects(student_id):
+    rows = db.session.execute(
+        select(
+            ProjectSubmission.id, ProjectSubmission.status, ProjectSubmission.submitted_at,
+            ProjectSubmission.is_late, ProjectSubmission.score, ProjectSubmission.github_url,
+            ProjectSubmission.demo_url, ProjectSubmission.reviewed_at,
+            Project.title, Project.max_score, Project.is_capstone, Project.deadline
+        ).join(
+            Project, Project.id == ProjectSubmission.project_id
+        ).where(
+            ProjectSubmission.student_id == student_id
+        ).order_by(Project.deadline.desc())
+    )
+    return [{
+        'id': str(row.id),
+        'project': row.title,
+        'is_capstone': bool(row.is_capstone),
+        'status': _value(row.status),
+        'deadline': _iso(row.deadline),
+        'submitted_at': _iso(row.submitted_at),
+        'is_late': bool(row.is_late),
+        'score': row.score,
+        'max_score': row.max_score,
+        'reviewed_at': _iso(row.reviewed_at),
+        'github_url': row.github_url,
+        'demo_url': row.demo_url
+    } for row in rows]
+
+
+def _reviews(profile_id):
+    rows = db.session.execute(
+        select(
+            PerformanceReview.id, PerformanceReview.review_date, PerformanceReview.rag_rating,
+            PerformanceReview.next_review_date, PerformanceReview.strengths,
+            PerformanceReview.areas_for_improvement, PerformanceReview.action_plan,
+            User.full_name.label('reviewer')
+        ).outerjoin(
+            User, User.id == PerformanceReview.reviewer_id
+        ).where(
+            PerformanceReview.student_profile_id == profile_id
+        ).order_by(PerformanceReview.review_date.desc(), PerformanceReview.created_at.desc())
+    )
+    return [{
+        'id': str(row.id),
+        'review_date': _iso(row.review_date),
+        'rag_rating': row.rag_rating.value,
+        'reviewer': row.reviewer,
+        'next_review_date': _iso(row.next_review_date),
+        'strengths': row.strengths,
+        'areas_for_improvement': row.areas_for_improvement,
+        'action_plan': row.action_plan
+    } for row in rows]
+
+
+def _job_applications(profile_id):
+    applications = db.session.scalars(
+        select(JobApplication).where(
+            JobApplication.student_profile_id == profile_id
+        ).order_by(JobApplication.applied_date.desc())
+    )
+    return [{
+        'id': str(application.id),
+        'company_name': application.company_name,
+        'position': application.position,
+        'status': _value(application.status),
+        'applied_date': _iso(application.applied_date),
+        'interview_date': _iso(application.interview_date),
+        'offer_received': bool(application.offer_received),
+        'offer_amount': float(application.offer_amount) if application.offer_amount is not None else None,
+        'accepted': application.accepted
+    } for application in applications]
+
+
+def _payments(student_id):
+    rows = db.session.execute(
+        select(
+            Payment.id, Payment.amount, Payment.status, Payment.payment_method,
+            Payment.paid_at, Payment.created_at, Bootcamp.title.label('bootcamp')
+        ).join(
+            Enrollment, Enrollment.id == Payment.enrollment_id
+        ).join(
+            Batch, Batch.id == Enrollment.batch_id
+        ).join(
+            Bootcamp, Bootcamp.id == Batch.bootcamp_id
+        ).where(
+            Enrollment.student_id == student_id
+        ).order_by(Payment.created_at.desc())
+    )
+    return [{
+        'id': str(row.id),
+        'amount': float(row.amount),
+        'status': row.status.value,
+        'payment_method': row.payment_method,
+        'paid_at': _iso(row.paid_at),
+        'created_at': _iso(row.created_at),
+        'bootcamp': row.bootcamp
+    } for row in rows]
+
+
+def build_overview(student_id):
+    """The full snapshot for one student, or None when there is no such user"""
+    student, profile_id, profile = _profile(student_id)
+    if student is None:
+        return None
+
+    enrollments = _enrollments(student_id)
+    sessions = sum(e['attendance']['sessions'] for e in enrollments)
+    present = sum(e['attendance']['present'] for e in enrollments)
+    payments = _payments(student_id)
+
+    return {
+        'student': student,
+        'profile': profile,
+        'enrollments': enrollments,
+        'attendance': {'sessions': sessions, 'present': present, 'percentage': _percentage(present, sessions)},
+        'recent_grades': _recent_grades(student_id),
+        'projects': _projects(student_id),
+        'reviews': _reviews(profile_id) if profile_id else [],
+        'job_applications': _job_applications(profile_id) if profile_id else [],
+        'payments': payments,
+        'amount_paid': round(sum(p['amount'] for p in payments if p['status'] == PaymentStatus.COMPLETED.value), 2),
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+
+def get_overview(student_id):
+    """Cached build_overview for one student"""
+    overview = _overviews.get(student_id)
+    if overview is None:
+        overview = build_overview(student_id)
+        if overview is not None:
+            _overviews.set(student_id, overview)
+    return overview
+
+
+def visible_to(overview, user):
+    """The snapshot without the sections `user` may not see"""
+    if user.role == UserRole.ADMIN:
+        return overview
+    return {key: value for key, value in overview.items() if key not in ADMIN_ONLY}
+
+
+def forget(*student_ids):
+    """Drop cached snapshots when the current transaction commits (called when a student's rows change)"""
+    _overviews.delete_on_commit(db.session, *student_ids)
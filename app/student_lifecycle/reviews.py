@@ -0,0 +1,92 @@
+"""
+Performance review listings - at-risk students with their latest review,
+and reviews coming due
+
+Both listings are single queries. Each profile's latest review is chosen in
+the database with ROW_NUMBER over its reviews, so the at-risk list loads
+profile, user and review together however many students it holds. Reviews
+due are the latest reviews whose next_review_date falls on or before a
+date, found through the next_review_date index.
+
+Either listing can be narrowed to the students actively enrolled in a batch
+and/or in the batches an instructor teaches.
+"""
+from datetime import date, timedelta
+from sqlalchemy import select, func, and_, tuple_
+from sqlalchemy.orm import aliased
+from app.extensions import db
+from app.models import (
+    StudentProfile, PerformanceReview, User, Enrollment, EnrollmentStatus, InstructorBatch
+)
+
+
+def latest_reviews():
+    """PerformanceReview entity over the most recent review of every profile"""
+    ranked = select(
+        PerformanceReview,
+        func.row_number().over(
+            partition_by=PerformanceReview.student_profile_id,
+            order_by=(PerformanceReview.review_date.desc(), PerformanceReview.created_at.desc())
+        ).label('recency')
+    ).subquery('ranked_reviews')
+    return aliased(PerformanceReview, ranked), ranked.c.recency
+
+
+def _enrolled(student_id, batch_id=None, instructor_id=None):
+    """EXISTS clause: the student has an active enrollment within the given scope"""
+    stmt = select(Enrollment.id).where(
+        Enrollment.student_id == student_id,
+        Enrollment.status == EnrollmentStatus.ACTIVE
+    )
+    if batch_id is not None:
+        stmt = stmt.where(Enrollment.batch_id == batch_id)
+    if instructor_id is not None:
+        stmt = stmt.where(Enrollment.batch_id.in_(
+            select(InstructorBatch.batch_id).where(InstructorBatch.instructor_id == instructor_id)
+        ))
+    return stmt.exists()
+
+
+def at_risk(min_score, batch_id=None, instructor_id=None):
+    """(profile, user, latest review or None) for every profile scoring at least `min_score`, riskiest first"""
+    review, recency = latest_reviews()
+    stmt = select(StudentProfile, User, review).join(
+        User, User.id == StudentProfile.user_id
+    ).outerjoin(
+        review, and_(review.student_profile_id == StudentProfile.id, recency == 1)
+    ).where(
+        StudentProfile.risk_score >= min_score
+    ).order_by(StudentProfile.risk_score.desc(), User.full_name)
+    if batch_id is not None or instructor_id is not None:
+        stmt = stmt.where(_enrolled(StudentProfile.user_id, batch_id, instructor_id))
+    return db.session.execute(stmt).all()
+
+
+def week_end(today=None):
+    """The Sunday ending the current week"""
+    today = today or date.today()
+    return today + timedelta(days=6 - today.weekday())
+
+
+def reviews_due(through, batch_id=None, instructor_id=None):
+    """
+    (review, profile, user) for latest reviews whose next review is due on
+    or before `through`, overdue ones included, soonest first
+    """
+    later = aliased(PerformanceReview)
+    superseded = select(later.id).where(
+        later.student_profile_id == PerformanceReview.student_profile_id,
+        tuple_(later.review_date, later.created_at) > tuple_(PerformanceReview.review_date, PerformanceReview.created_at)
+    ).exists()
+
+    stmt = select(PerformanceReview, StudentProfile, User).join(
+        StudentProfile, StudentProfile.id == PerformanceReview.student_profile_id
+    ).join(
+        User, User.id == StudentProfile.user_id
+    ).where(
+        PerformanceReview.next_review_date <= through,
+        ~superseded
+    ).order_by(PerformanceReview.next_review_date, User.full_name)
+    if batch_id is not None or instructor_id is not None:
+        stmt = stmt.where(_enrolled(StudentProfile.user_id, batch_id, instructor_id))
+    return db.session.execute(stmt).all()
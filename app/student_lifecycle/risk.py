@@ -0,0 +1,240 @@
+"""
+At-risk scoring - nightly risk score per student from attendance, submissions,
+grade trend and milestone progress
+
+Every input is pulled for all active enrollments at once (one query per
+source) and combined with pandas merges and group-bys, so a run costs the
+same handful of queries whatever the number of students. Each factor is
+scaled to 0-1 and weighted; the score (0-100), its band and the inputs are
+written to StudentProfile in a single upsert.
+"""
+from datetime import datetime, date
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from app.extensions import db
+from app.models import (
+    Enrollment, EnrollmentStatus, Batch, AttendanceRollup, Assignment, Lesson, Module,
+    Submission, Grade, Milestone, StudentMilestone, StudentProfile, RAGRating
+)
+
+# Points each factor contributes at its worst; they sum to 100
+WEIGHTS = {
+    'attendance': 30,
+    'missing_submissions': 25,
+    'milestone_lag': 20,
+    'grade_trend': 15,
+    'late_submissions': 10,
+}
+
+RED_THRESHOLD = 60
+AMBER_THRESHOLD = 35
+
+# A drop of this many percentage points per graded assignment counts as the worst trend
+GRADE_TREND_SCALE = 10.0
+
+
+def _frame(stmt):
+    result = db.session.execute(stmt)
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def rating_for(score):
+    if score >= RED_THRESHOLD:
+        return RAGRating.RED
+    if score >= AMBER_THRESHOLD:
+        return RAGRating.AMBER
+    return RAGRating.GREEN
+
+
+def load_inputs(today):
+    """One frame per source, covering every active enrollment"""
+    enrollments = _frame(
+        select(
+            Enrollment.id.label('enrollment_id'), Enrollment.student_id,
+            Batch.bootcamp_id, Batch.start_date, Batch.end_date
+        ).join(
+            Batch, Batch.id == Enrollment.batch_id
+        ).where(Enrollment.status == EnrollmentStatus.ACTIVE)
+    )
+
+    attendance = _frame(
+        select(AttendanceRollup.enrollment_id, AttendanceRollup.sessions, AttendanceRollup.present)
+        .join(Enrollment, Enrollment.id == AttendanceRollup.enrollment_id)
+        .where(Enrollment.status == EnrollmentStatus.ACTIVE)
+    )
+
+    due = _frame(
+        select(Module.bootcamp_id, Assignment.id.label('assignment_id'))
+        .join(Lesson, Lesson.module_id == Module.id)
+        .join(Assignment, Assignment.lesson_id == Lesson.id)
+        .where(Assignment.deadline < datetime.combine(today, datetime.min.time()))
+    )
+
+    active_students = select(Enrollment.student_id).where(Enrollment.status == EnrollmentStatus.ACTIVE)
+    submissions = _frame(
+        select(
+            Submission.student_id, Submission.assignment_id, Submission.is_late,
+            Module.bootcamp_id, Grade.score, Grade.graded_at, Assignment.max_score
+        )
+        .join(Assignment, Assignment.id == Submission.assignment_id)
+        .join(Lesson, Lesson.id == Assignment.lesson_id)
+        .join(Module, Module.id == Lesson.module_id)
+        .outerjoin(Grade, Grade.submission_id == Submission.id)
+        .where(Submission.student_id.in_(active_students))
+    )
+
+    milestone_totals = _frame(
+        select(Milestone.bootcamp_id, func.count(Milestone.id).label('milestones_total'))
+        .group_by(Milestone.bootcamp_id)
+    )
+
+    milestones_done = _frame(
+        select(StudentMilestone.enrollment_id, func.count().label('milestones_completed'))
+        .join(Enrollment, Enrollment.id == StudentMilestone.enrollment_id)
+        .where(Enrollment.status == EnrollmentStatus.ACTIVE, StudentMilestone.completed.is_(True))
+        .group_by(StudentMilestone.enrollment_id)
+    )
+
+    return enrollments, attendance, due, submissions, milestone_totals, milestones_done
+
+
+def _grade_slopes(submissions):
+    """
+    Least-squares slope of grade percentage over graded order, per
+    (student, bootcamp), from group sums rather than a fit per student.
+    """
+    graded = submissions.dropna(subset=['score']).copy()
+    graded = graded[graded['max_score'] > 0]
+    if graded.empty:
+        return pd.DataFrame(columns=['student_id', 'bootcamp_id', 'grade_trend'])
+
+    graded['y'] = graded['score'].astype(float) / graded['max_score'].astype(float) * 100
+    graded = graded.sort_values('graded_at')
+    graded['x'] = graded.groupby(['student_id', 'bootcamp_id']).cumcount().astype(float)
+    graded['xy'] = graded['x'] * graded['y']
+    graded['xx'] = graded['x'] * graded['x']
+
+    sums = graded.groupby(['student_id', 'bootcamp_id']).agg(
+        n=('y', 'size'), sx=('x', 'sum'), sy=('y', 'sum'), sxy=('xy', 'sum'), sxx=('xx', 'sum')
+    ).reset_index()
+    denominator = sums['n'] * sums['sxx'] - sums['sx'] ** 2
+    slope = (sums['n'] * sums['sxy'] - sums['sx'] * sums['sy']) / denominator.where(denominator > 0)
+    sums['grade_trend'] = slope.fillna(0.0)
+    return sums[['student_id', 'bootcamp_id', 'grade_trend']]
+
+
+def compute_scores(today=None):
+    """Risk score and factors per active enrollment as a DataFrame"""
+    today = today or date.today()
+    enrollments, attendance, due, submissions, milestone_totals, milestones_done = load_inputs(today)
+    if enrollments.empty:
+        return enrollments
+
+    df = enrollments.merge(attendance, on='enrollment_id', how='left')
+    df['attendance_rate'] = (df['present'] / df['sessions'].where(df['sessions'] > 0)).astype(float)
+
+    # Due assignments per enrollment, and how many of them were submitted
+    due_pairs = enrollments[['enrollment_id', 'student_id', 'bootcamp_id']].merge(due, on='bootcamp_id')
+    submitted = submissions[['student_id', 'assignment_id']].drop_duplicates()
+    submitted['submitted'] = True
+    due_pairs = due_pairs.merge(submitted, on=['student_id', 'assignment_id'], how='left')
+    due_counts = due_pairs.groupby('enrollment_id').agg(
+        due_assignments=('assignment_id', 'size'),
+        submitted_due=('submitted', 'count')
+    ).reset_index()
+    df = df.merge(due_counts, on='enrollment_id', how='left')
+    df[['due_assignments', 'submitted_due']] = df[['due_assignments', 'submitted_due']].fillna(0)
+    df['missing_submissions'] = df['due_assignments'] - df['submitted_due']
+
+    late = submissions.groupby(['student_id', 'bootcamp_id']).agg(
+        submissions=('assignment_id', 'size'),
+        late=('is_late', 'sum')
+    ).reset_index()
+    df = df.merge(late, on=['student_id', 'bootcamp_id'], how='left')
+    df = df.merge(_grade_slopes(submissions), on=['student_id', 'bootcamp_id'], how='left')
+
+    df = df.merge(milestone_totals, on='bootcamp_id', how='left')
+    df = df.merge(milestones_done, on='enrollment_id', how='left')
+    df[['milestones_total', 'milestones_completed']] = (
+        df[['milestones_total', 'milestones_completed']].fillna(0)
+    )
+    span = (pd.to_datetime(df['end_date']) - pd.to_datetime(df['start_date'])).dt.days.clip(lower=1)
+    elapsed = ((pd.Timestamp(today) - pd.to_datetime(df['start_date'])).dt.days / span).clip(0, 1)
+    df['milestones_expected'] = elapsed * df['milestones_total']
+
+    # Each factor scaled to 0-1, 1 being the worst
+    factors = pd.DataFrame({
+        'attendance': (1 - df['attendance_rate']).fillna(0),
+        'missing_submissions': (df['missing_submissions'] / df['due_assignments'].where(df['due_assignments'] > 0)).fillna(0),
+        'milestone_lag': ((df['milestones_expected'] - df['milestones_completed'])
+                          / df['milestones_total'].where(df['milestones_total'] > 0)).fillna(0),
+        'grade_trend': (-df['grade_trend'].fillna(0) / GRADE_TREND_SCALE),
+        'late_submissions': (df['late'] / df['submissions'].where(df['submissions'] > 0)).fillna(0),
+    }).clip(0, 1) + 0.0  # normalises -0.0 from the negated trend
+
+    contributions = factors * pd.Series(WEIGHTS)
+    df['risk_score'] = contributions.sum(axis=1).round(1)
+    for name in WEIGHTS:
+        df[f'points_{name}'] = contributions[name].round(1)
+    return df
+
+
+def _factors_json(row):
+    def number(value, digits=1):
+        return None if pd.isna(value) else round(float(value), digits)
+
+    return {
+        'attendance_rate': number(row.attendance_rate * 100 if not pd.isna(row.attendance_rate) else np.nan),
+        'due_assignments': int(row.due_assignments),
+        'missing_submissions': int(row.missing_submissions),
+        'late_submissions': int(row.late) if not pd.isna(row.late) else 0,
+        'grade_trend': number(row.grade_trend, 2),
+        'milestones_completed': int(row.milestones_completed),
+        'milestones_expected': number(row.milestones_expected),
+        'contributions': {name: float(getattr(row, f'points_{name}')) for name in WEIGHTS},
+    }
+
+
+def score_students(today=None):
+    """
+    Score every active student and store the result on their profile.
+
+    A student in several active batches keeps their highest score. Profiles
+    are created when missing, and scores of students no longer active are
+    cleared. The caller commits. Returns the number of students scored.
+    """
+    now = datetime.utcnow()
+    df = compute_scores(today)
+
+    rows = []
+    if not df.empty:
+        worst = df.sort_values('risk_score', ascending=False).drop_duplicates('student_id')
+        for row in worst.itertuples(index=False):
+            rows.append({
+                'user_id': row.student_id,
+                'risk_score': float(row.risk_score),
+                'risk_rating': rating_for(row.risk_score),
+                'risk_factors': _factors_json(row),
+                'risk_scored_at': now,
+            })
+
+    if rows:
+        stmt = insert(StudentProfile).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[StudentProfile.user_id],
+            set_={
+                'risk_score': stmt.excluded.risk_score,
+                'risk_rating': stmt.excluded.risk_rating,
+                'risk_factors': stmt.excluded.risk_factors,
+                'risk_scored_at': stmt.excluded.risk_scored_at,
+            }
+        ))
+
+    db.session.execute(
+        update(StudentProfile).where(
+            StudentProfile.risk_scored_at < now
+        ).values(risk_score=None, risk_rating=None, risk_factors=None)
+    )
+    return len(rows)
@@ -4,11 +4,12 @@ Centralized student profile and performance tracking
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import func, desc
+from sqlalchemy import desc
+from sqlalchemy.orm import selectinload, joinedload
 from datetime import datetime, timedelta
 from app.extensions import db
 from app.models import (
-    User, StudentProfile, PerformanceReview, Enrollment, Attendance,
+    User, StudentProfile, PerformanceReview, Enrollment, Batch,
     Grade, Submission, RAGRating, EnrollmentStatus, UserRole
 )
 from app.auth.utils import role_required
@@ -20,58 +21,40 @@ bp = Blueprint('student_lifecycle', __name__, url_prefix='/student-lifecycle')
 @login_required
 @role_required([UserRole.ADMIN, UserRole.INSTRUCTOR, UserRole.MENTOR])
 def view_profile(student_id):
-    """View comprehensive student profile"""
+    """View comprehensive student profile (metrics are maintained by app.student_lifecycle.metrics)"""
     student = db.session.get(User, student_id)
     if not student:
         flash('Student not found', 'error')
         return redirect(url_for('analytics.admin_dashboard'))
     
-    # Get or create profile
-    profile = StudentProfile.query.filter_by(user_id=student_id).first()
-    if not profile:
-        profile = StudentProfile(user_id=student_id)
-        db.session.add(profile)
-        db.session.commit()
+    # Students with no attendance, grades or submissions yet have no stored profile
+    profile = StudentProfile.query.filter_by(user_id=student_id).first() or StudentProfile(
+        user_id=student_id, attendance_percentage=0.0, overall_performance_score=0.0, engagement_score=0.0
+    )
     
     # Get enrollments with progress
-    enrollments = Enrollment.query.filter_by(student_id=student_id).all()
-    
-    # Calculate attendance
-    total_sessions = 0
-    attended_sessions = 0
-    for enrollment in enrollments:
-        attendance_records = Attendance.query.filter_by(enrollment_id=enrollment.id).all()
-        total_sessions += len(attendance_records)
-        attended_sessions += sum(1 for a in attendance_records if a.present)
-    
-    attendance_percentage = (attended_sessions / total_sessions * 100) if total_sessions > 0 else 0
+    enrollments = Enrollment.query.options(
+        joinedload(Enrollment.batch).joinedload(Batch.bootcamp)
+    ).filter_by(student_id=student_id).all()
     
     # Get recent grades
-    recent_submissions = Submission.query.filter_by(student_id=student_id).order_by(desc(Submission.submitted_at)).limit(10).all()
+    recent_submissions = Submission.query.options(
+        joinedload(Submission.assignment), joinedload(Submission.grade)
+    ).filter_by(student_id=student_id).order_by(desc(Submission.submitted_at)).limit(10).all()
     
     # Get performance reviews
-    reviews = PerformanceReview.query.filter_by(student_profile_id=profile.id).order_by(desc(PerformanceReview.review_date)).all()
-    
-    # Calculate overall performance
-    if recent_submissions:
-        grades = [s.grade.score for s in recent_submissions if s.grade]
-        avg_score = sum(grades) / len(grades) if grades else 0
-    else:
-        avg_score = 0
-    
-    # Update profile metrics
-    profile.attendance_percentage = attendance_percentage
-    profile.overall_performance_score = avg_score
-    db.session.commit()
+    reviews = PerformanceReview.query.options(
+        joinedload(PerformanceReview.reviewer)
+    ).filter_by(student_profile_id=profile.id).order_by(desc(PerformanceReview.review_date)).all() if profile.id else []
     
     return render_template('student_lifecycle/profile.html',
                          student=student,
                          profile=profile,
                          enrollments=enrollments,
-                         attendance_percentage=attendance_percentage,
+                         attendance_percentage=profile.attendance_percentage,
                          recent_submissions=recent_submissions,
                          reviews=reviews,
-                         avg_score=avg_score)
+                         avg_score=profile.overall_performance_score)
 
 
 @bp.route('/profile/<uuid:student_id>/edit', methods=['GET', 'POST'])
@@ -125,8 +108,9 @@ def add_performance_review(student_id):
     
     profile = StudentProfile.query.filter_by(user_id=student_id).first()
     if not profile:
-        flash('Student profile not found', 'error')
-        return redirect(url_for('student_lifecycle.view_profile', student_id=student_id))
+        profile = StudentProfile(user_id=student_id)
+        db.session.add(profile)
+        db.session.commit()
     
     if request.method == 'POST':
         rag_rating = request.form.get('rag_rating')
@@ -169,38 +153,84 @@ def add_performance_review(student_id):
 @login_required
 @role_required([UserRole.ADMIN, UserRole.INSTRUCTOR])
 def at_risk_students():
-    """View students who need intervention (RED rating)"""
-    red_profiles = StudentProfile.query.filter_by(current_rag_rating=RAGRating.RED).all()
-    amber_profiles = StudentProfile.query.filter_by(current_rag_rating=RAGRating.AMBER).all()
+    """View students the nightly scoring job rates RED or AMBER, highest risk first, and reviews due this week"""
+    import uuid
+    from datetime import date
+    from flask import abort
+    from app.student_lifecycle.risk import AMBER_THRESHOLD
+    from app.student_lifecycle.reviews import at_risk, reviews_due, week_end
     
-    # Get associated user data
-    red_students = []
-    for profile in red_profiles:
-        user = db.session.get(User, profile.user_id)
-        if user:
-            red_students.append({
-                'user': user,
-                'profile': profile,
-                'latest_review': PerformanceReview.query.filter_by(
-                    student_profile_id=profile.id
-                ).order_by(desc(PerformanceReview.review_date)).first()
-            })
+    try:
+        batch_id = uuid.UUID(request.args['batch_id']) if request.args.get('batch_id') else None
+        instructor_id = uuid.UUID(request.args['instructor_id']) if request.args.get('instructor_id') else None
+    except ValueError:
+        abort(400)
+    
+    # Instructors only see students and reviews from their own batches
+    if current_user.role == UserRole.INSTRUCTOR:
+        instructor_id = current_user.id
     
+    rows = at_risk(AMBER_THRESHOLD, batch_id=batch_id, instructor_id=instructor_id)
+    
+    red_students = []
     amber_students = []
-    for profile in amber_profiles:
-        user = db.session.get(User, profile.user_id)
-        if user:
-            amber_students.append({
-                'user': user,
-                'profile': profile,
-                'latest_review': PerformanceReview.query.filter_by(
-                    student_profile_id=profile.id
-                ).order_by(desc(PerformanceReview.review_date)).first()
-            })
+    for profile, user, latest_review in rows:
+        contributions = (profile.risk_factors or {}).get('contributions', {})
+        student_data = {
+            'user': user,
+            'profile': profile,
+            'latest_review': latest_review,
+            'top_factors': sorted(
+                (item for item in contributions.items() if item[1] > 0),
+                key=lambda item: item[1], reverse=True
+            )[:3]
+        }
+        if profile.risk_rating == RAGRating.RED:
+            red_students.append(student_data)
+        else:
+            amber_students.append(student_data)
+    
+    scored_at = max((profile.risk_scored_at for profile, _, _ in rows), default=None)
+    
+    # One clock for the due window and the overdue markers in the template
+    today = date.today()
+    due_through = week_end(today)
+    due_reviews = reviews_due(due_through, batch_id=batch_id, instructor_id=instructor_id)
+    
+    batches = Batch.query.order_by(desc(Batch.start_date)).all()
+    instructors = User.query.filter_by(role=UserRole.INSTRUCTOR).order_by(User.full_name).all() \
+        if current_user.role == UserRole.ADMIN else []
     
     return render_template('student_lifecycle/at_risk_students.html',
                          red_students=red_students,
-                         amber_students=amber_students)
+                         amber_students=amber_students,
+                         scored_at=scored_at,
+                         due_reviews=due_reviews,
+                         due_through=due_through,
+                         today=today,
+                         batches=batches,
+                         instructors=instructors,
+                         batch_id=batch_id,
+                         instructor_id=instructor_id)
+
+
+@bp.route('/students/<uuid:student_id>/360')
+@login_required
+@role_required([UserRole.ADMIN, UserRole.INSTRUCTOR, UserRole.MENTOR])
+def student_360(student_id):
+    """Complete student snapshot, as an HTML partial or JSON (?format=json)"""
+    from flask import abort
+    from app.student_lifecycle.overview import get_overview, visible_to
+    
+    overview = get_overview(student_id)
+    if overview is None:
+        abort(404)
+    overview = visible_to(overview, current_user)
+    
+    if request.args.get('format') == 'json':
+        return jsonify(overview)
+    
+    return render_template('student_lifecycle/student_360.html', overview=overview)
 
 
 @bp.route('/dashboard')
@@ -218,7 +248,9 @@ def student_dashboard():
         db.session.commit()
     
     # Get enrollments
-    enrollments = Enrollment.query.filter_by(
+    enrollments = Enrollment.query.options(
+        selectinload(Enrollment.attendance_rollup)
+    ).filter_by(
         student_id=current_user.id,
         status=EnrollmentStatus.ACTIVE
     ).all()
@@ -0,0 +1,146 @@
+"""Test payment webhook processing with the local fake gateway
+
+Drives FakeGateway through duplicate, reordered and invalid-transition
+deliveries against the configured database, then removes the rows it created.
+"""
+import sys
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import delete
+from app import create_app
+from app.extensions import db
+from app.models import (
+    User, UserRole, Bootcamp, Batch, Enrollment, EnrollmentStatus, Payment, PaymentEvent, PaymentStatus
+)
+from app.payments import webhooks
+from app.payments.gateway import FakeGateway
+
+app = create_app()
+app.config['PAYMENT_EVENT_MAX_ATTEMPTS'] = 2
+
+failures = 0
+
+
+def check(label, condition, detail=''):
+    global failures
+    if condition:
+        print(f'  ✓ {label}')
+    else:
+        failures += 1
+        print(f'  ❌ {label} {detail}')
+
+
+def payments_for(transaction_id):
+    return Payment.query.filter_by(transaction_id=transaction_id).all()
+
+
+def events_for(transaction_id):
+    return PaymentEvent.query.filter_by(transaction_id=transaction_id).order_by(PaymentEvent.received_at).all()
+
+
+with app.app_context():
+    # This script decides when events are applied, so no background run is queued
+    webhooks._scheduled.set()
+
+    gateway = FakeGateway(app.config['PAYMENT_WEBHOOK_SECRET'])
+    client = app.test_client()
+    run = uuid.uuid4().hex[:8]
+    start = datetime(2025, 5, 1, 9, 0, tzinfo=timezone.utc)
+
+    student = User(email=f'webhook-test-{run}@cohortly.test', password_hash='!', role=UserRole.STUDENT,
+                   full_name='Webhook Test')
+    bootcamp = Bootcamp(title=f'Webhook Test {run}', description='Webhook test', mode='live', price=100,
+                        duration_weeks=1)
+    db.session.add_all([student, bootcamp])
+    db.session.flush()
+    batch = Batch(bootcamp_id=bootcamp.id, name=f'Webhook Test {run}', start_date=date.today(),
+                  end_date=date.today() + timedelta(days=7))
+    db.session.add(batch)
+    db.session.flush()
+    enrollments = [Enrollment(student_id=student.id, batch_id=batch.id, status=EnrollmentStatus.PENDING)
+                   for _ in range(3)]
+    db.session.add_all(enrollments)
+    db.session.commit()
+
+    transactions = [f'tx_test_{run}_{n}' for n in range(3)]
+
+    try:
+        print('\nDuplicate deliveries')
+        tx = transactions[0]
+        created = gateway.event(tx, 'pending', amount='100.00', enrollment_id=enrollments[0].id,
+                                occurred_at=start)
+        completed = gateway.event(tx, 'completed', occurred_at=start + timedelta(minutes=5))
+        codes = [r.status_code for r in gateway.deliver(client, created, attempts=3)]
+        codes += [r.status_code for r in gateway.deliver(client, completed, attempts=2)]
+        check('first delivery accepted, retries answered as duplicates', codes == [202, 200, 200, 202, 200], codes)
+        webhooks.process_payment_events()
+        check('one event stored per idempotency key', len(events_for(tx)) == 2, len(events_for(tx)))
+        payments = payments_for(tx)
+        check('one payment row', len(payments) == 1, len(payments))
+        check('payment completed', payments and payments[0].status == PaymentStatus.COMPLETED,
+              payments and payments[0].status)
+        check('enrollment activated', db.session.get(Enrollment, enrollments[0].id).status == EnrollmentStatus.ACTIVE)
+
+        print('\nOut-of-order deliveries')
+        tx = transactions[1]
+        created = gateway.event(tx, 'pending', amount='100.00', enrollment_id=enrollments[1].id,
+                                occurred_at=start)
+        completed = gateway.event(tx, 'completed', occurred_at=start + timedelta(minutes=5))
+        refunded = gateway.event(tx, 'refunded', occurred_at=start + timedelta(minutes=10))
+        gateway.deliver(client, refunded)
+        webhooks.process_payment_events()
+        early = events_for(tx)[0]
+        check('refund for an unseen transaction left pending',
+              early.processed_at is None and early.attempts == 1, (early.processed_at, early.attempts, early.error))
+        check('no payment created without an amount', not payments_for(tx))
+        gateway.deliver(client, completed)
+        gateway.deliver(client, created)
+        webhooks.process_payment_events()
+        payments = payments_for(tx)
+        check('one payment row', len(payments) == 1, len(payments))
+        check('events applied in occurrence order, ending refunded',
+              payments and payments[0].status == PaymentStatus.REFUNDED, payments and payments[0].status)
+        check('every event processed', all(e.processed_at is not None for e in events_for(tx)),
+              [(e.status, e.error) for e in events_for(tx)])
+
+        print('\nInvalid and stale transitions')
+        tx = transactions[2]
+        gateway.deliver(client, gateway.event(tx, 'pending', amount='100.00', enrollment_id=enrollments[2].id,
+                                              occurred_at=start))
+        gateway.deliver(client, gateway.event(tx, 'refunded', occurred_at=start + timedelta(minutes=5)))
+        for _ in range(app.config['PAYMENT_EVENT_MAX_ATTEMPTS']):
+            webhooks.process_payment_events()
+        refund = [e for e in events_for(tx) if e.status == PaymentStatus.REFUNDED][0]
+        check('refund of a pending payment retried, then given up',
+              refund.attempts == 2 and refund.processed_at is not None
+              and (refund.error or '').startswith('Invalid transition'),
+              (refund.attempts, refund.processed_at, refund.error))
+        check('payment still pending', payments_for(tx)[0].status == PaymentStatus.PENDING)
+
+        gateway.deliver(client, gateway.event(tx, 'completed', occurred_at=start + timedelta(minutes=10)))
+        webhooks.process_payment_events()
+        gateway.deliver(client, gateway.event(tx, 'failed', occurred_at=start + timedelta(minutes=1)))
+        webhooks.process_payment_events()
+        stale = [e for e in events_for(tx) if e.status == PaymentStatus.FAILED][0]
+        payments = payments_for(tx)
+        check('one payment row', len(payments) == 1, len(payments))
+        check('payment completed', payments[0].status == PaymentStatus.COMPLETED, payments[0].status)
+        check('older failure marked superseded',
+              stale.processed_at is not None and (stale.error or '').startswith('Superseded'), stale.error)
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(PaymentEvent).where(PaymentEvent.transaction_id.in_(transactions)))
+        for payment in Payment.query.filter(Payment.transaction_id.in_(transactions)):
+            db.session.delete(payment)
+        for enrollment in enrollments:
+            db.session.delete(enrollment)
+        db.session.flush()
+        db.session.delete(batch)
+        db.session.delete(bootcamp)
+        db.session.delete(student)
+        db.session.commit()
+
+    if failures:
+        print(f'\n❌ {failures} check(s) failed')
+        sys.exit(1)
+    print('\n✅ Webhook processing works!')